@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from Instrumentation import medido
+
+
+class BDStreamLoader:
+    """Lee la hoja BD fila a fila (openpyxl read_only) proyectando columnas y filtrando al vuelo.
+
+    Los valores se escriben en arreglos preasignados según SCHEMA, así que no hay inferencia de tipos
+    ni se materializa la hoja completa en memoria.
+    """
+
+    SCHEMA = {
+        'Año': 'float64',
+        'Mes': 'float64',
+        'Nombre Cliente_factura': 'object',
+        'Nombre Centro de Operacion': 'object',
+        'Valor Total USD': 'float64',
+        'Concepto': 'object',
+        'Moneda': 'object',
+        'Nombre Item': 'object',
+        'Vendedor': 'object',
+        'Desc Pais Cliente_factura': 'object',
+    }
+    BLOQUE_MINIMO = 4096
+
+    def __init__(self, input_path, excluir_items=(), conceptos=('FACTURA', 'ANULACIÓN FE'),
+                 monedas=('USD', 'EUR'), vendedor_excluido=None, sheet_name='BD'):
+        self.INPUT_PATH = input_path
+        self.sheet_name = sheet_name
+        self.excluir_items = set(excluir_items)
+        self.conceptos = {c.upper() for c in conceptos}
+        self.monedas = {m.upper() for m in monedas}
+        self.vendedor_excluido = vendedor_excluido
+        self.vendedores = []
+
+    @staticmethod
+    def _a_float(valor):
+        if valor is None or valor == '':
+            return np.nan
+        try:
+            return float(valor)
+        except (TypeError, ValueError):
+            return np.nan
+
+    def _fila_valida(self, concepto, moneda, item, valor, vendedor):
+        # mismas condiciones que DataContext.bd_filtrado, evaluadas sobre la fila cruda
+        if not isinstance(concepto, str) or concepto.upper() not in self.conceptos:
+            return False
+        if not isinstance(moneda, str) or moneda.upper() not in self.monedas:
+            return False
+        if item in self.excluir_items:
+            return False
+        if np.isnan(valor) or valor == 0:
+            return False
+        if self.vendedor_excluido and isinstance(vendedor, str) and \
+                vendedor.strip().upper() == self.vendedor_excluido:
+            return False
+        return True
+
+    @medido("libro.leer_bd_streaming")
+    def load(self):
+        wb = load_workbook(self.INPUT_PATH, read_only=True, data_only=True)
+        try:
+            ws = wb[self.sheet_name]
+            filas = ws.iter_rows(values_only=True)
+            encabezado = [str(c).strip() if c is not None else '' for c in next(filas, ())]
+            faltantes = [c for c in self.SCHEMA if c not in encabezado]
+            if faltantes:
+                raise ValueError(f"Columnas faltantes en '{self.sheet_name}': {faltantes}")
+
+            columnas = list(self.SCHEMA)
+            indices = [encabezado.index(c) for c in columnas]
+            es_float = [self.SCHEMA[c] == 'float64' for c in columnas]
+            i_concepto, i_moneda, i_item, i_valor, i_vendedor = (
+                columnas.index(c) for c in ('Concepto', 'Moneda', 'Nombre Item', 'Valor Total USD', 'Vendedor')
+            )
+
+            # La dimensión declarada de la hoja da una cota superior de filas; si no existe, se crece por bloques
+            capacidad = max((ws.max_row or 0) - 1, self.BLOQUE_MINIMO)
+            arreglos = [np.empty(capacidad, dtype=self.SCHEMA[c]) for c in columnas]
+            n = 0
+            ancho = max(indices) + 1
+            # vendedores de todas las filas (no solo las válidas), en orden de aparición
+            vistos = {}
+
+            for fila in filas:
+                if len(fila) < ancho:
+                    fila = tuple(fila) + (None,) * (ancho - len(fila))
+                valores = [
+                    self._a_float(fila[i]) if f else (fila[i] if fila[i] != '' else None)
+                    for i, f in zip(indices, es_float)
+                ]
+                vendedor = valores[i_vendedor]
+                if isinstance(vendedor, str) and vendedor.upper() != self.vendedor_excluido:
+                    vistos.setdefault(vendedor.strip(), None)
+                if not self._fila_valida(valores[i_concepto], valores[i_moneda], valores[i_item],
+                                         valores[i_valor], vendedor):
+                    continue
+                if n == capacidad:
+                    capacidad *= 2
+                    arreglos = [np.resize(a, capacidad) for a in arreglos]
+                for a, v in zip(arreglos, valores):
+                    a[n] = v
+                n += 1
+        finally:
+            wb.close()
+
+        self.vendedores = [v for v in vistos if v != '']
+        return pd.DataFrame({c: a[:n] for c, a in zip(columnas, arreglos)})
@@ -1,17 +1,32 @@
 import subprocess
 import sys
 import os
-import math
+import re
 from datetime import datetime
 import pandas as pd
-import numpy as np
 import plotly.graph_objects as go
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pickle import PicklingError
+from WorkbookCache import WorkbookCache
+from DataContext import DataContext
+from SalesCube import SalesCube
+from ChartRenderer import ChartRenderer, render_plotly
+from RenderCache import RenderCache
+from DashboardCompositor import DashboardCompositor
+from MatplotlibCharts import MatplotlibCharts
+from SellerChartTemplate import SellerChartTemplate
+from StripEncoder import EXTENSIONES
+from HTMLDashboardExporter import HTMLDashboardExporter
+from Instrumentation import medido, span
 
 class CarexDashboard:
-    def __init__(self,base_dir):
+    def __init__(self,base_dir, bd_streaming=False, alias_vendedores=None, cubo_incremental=False,
+                 render_workers=None, render_cache_mb=200, dashboard_ancho=7500, dashboard_formato="png",
+                 dashboard_calidad=85, dashboard_compress_level=6, dashboard_encode_workers=1,
+                 graficos_backend="plotly", dashboards_vendedores=False, dashboard_pdf=False, renderer=None,
+                 bd_directa=False, bd_directa_vigencia=None):
         self.BASE_DIR = base_dir
         self.DATA_DIR = os.path.join(self.BASE_DIR, "data")
         self.OUTPUT_DIR = os.path.join(self.BASE_DIR, "output")
@@ -19,6 +34,8 @@ class CarexDashboard:
 
         self.INPUT_FILENAME = "Carex COL Reporte Vendedor.xlsx"
         self.INPUT_PATH = os.path.join(self.DATA_DIR, self.INPUT_FILENAME)
+        # la copia de BD cargada desde UnoBiable solo reemplaza a la hoja en modo directo
+        self.cache = WorkbookCache(self.INPUT_PATH, usar_externas=bd_directa, vigencia_externas=bd_directa_vigencia)
         self.FECHA_ACTUAL = datetime.now().strftime("%Y-%m-%d")
         self.ANIO_ACTUAL = datetime.now().year
         self.MES_ACTUAL = datetime.now().month
@@ -37,9 +54,58 @@ class CarexDashboard:
             'INV RECUPERACIONES', 'UCHUVA X 400GR DESGRANAD NACIONAL EURO',
             'CONTENEDOR PET 19,0X12,0X7,5 500 GRS', 'HIGO X 1KG NACIONAL EXITO',
         }
+        self.contexto = DataContext(
+            self.INPUT_PATH, self.EXCLUIR_ITEMS, cache=self.cache,
+            streaming=bd_streaming, alias_vendedores=alias_vendedores,
+            cubo_incremental=cubo_incremental
+        )
+        if graficos_backend not in ("plotly", "matplotlib"):
+            raise ValueError(f"graficos_backend debe ser 'plotly' o 'matplotlib': {graficos_backend}")
+        self.GRAFICOS_BACKEND = graficos_backend
+        self.DASHBOARDS_VENDEDORES = dashboards_vendedores
+        # se puede recibir un renderer ya arrancado (precalentado mientras se actualizaban los datos)
+        self.renderer = renderer or self.crear_renderer(base_dir, render_workers, render_cache_mb, graficos_backend)
+        self.DASHBOARD_ANCHO = dashboard_ancho
+        if dashboard_formato not in EXTENSIONES and dashboard_formato != "html":
+            raise ValueError(f"dashboard_formato debe ser uno de {sorted(EXTENSIONES) + ['html']}: {dashboard_formato}")
+        self.DASHBOARD_FORMATO = dashboard_formato
+        self.DASHBOARD_CALIDAD = dashboard_calidad
+        self.DASHBOARD_COMPRESS_LEVEL = dashboard_compress_level
+        self.DASHBOARD_ENCODE_WORKERS = dashboard_encode_workers
+        # PDF paginado además de la imagen (con dashboard_formato="pdf" ya es la salida principal;
+        # con "html" no se rasteriza nada, así que no hay páginas que escribir)
+        self.DASHBOARD_PDF = dashboard_pdf and dashboard_formato not in ("pdf", "html")
+        self.estadisticas_dashboard = None
+
+    @staticmethod
+    def crear_renderer(base_dir, render_workers=None, render_cache_mb=200, graficos_backend="plotly"):
+        render_cache = None
+        if render_cache_mb:
+            render_cache = RenderCache(os.path.join(base_dir, "data", "cache", "render"), render_cache_mb * 1024 * 1024)
+        # con matplotlib no se necesita kaleido: los workers arrancan sin calentar el navegador
+        return ChartRenderer(workers=render_workers, cache=render_cache, calentar_kaleido=graficos_backend == "plotly")
+
+    def set_periodo(self, anio, mes, fecha=None):
+        """Fija el periodo del reporte (por defecto es el mes actual); `fecha` es la etiqueta de los archivos."""
+        self.ANIO_ACTUAL = anio
+        self.MES_ACTUAL = mes
+        self.MES_ACTUAL_NOMBRE = self.MESES_ESPANOL.get(mes, str(mes))
+        self.FECHA_ACTUAL = fecha or f"{anio}-{mes:02d}"
+
+    @staticmethod
+    def rango_periodos(desde, hasta):
+        """Lista de (año, mes) entre `desde` y `hasta` inclusive, ambos como (año, mes)."""
+        (anio, mes), fin = desde, tuple(hasta)
+        if not (1 <= mes <= 12 and 1 <= fin[1] <= 12):
+            raise ValueError(f"Mes fuera de rango (1-12): {desde} - {hasta}")
+        periodos = []
+        while (anio, mes) <= fin:
+            periodos.append((anio, mes))
+            anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+        return periodos
 
     def install_required_libraries(self):
-        required_libraries = ['pandas', 'openpyxl', 'plotly', 'kaleido', 'Pillow', 'matplotlib', 'numpy']
+        required_libraries = ['pandas', 'openpyxl', 'plotly', 'kaleido', 'Pillow', 'matplotlib', 'numpy', 'pyarrow']
         for lib in required_libraries:
             try:
                 __import__(lib)
@@ -50,48 +116,40 @@ class CarexDashboard:
     # -------------------------
     # Datos principales (igual que antes)
     # -------------------------
+    @medido("dashboard.cargar_datos")
     def load_and_clean_data(self):
         print("📊 Cargando y limpiando datos...")
-        required_columns = [
-            'Año', 'Mes', 'Nombre Cliente_factura', 'Nombre Centro de Operacion',
-            'Valor Total USD', 'Concepto', 'Moneda', 'Nombre Item', 'Vendedor', 'Desc Pais Cliente_factura'
-        ]
         try:
-            df = pd.read_excel(self.INPUT_PATH, sheet_name='BD', usecols=required_columns)
-            df_bv = pd.read_excel(self.INPUT_PATH, sheet_name='Budget x Vendedor')
+            # con el cubo persistido no se filtra BD completa: basta el agregado al día
+            df_filtered = self.contexto.ventas
+            df_bv = self.contexto.budget
         except Exception as e:
             print(f"❌ ERROR al cargar archivos: {e}")
             sys.exit()
-
-        df.columns = df.columns.str.strip()
-        df_bv.columns = df_bv.columns.str.strip()
-
-        df_filtered = df[
-            (df['Concepto'].str.upper().isin(['FACTURA', 'ANULACIÓN FE'])) &
-            (df['Moneda'].str.upper().isin(['USD', 'EUR'])) &
-            (~df['Nombre Item'].isin(self.EXCLUIR_ITEMS)) &
-            (df['Valor Total USD'].notna()) &
-            (df['Valor Total USD'] != 0) &
-            (df['Vendedor'].str.strip().str.upper() != 'COMERCIALIZADORA INTERNACIONAL CARIBBEAN EXOTICS S A')
-        ].copy()
         return df_filtered, df_bv
 
+    @medido("dashboard.analisis")
     def perform_analysis(self, df_filtered, df_bv):
         print("🔍 Realizando análisis...")
-        df_anual = df_filtered[df_filtered['Año'] == self.ANIO_ACTUAL]
-        df_mensual = df_anual[df_anual['Mes'] == self.MES_ACTUAL]
-
-        ventas_sede_anual = df_anual.groupby('Nombre Centro de Operacion')['Valor Total USD'].sum().sort_values(ascending=False)
-        top_clientes_anual = df_anual.groupby('Nombre Cliente_factura')['Valor Total USD'].sum().sort_values(ascending=False).head(5)
-        top_paises_anual = df_anual.groupby('Desc Pais Cliente_factura')['Valor Total USD'].sum().sort_values(ascending=False).head(4)
-        ejecutado_anual = df_anual['Valor Total USD'].sum()
+        # Todas las métricas salen del cubo preagregado; solo se recalcula si df_filtered no es el del contexto
+        cubo = self.contexto.cubo if df_filtered is self.contexto.ventas else SalesCube(df_filtered)
         budget_anual = df_bv['Valor Total USD'].sum()
-
-        ventas_sede_mensual = df_mensual.groupby('Nombre Centro de Operacion')['Valor Total USD'].sum().sort_values(ascending=False)
-        top_clientes_mensual = df_mensual.groupby('Nombre Cliente_factura')['Valor Total USD'].sum().sort_values(ascending=False).head(5)
-        top_paises_mensual = df_mensual.groupby('Desc Pais Cliente_factura')['Valor Total USD'].sum().sort_values(ascending=False).head(4)
-        ejecutado_mensual = df_mensual['Valor Total USD'].sum()
         budget_mensual = df_bv[df_bv['Mes'] == self.MES_ACTUAL]['Valor Total USD'].sum()
+        return self._analisis_cubo(cubo, budget_anual, budget_mensual)
+
+    def _analisis_cubo(self, cubo, budget_anual, budget_mensual):
+        # métricas del periodo actual a partir de un cubo (el de la compañía o el de un vendedor)
+        anio, mes = self.ANIO_ACTUAL, self.MES_ACTUAL
+
+        ventas_sede_anual = cubo.por('Nombre Centro de Operacion', anio)
+        top_clientes_anual = cubo.por('Nombre Cliente_factura', anio, top=5)
+        top_paises_anual = cubo.por('Desc Pais Cliente_factura', anio, top=4)
+        ejecutado_anual = cubo.total(anio)
+
+        ventas_sede_mensual = cubo.por('Nombre Centro de Operacion', anio, mes)
+        top_clientes_mensual = cubo.por('Nombre Cliente_factura', anio, mes, top=5)
+        top_paises_mensual = cubo.por('Desc Pais Cliente_factura', anio, mes, top=4)
+        ejecutado_mensual = cubo.total(anio, mes)
 
         return (ventas_sede_anual, ventas_sede_mensual, top_clientes_anual, top_clientes_mensual,
                 top_paises_anual, top_paises_mensual, budget_anual, ejecutado_anual,
@@ -100,20 +158,6 @@ class CarexDashboard:
     # -------------------------
     # Métodos integrados de "ReporteVendedor" reutilizados dentro de Carex
     # -------------------------
-    @staticmethod
-    def _convertir_formato_colombiano(valor):
-        if pd.isna(valor):
-            return 0.0
-        if isinstance(valor, (int, float)):
-            return float(valor)
-        if isinstance(valor, str):
-            valor_limpio = valor.replace('.', '').replace(',', '.')
-            try:
-                return float(valor_limpio)
-            except:
-                return 0.0
-        return float(valor)
-
     @staticmethod
     def _dividir_nombre_v(nombre):
         palabras = nombre.split()
@@ -142,161 +186,80 @@ class CarexDashboard:
         else:
             return nombre
 
-    def _cargar_datos_vendedores(self):
-        # carga las mismas hojas usadas antes, aplicando conversión si es necesario
+    def _procesar_vendedores(self):
+        # ejecutado vs budget de todos los vendedores (anual y mes actual) en una sola pasada agrupada
         try:
-            df = pd.read_excel(self.INPUT_PATH, sheet_name='BD')
-            df.columns = df.columns.str.strip()
-            df_bv = pd.read_excel(self.INPUT_PATH, sheet_name='Budget x Vendedor')
-            df_bv.columns = df_bv.columns.str.strip()
-            if 'Valor Total USD' in df_bv.columns:
-                df_bv['Valor Total USD'] = df_bv['Valor Total USD'].apply(self._convertir_formato_colombiano)
-            return df, df_bv
+            return self.contexto.ejecucion_vendedores(self.MES_ACTUAL)
         except Exception as e:
-            print(f"❌ ERROR al cargar datos de vendedoras: {e}")
-            return None, None
-
-    def _procesar_vendedores(self, df, df_bv, anual=False):
-        # reproduce la lógica de ReporteVendedor para anual o mensual (mes actual)
-        if df is None or df_bv is None:
-            return pd.DataFrame()
-
-        vendedores_filtrados = df['Vendedor'].dropna()
-        vendedores_filtrados = vendedores_filtrados[
-            vendedores_filtrados.str.upper() != 'COMERCIALIZADORA INTERNACIONAL CARIBBEAN EXOTICS S A'
-        ].str.strip()
-        vendedores_unicos = vendedores_filtrados[vendedores_filtrados != ''].unique()
-
-        mes_actual = self.MES_ACTUAL
-        resultados = []
-
-        for vendedora in vendedores_unicos:
-            if anual:
-                filtro = (
-                    (df['Vendedor'].str.strip() == vendedora.strip()) &
-                    (df['Concepto'].str.upper().isin(["FACTURA", "ANULACIÓN FE"])) &
-                    (df['Moneda'].str.upper().isin(["USD", "EUR"])) &
-                    (~df['Nombre Item'].isin(self.EXCLUIR_ITEMS)) &
-                    (df['Valor Total USD'].notna()) &
-                    (df['Valor Total USD'] != 0)
-                )
-                filtro_bv = (
-                    (df_bv['Vendedor'].str.strip() == vendedora.strip()) &
-                    (df_bv['Valor Total USD'].notna()) &
-                    (df_bv['Valor Total USD'] != 0)
-                )
-            else:
-                filtro = (
-                    (df['Vendedor'].str.strip() == vendedora.strip()) &
-                    (df['Mes'] == mes_actual) &
-                    (df['Concepto'].str.upper().isin(["FACTURA", "ANULACIÓN FE"])) &
-                    (df['Moneda'].str.upper().isin(["USD", "EUR"])) &
-                    (~df['Nombre Item'].isin(self.EXCLUIR_ITEMS)) &
-                    (df['Valor Total USD'].notna()) &
-                    (df['Valor Total USD'] != 0)
-                )
-                filtro_bv = (
-                    (df_bv['Vendedor'].str.strip() == vendedora.strip()) &
-                    (df_bv['Mes'] == mes_actual) &
-                    (df_bv['Valor Total USD'].notna()) &
-                    (df_bv['Valor Total USD'] != 0)
-                )
+            print(f"❌ ERROR al procesar datos de vendedoras: {e}")
+            return pd.DataFrame(), pd.DataFrame()
 
-            total_ejecutado = df.loc[filtro, 'Valor Total USD'].sum()
-            total_budget = df_bv.loc[filtro_bv, 'Valor Total USD'].sum()
-            porcentaje = (total_ejecutado / total_budget * 100) if total_budget > 0 else 0
-            faltante = max(0, 100 - porcentaje)
-
-            resultados.append({
-                "Vendedor": vendedora,
-                "Budget": round(total_budget, 2),
-                "Ejecutado": round(total_ejecutado, 2),
-                "% Ejecución": round(porcentaje, 2),
-                "% Faltante": round(faltante, 2),
-                "Meta": 100.0,
-                "Mes": mes_actual if not anual else None
-            })
-
-        # Total compañía
-        if resultados:
-            df_res = pd.DataFrame(resultados)
-            total_budget = df_res["Budget"].sum()
-            total_ejecutado = df_res["Ejecutado"].sum()
-            total_porcentaje = (total_ejecutado / total_budget * 100) if total_budget > 0 else 0
-            total_faltante = max(0, 100 - total_porcentaje)
-            resultados.append({
-                "Vendedor": "TOTAL COMPAÑÍA",
-                "Budget": round(total_budget, 2),
-                "Ejecutado": round(total_ejecutado, 2),
-                "% Ejecución": round(total_porcentaje, 2),
-                "% Faltante": round(total_faltante, 2),
-                "Meta": 100.0,
-                "Mes": mes_actual if not anual else None
-            })
+    def _titulo_grafico_vendedores(self, anual=False):
+        return "Ejecución vs Faltante por Vendedor - " + ("Anual" if anual else f"Mes {self.MES_ACTUAL_NOMBRE}")
 
-        df_resultado = pd.DataFrame(resultados)
-        return df_resultado
-    
-
-    
-            
+    @staticmethod
+    def _grafico_vendedores_png(df_resultado, titulo, figsize=(12, 5), dpi=150):
+        # dibuja sobre una plantilla reutilizada (ver SellerChartTemplate) y devuelve los bytes PNG;
+        # es estático para poder correr en el pool
+        plantilla = SellerChartTemplate.obtener(
+            figsize=tuple(figsize), titulo_fontsize=24, titulo_color='#3d2ca0', etiqueta_fontsize=11,
+            formatear_nombre=CarexDashboard._dividir_nombre_v,
+        )
+        return plantilla.png(df_resultado["Vendedor"], df_resultado["% Ejecución"], df_resultado["% Faltante"],
+                             titulo, dpi=dpi, compress_level=1)
 
-    def _generar_grafico_vendedores_memoria(self, df_resultado, anual=False):
-        # genera el plot (matplotlib) y devuelve BytesIO
+    def _tarea_grafico_vendedores(self, df_resultado, anual=False, tamano=None):
+        # tarea de renderizado (ver ChartRenderer) para el gráfico de vendedoras
         if df_resultado is None or df_resultado.empty:
             return None
-
-        fig, ax = plt.subplots(figsize=(12, 5))
-        x = np.arange(len(df_resultado["Vendedor"]))
-        ejecucion = df_resultado["% Ejecución"]
-        faltante = df_resultado["% Faltante"]
-
-        bar1 = ax.bar(x, ejecucion, width=0.4, label="% Ejecución", color="#89CFF0")
-        bar2 = ax.bar(x, faltante, width=0.4, bottom=ejecucion, label="% Faltante", color="#1f4e79")
-
-        titulo = "Ejecución vs Faltante por Vendedor - " + ("Anual" if anual else f"Mes {self.MES_ACTUAL_NOMBRE}")
-        ax.set_title(titulo, fontsize=24, fontweight='bold', color='#3d2ca0')
-        ax.set_ylabel("Porcentaje")
-        ax.set_xticks(x)
-        ax.set_xticklabels([self._dividir_nombre_v(v) for v in df_resultado["Vendedor"]])
-
-        ax.legend(loc='lower center', bbox_to_anchor=(0.5, -0.25), ncol=2, fontsize=10)
-
-        # Mostrar porcentaje sobre cada barra
-        for rects, valores in zip([bar1, bar2], [ejecucion, faltante]):
-            for rect, val in zip(rects, valores):
-                height = rect.get_height()
-                if height > 0:
-                    ax.text(
-                        rect.get_x() + rect.get_width() / 2,
-                        rect.get_y() + height / 2,
-                        f"{val:.1f}%",
-                        ha='center',
-                        va='center',
-                        color='white' if rects is bar2 else 'black',
-                        fontsize=11,
-                        fontweight='bold'
-                    )
-
-        plt.tight_layout()
-        buf = BytesIO()
-        plt.savefig(buf, format='png', dpi=150)
-        plt.close(fig)
-        buf.seek(0)
-        return buf
+        titulo = self._titulo_grafico_vendedores(anual)
+        args = (df_resultado, titulo)
+        if tamano:
+            # mismo ancho en pulgadas; dpi y alto elegidos para salir al tamaño exacto de la celda
+            dpi = tamano[0] / 12
+            args = (df_resultado, titulo, (12, tamano[1] / dpi), dpi)
+        return (CarexDashboard._grafico_vendedores_png, args, titulo)
+
+    def _figura_vendedores(self, df_resultado, anual=False):
+        # el mismo gráfico de vendedoras como barras apiladas de plotly (para el HTML interactivo)
+        if df_resultado is None or df_resultado.empty:
+            return None
+        nombres = [self._dividir_nombre_v(v) for v in df_resultado["Vendedor"]]
+        fig = go.Figure()
+        for columna, color, color_texto in (("% Ejecución", SellerChartTemplate.COLOR_EJECUCION, "black"),
+                                            ("% Faltante", SellerChartTemplate.COLOR_FALTANTE, "white")):
+            valores = df_resultado[columna].astype(float).to_numpy()
+            fig.add_trace(go.Bar(
+                x=nombres, y=valores, name=columna, marker_color=color,
+                text=[f"{v:.1f}%" if v > 0 else "" for v in valores], textposition='inside',
+                insidetextanchor='middle', textfont={'color': color_texto, 'size': 14},
+                customdata=df_resultado["Vendedor"], hovertemplate="%{customdata}<br>%{y:.1f}%<extra></extra>",
+            ))
+        fig.update_layout(
+            barmode='stack', title_text=f"<b>{self._titulo_grafico_vendedores(anual)}</b>", title_x=0.5,
+            title_font={'size': 24, 'color': '#3d2ca0'}, yaxis_title_text='Porcentaje', height=500,
+            legend={'orientation': 'h', 'x': 0.5, 'xanchor': 'center', 'y': -0.15},
+            paper_bgcolor='white', plot_bgcolor='white', margin=dict(l=50, r=50, b=80, t=80),
+        )
+        return fig.to_dict()
 
     # -------------------------
     # Gráficos del dashboard (se añaden aquí también los gráficos de vendedor)
     # -------------------------
-    def create_plots_in_memory(self, analysis_data):
-        print("🎨 Creando gráficos en memoria...")
+    COLORES_CAREX = ["#008000", "#eafb00", "#3d2ca0", '#d62728', '#9467bd']
+    ANOTACIONES_GAUGE = (f'${14.53}mill', f'${1.08}mill')  # budget anual y mensual de la compañía
+
+    def _tareas_plotly(self, analysis_data, tamano_celda=None, anotaciones_gauge=None):
+        # gauges, donas, barras y tablas con plotly (se rasterizan con kaleido)
         (ventas_sede_anual, ventas_sede_mensual, top_clientes_anual, top_clientes_mensual,
          top_paises_anual, top_paises_mensual, budget_anual, ejecutado_anual,
          budget_mensual, ejecutado_mensual) = analysis_data
 
-        colores_carex = ["#008000", "#eafb00", "#3d2ca0", '#d62728', '#9467bd']
+        colores_carex = self.COLORES_CAREX
+        anotaciones_gauge = anotaciones_gauge or self.ANOTACIONES_GAUGE
 
-        def create_plot_bytes(fig, title, width, height):
+        def create_plot_task(fig, title, width, height):
+            # solo arma la tarea; la rasterización se hace en paralelo en self.renderer
             fig.update_layout(
                 title_text=f"<b>{title}</b>",
                 title_x=0.5,
@@ -307,12 +270,13 @@ class CarexDashboard:
                 paper_bgcolor='white',
                 margin=dict(l=50, r=50, b=50, t=80)
             )
-            try:
-                img_bytes = fig.to_image(format="jpeg", scale=2)
-                return BytesIO(img_bytes)
-            except Exception as e:
-                print(f"❌ ERROR al crear la imagen '{title}': {e}.")
-                return None
+            scale = 2
+            if tamano_celda:
+                # escala para salir directamente al ancho de celda; el alto lógico se ajusta a la celda
+                cell_w, cell_h = tamano_celda
+                scale = cell_w / width
+                fig.update_layout(height=round(cell_h / scale))
+            return (render_plotly, (fig.to_dict(), "jpeg", scale), title)
 
         fig_gauge_anual = go.Figure(go.Indicator(
             mode="gauge+number",
@@ -323,13 +287,13 @@ class CarexDashboard:
         fig_gauge_anual.add_annotation(
             x=1.1,
             y=0.08,
-            text=f'${14.53}mill',
+            text=anotaciones_gauge[0],
             showarrow=False,
             font={'size': 24, 'color': 'black'},
             xref="paper",
             yref="paper"
         )
-        gauge_anual_bytes = create_plot_bytes(fig_gauge_anual, f"Venta Acumulada USD Anual {self.ANIO_ACTUAL}", 600, 350)
+        gauge_anual_task = create_plot_task(fig_gauge_anual, f"Venta Acumulada USD Anual {self.ANIO_ACTUAL}", 600, 350)
 
         fig_gauge_mensual = go.Figure(go.Indicator(
             mode="gauge+number",
@@ -341,13 +305,13 @@ class CarexDashboard:
         fig_gauge_mensual.add_annotation(
             x=1.1,
             y=0.08,
-            text=f'${1.08}mill',
+            text=anotaciones_gauge[1],
             showarrow=False,
             font={'size': 24, 'color': 'black'},
             xref="paper",
             yref="paper"
         )
-        gauge_mensual_bytes = create_plot_bytes(fig_gauge_mensual, f"Venta Acumulada USD Mensual ({self.MES_ACTUAL_NOMBRE})", 600, 350)
+        gauge_mensual_task = create_plot_task(fig_gauge_mensual, f"Venta Acumulada USD Mensual ({self.MES_ACTUAL_NOMBRE})", 600, 350)
 
         # Pie anual y mensual
         fig_anual = go.Figure(data=go.Pie(
@@ -364,7 +328,7 @@ class CarexDashboard:
         if total_anual > 0:
             fig_anual.add_annotation(text=f"Total<br><b>${total_anual:,.0f}</b>", x=0.5, y=0.5,
                                     font=dict(size=16, color='#000000'), showarrow=False)
-        pie_anual_bytes = create_plot_bytes(fig_anual, f"Ventas por Sede Anual ({self.ANIO_ACTUAL})", 800, 500)
+        pie_anual_task = create_plot_task(fig_anual, f"Ventas por Sede Anual ({self.ANIO_ACTUAL})", 800, 500)
 
         fig_mensual = go.Figure(data=go.Pie(
             labels=ventas_sede_mensual.index,
@@ -380,7 +344,7 @@ class CarexDashboard:
         if total_mensual > 0:
             fig_mensual.add_annotation(text=f"Total<br><b>${total_mensual:,.0f}</b>", x=0.5, y=0.5,
                                       font=dict(size=16, color='#000000'), showarrow=False)
-        pie_mensual_bytes = create_plot_bytes(fig_mensual, f"Ventas por Sede ({self.MES_ACTUAL_NOMBRE})", 800, 500)
+        pie_mensual_task = create_plot_task(fig_mensual, f"Ventas por Sede ({self.MES_ACTUAL_NOMBRE})", 800, 500)
 
         # Top paises (bar) anual/mensual
         fig_paises_anual = go.Figure(data=go.Bar(
@@ -391,7 +355,7 @@ class CarexDashboard:
             textposition='outside'
         ))
         fig_paises_anual.update_layout(xaxis_title_text='País', yaxis_title_text='Ventas USD')
-        bar_paises_anual_bytes = create_plot_bytes(fig_paises_anual, f"Top 4 Ventas por País Anual ({self.ANIO_ACTUAL})", 800, 450)
+        bar_paises_anual_task = create_plot_task(fig_paises_anual, f"Top 4 Ventas por País Anual ({self.ANIO_ACTUAL})", 800, 450)
 
         fig_paises_mensual = go.Figure(data=go.Bar(
             x=top_paises_mensual.index,
@@ -401,7 +365,7 @@ class CarexDashboard:
             textposition='outside'
         ))
         fig_paises_mensual.update_layout(xaxis_title_text='País', yaxis_title_text='Ventas USD')
-        bar_paises_mensual_bytes = create_plot_bytes(fig_paises_mensual, f"Top 4 Ventas por País ({self.MES_ACTUAL_NOMBRE})", 800, 450)
+        bar_paises_mensual_task = create_plot_task(fig_paises_mensual, f"Top 4 Ventas por País ({self.MES_ACTUAL_NOMBRE})", 800, 450)
 
         # Tablas top clientes (anual / mensual)
         fig_top_clientes_anual = go.Figure(data=[go.Table(
@@ -411,7 +375,7 @@ class CarexDashboard:
                        align=['left', 'right'], fill_color=[['white', '#f0f0f0'] * (len(top_clientes_anual) // 2 + 1)],
                        font=dict(color='black', size=16), height=25)
         )])
-        tabla_clientes_anual_bytes = create_plot_bytes(fig_top_clientes_anual, f"Top 5 Clientes Anual ({self.ANIO_ACTUAL})", 800, 300)
+        tabla_clientes_anual_task = create_plot_task(fig_top_clientes_anual, f"Top 5 Clientes Anual ({self.ANIO_ACTUAL})", 800, 300)
 
         fig_top_clientes_mensual = go.Figure(data=[go.Table(
             header=dict(values=['<b>Cliente</b>', f'<b>Ventas Mes ({self.MES_ACTUAL_NOMBRE}) ($)</b>'],
@@ -420,29 +384,146 @@ class CarexDashboard:
                        align=['left', 'right'], fill_color=[['white', '#f0f0f0'] * (len(top_clientes_mensual) // 2 + 1)],
                        font=dict(color='black', size=16), height=25)
         )])
-        tabla_clientes_mensual_bytes = create_plot_bytes(fig_top_clientes_mensual, f"Top 5 Clientes ({self.MES_ACTUAL_NOMBRE})", 800, 300)
+        tabla_clientes_mensual_task = create_plot_task(fig_top_clientes_mensual, f"Top 5 Clientes ({self.MES_ACTUAL_NOMBRE})", 800, 300)
+
+        return (gauge_anual_task, gauge_mensual_task, pie_anual_task, pie_mensual_task,
+                bar_paises_anual_task, bar_paises_mensual_task, tabla_clientes_anual_task, tabla_clientes_mensual_task)
+
+    def _tareas_matplotlib(self, analysis_data, tamano_celda=None, anotaciones_gauge=None):
+        # los mismos paneles dibujados con matplotlib (Agg), sin navegador
+        (ventas_sede_anual, ventas_sede_mensual, top_clientes_anual, top_clientes_mensual,
+         top_paises_anual, top_paises_mensual, budget_anual, ejecutado_anual,
+         budget_mensual, ejecutado_mensual) = analysis_data
+
+        def create_plot_task(funcion, title, args, width, height):
+            # mismo tamaño lógico que en plotly (100 px por pulgada) y salida al tamaño de celda si se conoce
+            figsize, dpi = (width / 100, height / 100), 200
+            if tamano_celda:
+                cell_w, cell_h = tamano_celda
+                dpi = cell_w / figsize[0]
+                figsize = (figsize[0], cell_h / dpi)
+            return (funcion, (title, *args, figsize, dpi), title)
+
+        def serie(s):
+            return [str(i) for i in s.index], [float(v) for v in s.values]
+
+        def filas_clientes(s):
+            return [[str(c), f'${v:,.0f}'] for c, v in s.items()]
+
+        colores = self.COLORES_CAREX
+        anotaciones_gauge = anotaciones_gauge or self.ANOTACIONES_GAUGE
+        return (
+            create_plot_task(MatplotlibCharts.gauge, f"Venta Acumulada USD Anual {self.ANIO_ACTUAL}",
+                             (float(ejecutado_anual), float(budget_anual), anotaciones_gauge[0]), 600, 350),
+            create_plot_task(MatplotlibCharts.gauge, f"Venta Acumulada USD Mensual ({self.MES_ACTUAL_NOMBRE})",
+                             (float(ejecutado_mensual), float(budget_mensual), anotaciones_gauge[1]), 600, 350),
+            create_plot_task(MatplotlibCharts.dona, f"Ventas por Sede Anual ({self.ANIO_ACTUAL})",
+                             (*serie(ventas_sede_anual), colores), 800, 500),
+            create_plot_task(MatplotlibCharts.dona, f"Ventas por Sede ({self.MES_ACTUAL_NOMBRE})",
+                             (*serie(ventas_sede_mensual), colores), 800, 500),
+            create_plot_task(MatplotlibCharts.barras, f"Top 4 Ventas por País Anual ({self.ANIO_ACTUAL})",
+                             (*serie(top_paises_anual), colores, 'País', 'Ventas USD'), 800, 450),
+            create_plot_task(MatplotlibCharts.barras, f"Top 4 Ventas por País ({self.MES_ACTUAL_NOMBRE})",
+                             (*serie(top_paises_mensual), colores, 'País', 'Ventas USD'), 800, 450),
+            create_plot_task(MatplotlibCharts.tabla, f"Top 5 Clientes Anual ({self.ANIO_ACTUAL})",
+                             (['Cliente', f'Ventas {self.ANIO_ACTUAL} ($)'], filas_clientes(top_clientes_anual)), 800, 300),
+            create_plot_task(MatplotlibCharts.tabla, f"Top 5 Clientes ({self.MES_ACTUAL_NOMBRE})",
+                             (['Cliente', f'Ventas Mes ({self.MES_ACTUAL_NOMBRE}) ($)'], filas_clientes(top_clientes_mensual)), 800, 300),
+        )
+
+    def _tareas_paneles(self, analysis_data, tamano_celda=None, anotaciones_gauge=None):
+        if self.GRAFICOS_BACKEND == "matplotlib":
+            return self._tareas_matplotlib(analysis_data, tamano_celda, anotaciones_gauge)
+        return self._tareas_plotly(analysis_data, tamano_celda, anotaciones_gauge)
+
+    def _tareas_graficos(self, analysis_data, tamano_celda=None):
+        # las 10 tareas del dashboard en orden de rejilla (None si no hay datos para un gráfico)
+        paneles = self._tareas_paneles(analysis_data, tamano_celda)
+        (gauge_anual_task, gauge_mensual_task, pie_anual_task, pie_mensual_task,
+         bar_paises_anual_task, bar_paises_mensual_task, tabla_clientes_anual_task, tabla_clientes_mensual_task) = paneles
 
         # --- ahora integramos los gráficos de vendedoras (anual y mensual) reutilizando la lógica ---
-        df_full, df_bv = self._cargar_datos_vendedores()
-        df_vendedores_anual = self._procesar_vendedores(df_full, df_bv, anual=True)
-        df_vendedores_mensual = self._procesar_vendedores(df_full, df_bv, anual=False)
-
-        graf_vendedores_anual_bytes = self._generar_grafico_vendedores_memoria(df_vendedores_anual, anual=True)
-        graf_vendedores_mensual_bytes = self._generar_grafico_vendedores_memoria(df_vendedores_mensual, anual=False)
-
-        # Devolvemos la lista completa de imágenes (algunas pueden ser None si falló)
-        images = [
-            gauge_anual_bytes, gauge_mensual_bytes,
-            pie_anual_bytes, pie_mensual_bytes,
-            bar_paises_anual_bytes, bar_paises_mensual_bytes,
-            graf_vendedores_anual_bytes, graf_vendedores_mensual_bytes,
-            tabla_clientes_anual_bytes, tabla_clientes_mensual_bytes,
+        df_vendedores_anual, df_vendedores_mensual = self._procesar_vendedores()
+
+        graf_vendedores_anual_task = self._tarea_grafico_vendedores(df_vendedores_anual, anual=True, tamano=tamano_celda)
+        graf_vendedores_mensual_task = self._tarea_grafico_vendedores(df_vendedores_mensual, anual=False, tamano=tamano_celda)
+
+        tareas = [
+            gauge_anual_task, gauge_mensual_task,
+            pie_anual_task, pie_mensual_task,
+            bar_paises_anual_task, bar_paises_mensual_task,
+            graf_vendedores_anual_task, graf_vendedores_mensual_task,
+            tabla_clientes_anual_task, tabla_clientes_mensual_task,
+        ]
+
+        return tareas
+
+    def _figuras_paneles(self, analysis_data, anotaciones_gauge=None):
+        # las figuras plotly de los paneles sin rasterizar (siempre plotly, sea cual sea el backend)
+        return [tarea[1][0] for tarea in self._tareas_plotly(analysis_data, None, anotaciones_gauge)]
+
+    def _figuras_html(self, analysis_data):
+        # los 10 paneles del dashboard en el mismo orden de la rejilla
+        (gauge_anual, gauge_mensual, pie_anual, pie_mensual, paises_anual, paises_mensual,
+         clientes_anual, clientes_mensual) = self._figuras_paneles(analysis_data)
+        df_vendedores_anual, df_vendedores_mensual = self._procesar_vendedores()
+        return [
+            gauge_anual, gauge_mensual,
+            pie_anual, pie_mensual,
+            paises_anual, paises_mensual,
+            self._figura_vendedores(df_vendedores_anual, anual=True),
+            self._figura_vendedores(df_vendedores_mensual, anual=False),
+            clientes_anual, clientes_mensual,
         ]
+
+    def _exportador_html(self):
+        return HTMLDashboardExporter(logo_path=os.path.join(self.BASE_DIR, "logo.png"))
+
+    @medido("dashboard.html")
+    def generate_html_report(self, analysis_data):
+        """Dashboard interactivo en un solo HTML, sin pasar por kaleido ni por el pool de renderizado."""
+        print("🌐 Exportando dashboard interactivo (HTML)...")
+        stats = self._exportador_html().exportar(
+            self._figuras_html(analysis_data), f"Reporte Consolidado - {self.FECHA_ACTUAL}", self._ruta_dashboard(".html")
+        )
+        self.estadisticas_dashboard = stats
+        print(f"✅ Dashboard HTML guardado en: {stats['ruta']} ({stats['paneles']} paneles, "
+              f"{stats['bytes'] / 1024 / 1024:.2f} MB, {stats['segundos_total']:.2f}s)")
+        return stats['ruta']
+
+    @medido("dashboard.graficos")
+    def create_plots_in_memory(self, analysis_data, tamano_celda=None):
+        print("🎨 Creando gráficos en memoria...")
+        tareas = self._tareas_graficos(analysis_data, tamano_celda)
+
+        # Rasterizar todo en paralelo; se devuelve la lista completa en el mismo orden
+        # (algunas pueden ser None si falló)
+        imagenes = iter(self.renderer.render([t for t in tareas if t is not None]))
+        images = [next(imagenes) if t is not None else None for t in tareas]
         return images
 
     # -------------------------
-    # Combinar imágenes en rejilla 2 columnas (dinámico)
+    # Combinar imágenes en rejilla 2 columnas (tamaño final fijo, escrito por franjas)
     # -------------------------
+    def _opciones_codificacion(self):
+        return dict(formato=self.DASHBOARD_FORMATO, calidad=self.DASHBOARD_CALIDAD,
+                    compress_level=self.DASHBOARD_COMPRESS_LEVEL, workers=self.DASHBOARD_ENCODE_WORKERS)
+
+    def _extension(self):
+        return ".html" if self.DASHBOARD_FORMATO == "html" else EXTENSIONES[self.DASHBOARD_FORMATO]
+
+    def _ruta_dashboard(self, extension=None):
+        extension = extension or self._extension()
+        return os.path.join(self.OUTPUT_DIR, f"dashboard_consolidado_{self.FECHA_ACTUAL}{extension}")
+
+    def _compositor(self, cols=2, padding=100):
+        return DashboardCompositor(
+            ancho=self.DASHBOARD_ANCHO, cols=cols, padding=padding,
+            logo_path=os.path.join(self.BASE_DIR, "logo.png"),  # Usa logo en PNG con transparencia
+            cache_dir=os.path.join(self.DATA_DIR, "cache"),
+        )
+
+    @medido("dashboard.combinar")
     def combine_images_into_single_report(self, image_bytes_list, cols=2, padding=100):
         print("🖼️ Combinando gráficos en un reporte consolidado (rejilla)...")
         # Filtrar None
@@ -451,85 +532,33 @@ class CarexDashboard:
             print("❌ No hay imágenes para combinar.")
             return
 
-        # 🔥 Resetear puntero de cada buffer antes de abrir
-        pil_images = []
-        for b in image_bytes_list:
-            b.seek(0)
-            pil_images.append(Image.open(b).convert("RGB"))
-
-        widths, heights = zip(*(im.size for im in pil_images))
-        max_w = max(widths)
-        max_h = max(heights)
-
-        # Escalado SOLO para las imágenes (gráficos)
-        scale_factor = 2.0
-        max_h = int(max_h * scale_factor)
-        max_w = int(max_w * scale_factor)
-
-        rows = math.ceil(len(pil_images) / cols)
-
-        # 🔥 Definimos un espacio fijo arriba para encabezado (logo + título)
-        header_height = 1500  
-
-        final_w = cols * max_w + (cols + 1) * padding
-        final_h = rows * max_h + (rows + 1) * padding + header_height
-
-        final = Image.new("RGB", (final_w, final_h), "white")
-        draw = ImageDraw.Draw(final)
-
-        # 🔥 Logo ENORME a la izquierda (con transparencia si es PNG)
-        logo_x, logo_y, logo_width, logo_height = (0, 0, 0, 0)
-        try:
-            logo_path = os.path.join(self.BASE_DIR, "logo.png")  # Usa logo en PNG con transparencia
-            logo = Image.open(logo_path).convert("RGBA")  # Mantener transparencia
-            logo_height = 1500  # Tamaño fijo grande
-            logo_width = int(logo.width * logo_height / logo.height)
-            logo = logo.resize((logo_width, logo_height))
-
-            logo_x, logo_y = padding, 100
-            # Pegar respetando la transparencia
-            final.paste(logo, (logo_x, logo_y), logo)
-        except Exception as e:
-            print(f"⚠️ No se pudo cargar el logo: {e}")
-
-        # 🔥 Título grande a la derecha del logo
-        try:
-            font_path = "arial.ttf"
-            title_font = ImageFont.truetype(font_path, 220)
-        except Exception:
-            title_font = ImageFont.load_default()
-
-        title = f"Reporte Consolidado - {self.FECHA_ACTUAL}"
-        bbox = draw.textbbox((0, 0), title, font=title_font)
-        w_t = bbox[2] - bbox[0]
-        h_t = bbox[3] - bbox[1]
-
-        title_x = logo_x + logo_width + 300  # a la derecha del logo
-        title_y = logo_y + (logo_height - h_t) // 2
-        draw.text((title_x, title_y), title, fill="black", font=title_font)
-
-        # 🔥 Insertar imágenes en rejilla (empiezan DESPUÉS del header)
-        for idx, im in enumerate(pil_images):
-            row = idx // cols
-            col = idx % cols
-            x = padding + col * (max_w + padding)
-            y = header_height + padding + row * (max_h + padding)
-            final.paste(im.resize((max_w, max_h)), (int(x), int(y)))
-
-        # Guardar salida
-        out_path = os.path.join(self.OUTPUT_DIR, f"dashboard_consolidado_{self.FECHA_ACTUAL}.png")
-        final.save(out_path, "PNG")
+        out_path = self._ruta_dashboard()
+        with span("dashboard.componer", formato=self.DASHBOARD_FORMATO) as s:
+            stats = self._compositor(cols, padding).componer(
+                image_bytes_list, f"Reporte Consolidado - {self.FECHA_ACTUAL}", out_path, **self._opciones_codificacion()
+            )
+            s.atributos.update(codificacion_s=stats['segundos_codificacion'], bytes=stats['bytes'])
+        self.estadisticas_dashboard = stats
         print(f"✅ Dashboard consolidado guardado en: {out_path}")
+        print(f"⏱️ Codificación {stats['formato']}: {stats['segundos_codificacion']:.2f}s "
+              f"(total {stats['segundos_total']:.2f}s), {stats['bytes'] / 1024 / 1024:.2f} MB")
+        if self.DASHBOARD_PDF:
+            with span("dashboard.componer", formato="pdf") as s:
+                pdf = self._compositor(cols, padding).componer_pdf(
+                    image_bytes_list, f"Reporte Consolidado - {self.FECHA_ACTUAL}", self._ruta_dashboard(".pdf"),
+                    self.DASHBOARD_COMPRESS_LEVEL
+                )
+                s.atributos.update(paginas=pdf['paginas'], bytes=pdf['bytes'])
+            print(f"📄 PDF del dashboard guardado en: {pdf['ruta']} ({pdf['paginas']} páginas, "
+                  f"{pdf['bytes'] / 1024 / 1024:.2f} MB)")
         return out_path
 
     # Excel report (igual que antes)
     # -------------------------
-    def generate_excel_report(self, df, df_bv):
-        print("📋 Generando reporte de Excel anual...")
-        output_path = os.path.join(self.OUTPUT_DIR, f"reporte_vendedoras_anual_{self.FECHA_ACTUAL}.xlsx")
-
-        df_ejecutado = df.groupby('Vendedor')['Valor Total USD'].sum().rename('Ejecutado Total USD')
-        df_budget = df_bv.groupby('Vendedor')['Valor Total USD'].sum().rename('Budget Total USD')
+    @staticmethod
+    def _tabla_excel(df, df_bv):
+        df_ejecutado = df.groupby('Vendedor', observed=True)['Valor Total USD'].sum().rename('Ejecutado Total USD')
+        df_budget = df_bv.groupby('Vendedor', observed=True)['Valor Total USD'].sum().rename('Budget Total USD')
 
         df_resultado = pd.concat([df_ejecutado, df_budget], axis=1).fillna(0)
         df_resultado['% Ejecución Anual'] = (df_resultado['Ejecutado Total USD'] / df_resultado['Budget Total USD'] * 100).fillna(0)
@@ -548,9 +577,13 @@ class CarexDashboard:
         }])
 
         df_final = df_resultado.reset_index().rename(columns={'index': 'Vendedor'})
-        df_final = pd.concat([df_final, total_row], ignore_index=True)
+        return pd.concat([df_final, total_row], ignore_index=True)
 
-        df_final.to_excel(output_path, index=False)
+    @medido("dashboard.excel")
+    def generate_excel_report(self, df, df_bv):
+        print("📋 Generando reporte de Excel anual...")
+        output_path = os.path.join(self.OUTPUT_DIR, f"reporte_vendedoras_anual_{self.FECHA_ACTUAL}.xlsx")
+        self._tabla_excel(df, df_bv).to_excel(output_path, index=False)
         print(f"✅ Reporte anual de vendedores generado en: {output_path}")
 
     # -------------------------
@@ -563,8 +596,192 @@ class CarexDashboard:
             return
 
         analysis_data = self.perform_analysis(df_filtered, df_bv)
-        images = self.create_plots_in_memory(analysis_data)
+        if self.DASHBOARD_FORMATO == "html":
+            # sin rasterizar: el pool de renderizado ni siquiera se arranca
+            self.generate_html_report(analysis_data)
+            self.generate_excel_report(df_filtered, df_bv)
+            if self.DASHBOARDS_VENDEDORES:
+                self._html_vendedores(df_bv)
+            return
+        trabajos_vendedores = []
+        try:
+            images = self.create_plots_in_memory(analysis_data, self._compositor().tamano_celda())
+            if self.DASHBOARDS_VENDEDORES:
+                # mismo pool (ya caliente) para los paneles de todos los vendedores
+                print("👥 Generando dashboards por vendedor...")
+                trabajos_vendedores = self._trabajos_vendedores(df_bv)
+        finally:
+            self.renderer.close()
         # combinar (rejilla 2 columnas)
         self.combine_images_into_single_report(images, cols=2)
         # excel anual
         self.generate_excel_report(df_filtered, df_bv)
+        if trabajos_vendedores:
+            self._componer_en_paralelo(trabajos_vendedores)
+
+    def generate_reports_for_periods(self, periodos, workers=None):
+        """Genera dashboard y Excel de varios periodos (año, mes) con una sola carga de datos.
+
+        Los datos, el cubo y los resúmenes por vendedor se calculan una vez; los gráficos de todos
+        los periodos se rasterizan en un único lote del pool y cada dashboard se compone y escribe
+        (junto con su Excel) en un proceso aparte.
+        """
+        periodos = sorted(set((int(a), int(m)) for a, m in periodos))
+        if not periodos:
+            return []
+        df_filtered, df_bv = self.load_and_clean_data()
+        if df_filtered.empty:
+            print("⚠ No se encontraron datos válidos.")
+            return []
+
+        compositor = self._compositor()
+        tabla_excel = self._tabla_excel(df_filtered, df_bv)  # no depende del periodo
+        tareas_por_periodo, trabajos = [], []
+        for anio, mes in periodos:
+            print(f"📅 Periodo {anio}-{mes:02d}")
+            self.set_periodo(anio, mes)
+            analysis_data = self.perform_analysis(df_filtered, df_bv)
+            if self.DASHBOARD_FORMATO == "html":
+                self.generate_html_report(analysis_data)
+                tabla_excel.to_excel(os.path.join(self.OUTPUT_DIR, f"reporte_vendedoras_anual_{self.FECHA_ACTUAL}.xlsx"),
+                                     index=False)
+                trabajos.append(self.estadisticas_dashboard)
+                continue
+            tareas_por_periodo.append([t for t in self._tareas_graficos(analysis_data, compositor.tamano_celda())
+                                       if t is not None])
+            trabajos.append({
+                "compositor": compositor,
+                "titulo": f"Reporte Consolidado - {self.FECHA_ACTUAL}",
+                "out_path": self._ruta_dashboard(),
+                "pdf_path": self._ruta_dashboard(".pdf") if self.DASHBOARD_PDF else None,
+                "opciones": self._opciones_codificacion(),
+                "tabla_excel": tabla_excel,
+                "excel_path": os.path.join(self.OUTPUT_DIR, f"reporte_vendedoras_anual_{self.FECHA_ACTUAL}.xlsx"),
+            })
+
+        if self.DASHBOARD_FORMATO == "html":
+            return trabajos
+
+        print(f"🎨 Creando {sum(map(len, tareas_por_periodo))} gráficos de {len(periodos)} periodos...")
+        try:
+            imagenes = iter(self.renderer.render([t for tareas in tareas_por_periodo for t in tareas]))
+        finally:
+            self.renderer.close()
+        for trabajo, tareas in zip(trabajos, tareas_por_periodo):
+            trabajo["imagenes"] = [buf.getvalue() for buf in (next(imagenes) for _ in tareas) if buf is not None]
+
+        return self._componer_en_paralelo(trabajos, workers)
+
+    @staticmethod
+    @medido("dashboard.componer_lote")
+    def _componer_en_paralelo(trabajos, workers=None):
+        # cada dashboard (y su Excel, si lo tiene) se compone en un proceso del pool
+        workers = workers if workers is not None else (os.cpu_count() or 1)
+        resultados = None
+        if workers > 1 and len(trabajos) > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=min(workers, len(trabajos))) as pool:
+                    resultados = list(pool.map(_componer_dashboard, trabajos))
+            except (BrokenProcessPool, PicklingError, OSError) as e:
+                print(f"⚠️ Pool de composición no disponible, se compone en serie: {e}")
+        if resultados is None:
+            resultados = [_componer_dashboard(t) for t in trabajos]
+
+        for stats in resultados:
+            if stats:
+                print(f"✅ {stats['ruta']} ({stats['bytes'] / 1024 / 1024:.2f} MB)")
+        return resultados
+
+    # -------------------------
+    # Dashboards individuales por vendedor
+    # -------------------------
+    @staticmethod
+    def _nombre_archivo(texto):
+        return re.sub(r'[^\w-]+', '_', texto).strip('_')
+
+    def _analisis_vendedores(self, df_bv):
+        """(vendedor, analysis_data, anotaciones de los gauges) de cada vendedor con budget.
+
+        Los cubos por vendedor salen de un único agrupamiento del cubo de la compañía y los budgets
+        de un único agrupamiento de la hoja de budget; no se filtra BD vendedor por vendedor.
+        """
+        vendedores = self.contexto.vendedores_budget
+        if not vendedores:
+            return
+        cubos = self.contexto.cubo.particionar('Vendedor')
+        df_bv = df_bv[df_bv['Valor Total USD'].notna() & (df_bv['Valor Total USD'] != 0)]
+        budgets = DataContext._sumas_por_vendedor(df_bv, self.MES_ACTUAL).reindex(vendedores, fill_value=0.0)
+        vacio = self.contexto.cubo.vacio()
+        for vendedor in vendedores:
+            budget_anual, budget_mensual = budgets.loc[vendedor, 'anual'], budgets.loc[vendedor, 'mensual']
+            analysis_data = self._analisis_cubo(cubos.get(vendedor, vacio), budget_anual, budget_mensual)
+            yield vendedor, analysis_data, (f'${budget_anual / 1e6:.2f}mill', f'${budget_mensual / 1e6:.2f}mill')
+
+    def _carpeta_vendedores(self):
+        carpeta = os.path.join(self.OUTPUT_DIR, "vendedores")
+        os.makedirs(carpeta, exist_ok=True)
+        return carpeta
+
+    @medido("dashboard.vendedores")
+    def _trabajos_vendedores(self, df_bv):
+        """Rasteriza los paneles de todos los vendedores con budget y arma sus trabajos de composición."""
+        compositor = self._compositor()
+        carpeta = self._carpeta_vendedores()
+        extension = self._extension()
+        tareas_por_vendedor, trabajos = [], []
+        for vendedor, analysis_data, anotaciones in self._analisis_vendedores(df_bv):
+            (gauge_anual, gauge_mensual, _, _, paises_anual, paises_mensual,
+             clientes_anual, clientes_mensual) = self._tareas_paneles(
+                analysis_data, compositor.tamano_celda(), anotaciones
+            )
+            tareas_por_vendedor.append([gauge_anual, gauge_mensual, paises_anual, paises_mensual,
+                                        clientes_anual, clientes_mensual])
+            trabajos.append({
+                "compositor": compositor,
+                "titulo": f"{vendedor} - {self.FECHA_ACTUAL}",
+                "out_path": os.path.join(carpeta, f"dashboard_{self._nombre_archivo(vendedor)}_{self.FECHA_ACTUAL}{extension}"),
+                "pdf_path": (os.path.join(carpeta, f"dashboard_{self._nombre_archivo(vendedor)}_{self.FECHA_ACTUAL}.pdf")
+                             if self.DASHBOARD_PDF else None),
+                "opciones": self._opciones_codificacion(),
+            })
+
+        if not trabajos:
+            return []
+        print(f"🎨 Creando {sum(map(len, tareas_por_vendedor))} gráficos de {len(trabajos)} vendedores...")
+        imagenes = iter(self.renderer.render([t for tareas in tareas_por_vendedor for t in tareas]))
+        for trabajo, tareas in zip(trabajos, tareas_por_vendedor):
+            trabajo["imagenes"] = [buf.getvalue() for buf in (next(imagenes) for _ in tareas) if buf is not None]
+        return trabajos
+
+    @medido("dashboard.vendedores_html")
+    def _html_vendedores(self, df_bv):
+        """Dashboard HTML interactivo por vendedor (mismos paneles que el rasterizado)."""
+        exportador, carpeta, resultados = self._exportador_html(), self._carpeta_vendedores(), []
+        for vendedor, analysis_data, anotaciones in self._analisis_vendedores(df_bv):
+            (gauge_anual, gauge_mensual, _, _, paises_anual, paises_mensual,
+             clientes_anual, clientes_mensual) = self._figuras_paneles(analysis_data, anotaciones)
+            stats = exportador.exportar(
+                [gauge_anual, gauge_mensual, paises_anual, paises_mensual, clientes_anual, clientes_mensual],
+                f"{vendedor} - {self.FECHA_ACTUAL}",
+                os.path.join(carpeta, f"dashboard_{self._nombre_archivo(vendedor)}_{self.FECHA_ACTUAL}.html"),
+            )
+            print(f"✅ {stats['ruta']} ({stats['bytes'] / 1024 / 1024:.2f} MB)")
+            resultados.append(stats)
+        return resultados
+
+
+def _componer_dashboard(trabajo):
+    # Compone un dashboard (y escribe su Excel si lo tiene); a nivel de módulo para el pool de procesos
+    stats = None
+    if trabajo["imagenes"]:
+        stats = trabajo["compositor"].componer(
+            [BytesIO(b) for b in trabajo["imagenes"]], trabajo["titulo"], trabajo["out_path"], **trabajo["opciones"]
+        )
+        if trabajo.get("pdf_path"):
+            trabajo["compositor"].componer_pdf([BytesIO(b) for b in trabajo["imagenes"]], trabajo["titulo"],
+                                               trabajo["pdf_path"], trabajo["opciones"]["compress_level"])
+    else:
+        print(f"❌ No hay imágenes para combinar: {trabajo['titulo']}")
+    if trabajo.get("tabla_excel") is not None:
+        trabajo["tabla_excel"].to_excel(trabajo["excel_path"], index=False)
+    return stats
@@ -0,0 +1,129 @@
+import os
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pickle import PicklingError
+from Instrumentation import medir_llamada, registrar, span
+
+
+def render_plotly(fig_dict, formato="jpeg", scale=2):
+    """Rasteriza una figura plotly (serializada con `fig.to_dict()`) con kaleido."""
+    import plotly.graph_objects as go
+    return go.Figure(fig_dict).to_image(format=formato, scale=scale)
+
+
+def _iniciar_worker(calentar_kaleido=True):
+    # Calentar kaleido/Chromium una vez por proceso para no pagar el arranque en cada gráfico
+    import matplotlib
+    matplotlib.use("Agg")
+    if not calentar_kaleido:
+        return
+    try:
+        render_plotly({"data": [], "layout": {"width": 10, "height": 10}}, "png", 1)
+    except Exception:
+        pass
+
+
+def _sin_tarea(_):
+    return None
+
+
+def _ejecutar(tarea):
+    # se mide en el worker; el proceso principal registra el span al recibir el resultado
+    funcion, args, titulo = tarea
+    try:
+        datos, metricas = medir_llamada(funcion, *args)
+        return datos, None, metricas
+    except Exception as e:
+        return None, f"❌ ERROR al crear la imagen '{titulo}': {e}.", None
+
+
+class ChartRenderer:
+    """Rasteriza en paralelo (pool de procesos con kaleido ya caliente) las tareas de gráficos.
+
+    Cada tarea es `(funcion, args, titulo)` donde `funcion` es importable a nivel de módulo y
+    devuelve los bytes de la imagen. `render` devuelve BytesIO (o None si falló) en el mismo orden.
+    Con `cache` (RenderCache) solo se rasterizan las tareas cuya especificación no se ha visto antes.
+    """
+
+    def __init__(self, workers=None, cache=None, calentar_kaleido=True):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.cache = cache
+        self.calentar_kaleido = calentar_kaleido
+        self._pool = None
+
+    def _obtener_pool(self, n_tareas):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=max(1, min(self.workers, n_tareas)), initializer=_iniciar_worker, initargs=(self.calentar_kaleido,)
+            )
+        return self._pool
+
+    def _rasterizar(self, tareas):
+        if self.workers > 1 and len(tareas) > 1:
+            try:
+                return list(self._obtener_pool(len(tareas)).map(_ejecutar, tareas))
+            except (BrokenProcessPool, PicklingError, OSError, RuntimeError, TypeError, AttributeError) as e:
+                print(f"⚠️ Pool de renderizado no disponible, se renderiza en serie: {e}")
+                self.close()
+        return [_ejecutar(t) for t in tareas]
+
+    def calentar(self):
+        """Arranca los workers (con kaleido ya caliente) antes de tener tareas, p. ej. mientras se
+        actualizan los datos; los errores solo se informan, el render igual funciona en frío."""
+        try:
+            if self.workers > 1:
+                # cada tarea vacía que llega sin workers libres lanza un proceso más
+                list(self._obtener_pool(self.workers).map(_sin_tarea, range(self.workers)))
+            else:
+                _iniciar_worker(self.calentar_kaleido)  # en serie se renderiza en este mismo proceso
+        except Exception as e:
+            print(f"⚠️ No se pudo precalentar el renderer: {e}")
+
+    def render(self, tareas):
+        tareas = list(tareas)
+        if not tareas:
+            return []
+        with span("render", graficos=len(tareas), workers=self.workers) as s:
+            return self._render(tareas, s)
+
+    def _render(self, tareas, s):
+        claves = [self.cache.clave(f, args) for f, args, _ in tareas] if self.cache else [None] * len(tareas)
+        resultados = [None] * len(tareas)
+        pendientes = []
+        for i, clave in enumerate(claves):
+            datos = self.cache.get(clave) if clave else None
+            if datos is not None:
+                resultados[i] = (datos, None, None)
+            else:
+                pendientes.append(i)
+
+        s.atributos["de_cache"] = len(tareas) - len(pendientes)
+        if self.cache and len(pendientes) < len(tareas):
+            print(f"♻️ {len(tareas) - len(pendientes)} de {len(tareas)} gráficos tomados de la caché")
+
+        for i, resultado in zip(pendientes, self._rasterizar([tareas[i] for i in pendientes])):
+            resultados[i] = resultado
+            if resultado[2] is not None:
+                # un span por gráfico rasterizado (tiempo y memoria del worker que lo hizo)
+                registrar("render.grafico", resultado[2], titulo=tareas[i][2], bytes=len(resultado[0]))
+            if self.cache and resultado[0] is not None:
+                self.cache.put(claves[i], resultado[0])
+
+        imagenes = []
+        for img_bytes, error, _ in resultados:
+            if error:
+                print(error)
+            imagenes.append(BytesIO(img_bytes) if img_bytes is not None else None)
+        return imagenes
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,146 @@
+import os
+import math
+import time
+import hashlib
+from PIL import Image, ImageDraw, ImageFont
+from StripEncoder import crear_writer
+from PDFPageWriter import PDFPageWriter
+
+
+class DashboardCompositor:
+    """Arma el dashboard consolidado en rejilla a partir de un tamaño final fijo.
+
+    El tamaño de celda se conoce antes de renderizar (`tamano_celda`) para que los gráficos se
+    dibujen directamente a ese tamaño. La salida se escribe por franjas (encabezado y luego una
+    fila de la rejilla a la vez), así la memoria pico no depende del número de gráficos.
+    En formato "pdf" cada gráfico va en su propia página (tras una portada con el encabezado).
+    """
+
+    def __init__(self, ancho=7500, cols=2, padding=100, alto_encabezado=1500, proporcion_celda=5 / 9,
+                 logo_path=None, cache_dir=None):
+        self.ancho = ancho
+        self.cols = cols
+        self.padding = padding
+        self.alto_encabezado = alto_encabezado
+        self.cell_w = (ancho - (cols + 1) * padding) // cols
+        self.cell_h = round(self.cell_w * proporcion_celda)
+        self.logo_path = logo_path
+        self.cache_dir = cache_dir
+
+    def tamano_celda(self):
+        return self.cell_w, self.cell_h
+
+    def alto_total(self, n_imagenes):
+        filas = math.ceil(n_imagenes / self.cols)
+        return self.alto_encabezado + self.padding + filas * (self.cell_h + self.padding)
+
+    # -------------------------
+    # Encabezado (logo + título)
+    # -------------------------
+    def _logo(self, alto):
+        """Logo redimensionado a `alto`, cacheado en disco mientras el archivo del logo no cambie."""
+        st = os.stat(self.logo_path)
+        ruta_cache = None
+        if self.cache_dir:
+            clave = hashlib.sha256(f"{self.logo_path}|{st.st_size}|{st.st_mtime_ns}|{alto}".encode()).hexdigest()[:16]
+            ruta_cache = os.path.join(self.cache_dir, f"logo_{clave}.png")
+            if os.path.exists(ruta_cache):
+                return Image.open(ruta_cache).convert("RGBA")
+
+        logo = Image.open(self.logo_path).convert("RGBA")  # Mantener transparencia
+        logo = logo.resize((int(logo.width * alto / logo.height), alto))
+        if ruta_cache:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                logo.save(ruta_cache, "PNG")
+            except OSError as e:
+                print(f"⚠️ No se pudo cachear el logo: {e}")
+        return logo
+
+    def _franja_encabezado(self, titulo):
+        franja = Image.new("RGB", (self.ancho, self.alto_encabezado + self.padding), "white")
+        draw = ImageDraw.Draw(franja)
+
+        # Logo a la izquierda (con transparencia si es PNG)
+        logo_x, logo_y, logo_width, logo_height = (0, 0, 0, 0)
+        if self.logo_path:
+            try:
+                logo = self._logo(self.alto_encabezado)
+                logo_width, logo_height = logo.size
+                logo_x, logo_y = self.padding, 100
+                franja.paste(logo, (logo_x, logo_y), logo)
+            except Exception as e:
+                print(f"⚠️ No se pudo cargar el logo: {e}")
+
+        # Título grande a la derecha del logo
+        try:
+            title_font = ImageFont.truetype("arial.ttf", 220)
+        except Exception:
+            title_font = ImageFont.load_default()
+
+        bbox = draw.textbbox((0, 0), titulo, font=title_font)
+        h_t = bbox[3] - bbox[1]
+        title_x = logo_x + logo_width + 300
+        title_y = logo_y + (logo_height - h_t) // 2
+        draw.text((title_x, title_y), titulo, fill="black", font=title_font)
+        return franja
+
+    # -------------------------
+    # Rejilla
+    # -------------------------
+    def _celda(self, buf):
+        buf.seek(0)
+        im = Image.open(buf).convert("RGB")
+        # Los gráficos ya vienen al tamaño de celda; solo se reescala si difiere de forma apreciable
+        if abs(im.width - self.cell_w) > 4 or abs(im.height - self.cell_h) > 4:
+            im = im.resize((self.cell_w, self.cell_h))
+        return im
+
+    def franjas(self, image_bytes_list, titulo):
+        """Genera las franjas del dashboard de arriba hacia abajo."""
+        yield self._franja_encabezado(titulo)
+        for inicio in range(0, len(image_bytes_list), self.cols):
+            franja = Image.new("RGB", (self.ancho, self.cell_h + self.padding), "white")
+            for col, buf in enumerate(image_bytes_list[inicio:inicio + self.cols]):
+                im = self._celda(buf)
+                franja.paste(im, (self.padding + col * (self.cell_w + self.padding), 0))
+                im.close()
+            yield franja
+
+    def componer(self, image_bytes_list, titulo, out_path, formato="png", calidad=85, compress_level=6,
+                 workers=1):
+        """Escribe el dashboard en `out_path` y devuelve estadísticas de la codificación."""
+        if formato == "pdf":
+            return self.componer_pdf(image_bytes_list, titulo, out_path, compress_level)
+        inicio = time.perf_counter()
+        writer = crear_writer(out_path, self.ancho, self.alto_total(len(image_bytes_list)), formato=formato,
+                              calidad=calidad, compress_level=compress_level, workers=workers)
+        with writer:
+            for franja in self.franjas(image_bytes_list, titulo):
+                writer.write(franja)
+        return {
+            "ruta": out_path,
+            "formato": formato,
+            "segundos_codificacion": round(writer.tiempo_codificacion, 3),
+            "segundos_total": round(time.perf_counter() - inicio, 3),
+            "bytes": os.path.getsize(out_path),
+        }
+
+    def componer_pdf(self, image_bytes_list, titulo, out_path, compress_level=6):
+        """PDF paginado: portada con el encabezado y una página por gráfico, escritas una a una."""
+        inicio = time.perf_counter()
+        with PDFPageWriter(out_path, compress_level=compress_level, titulo=titulo) as writer:
+            encabezado = self._franja_encabezado(titulo)
+            writer.write(encabezado)
+            encabezado.close()
+            for buf in image_bytes_list:
+                # los bytes del gráfico van tal cual (sin decodificar) salvo que haya que aplanarlos
+                writer.write(buf)
+        return {
+            "ruta": out_path,
+            "formato": "pdf",
+            "paginas": writer.paginas,
+            "segundos_codificacion": round(writer.tiempo_codificacion, 3),
+            "segundos_total": round(time.perf_counter() - inicio, 3),
+            "bytes": os.path.getsize(out_path),
+        }
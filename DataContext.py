@@ -0,0 +1,281 @@
+import unicodedata
+import numpy as np
+import pandas as pd
+from WorkbookCache import WorkbookCache
+from BDStreamLoader import BDStreamLoader
+from SalesCube import SalesCube
+from SalesCubeStore import SalesCubeStore
+
+
+class DataContext:
+    """Carga cada hoja del libro una sola vez y la comparte entre análisis, gráficos y Excel.
+
+    Los DataFrames expuestos son compartidos: los consumidores deben tratarlos como de solo lectura.
+    """
+
+    BD_COLUMNS = [
+        'Año', 'Mes', 'Nombre Cliente_factura', 'Nombre Centro de Operacion',
+        'Valor Total USD', 'Concepto', 'Moneda', 'Nombre Item', 'Vendedor', 'Desc Pais Cliente_factura'
+    ]
+    VENDEDOR_EXCLUIDO = 'COMERCIALIZADORA INTERNACIONAL CARIBBEAN EXOTICS S A'
+    CONCEPTOS_VALIDOS = ['FACTURA', 'ANULACIÓN FE']
+    MONEDAS_VALIDAS = ['USD', 'EUR']
+
+    # Dimensiones de texto que se guardan como categóricas ya normalizadas
+    COLUMNAS_CODIGO = ['Concepto', 'Moneda']  # strip + mayúsculas (solo se usan para filtrar)
+    COLUMNAS_NOMBRE = [
+        'Nombre Item', 'Nombre Centro de Operacion', 'Nombre Cliente_factura', 'Desc Pais Cliente_factura'
+    ]  # strip (se muestran tal cual en los reportes)
+
+    def __init__(self, input_path, excluir_items=(), cache=None, streaming=False, alias_vendedores=None,
+                 cubo_incremental=False):
+        self.INPUT_PATH = input_path
+        self.excluir_items = set(excluir_items)
+        self.streaming = streaming
+        self.cubo_incremental = cubo_incremental
+        self.alias_vendedores = dict(alias_vendedores or {})
+        # clave normalizada -> nombre canónico; compartido por BD y budget para que ambos coincidan
+        self._canon_vendedor = {}
+        for variante, canonico in self.alias_vendedores.items():
+            self._canon_vendedor[self.clave_normalizada(variante)] = canonico.strip()
+            self._canon_vendedor.setdefault(self.clave_normalizada(canonico), canonico.strip())
+        self.cache = cache or WorkbookCache(input_path)
+        if self.streaming and self.cache.externa('BD'):
+            # BD ya está en la caché columnar (carga directa desde UnoBiable): no hay hoja que recorrer
+            self.streaming = False
+        self._bd = None
+        self._budget = None
+        self._bd_filtrado = None
+        self._vendedores = None
+        self._cubo = None
+        self._resumen_vendedores = {}
+
+    @staticmethod
+    def convertir_formato_colombiano(valor):
+        if pd.isna(valor):
+            return 0.0
+        if isinstance(valor, (int, float)):
+            return float(valor)
+        if isinstance(valor, str):
+            valor_limpio = valor.replace('.', '').replace(',', '.')
+            try:
+                return float(valor_limpio)
+            except:
+                return 0.0
+        return float(valor)
+
+    # -------------------------
+    # Normalización (una sola vez, al cargar)
+    # -------------------------
+    @staticmethod
+    def clave_normalizada(texto):
+        """Clave de comparación: sin tildes, mayúsculas y espacios colapsados."""
+        texto = unicodedata.normalize('NFKD', str(texto))
+        texto = ''.join(c for c in texto if not unicodedata.combining(c))
+        return ' '.join(texto.upper().split())
+
+    @staticmethod
+    def _categorica(serie, transformar):
+        # la transformación se aplica sobre los valores únicos, no fila a fila
+        serie = serie.astype('category')
+        nuevas = pd.Series(serie.cat.categories).map(transformar)
+        serie = serie.map(dict(zip(serie.cat.categories, nuevas))).astype('category')
+        # mismo orden léxico que tendría un groupby sobre el texto original
+        return serie.cat.reorder_categories(sorted(serie.cat.categories))
+
+    def _vendedor_canonico(self, nombre):
+        nombre = nombre.strip()
+        if not nombre:
+            return nombre
+        return self._canon_vendedor.setdefault(self.clave_normalizada(nombre), nombre)
+
+    def normalizar(self, df):
+        """Convierte las dimensiones de texto a categóricas con categorías normalizadas."""
+        df = df.copy()
+        for col in self.COLUMNAS_CODIGO:
+            if col in df.columns:
+                df[col] = self._categorica(df[col], lambda v: str(v).strip().upper())
+        for col in self.COLUMNAS_NOMBRE:
+            if col in df.columns:
+                df[col] = self._categorica(df[col], lambda v: str(v).strip())
+        if 'Vendedor' in df.columns:
+            df['Vendedor'] = self._categorica(df['Vendedor'], lambda v: self._vendedor_canonico(str(v)))
+        return df
+
+    @property
+    def bd(self):
+        """Hoja BD (solo las columnas que usa el pipeline), normalizada y sin filtrar."""
+        if self._bd is None:
+            df = self.cache.read_sheet('BD', usecols=self.BD_COLUMNS)
+            df.columns = df.columns.str.strip()
+            self._bd = self.normalizar(df)
+        return self._bd
+
+    @property
+    def budget(self):
+        """Hoja 'Budget x Vendedor' con 'Valor Total USD' ya convertido a float."""
+        if self._budget is None:
+            df_bv = self.cache.read_sheet('Budget x Vendedor')
+            df_bv.columns = df_bv.columns.str.strip()
+            if 'Valor Total USD' in df_bv.columns:
+                df_bv['Valor Total USD'] = df_bv['Valor Total USD'].apply(self.convertir_formato_colombiano)
+            self._budget = self.normalizar(df_bv)
+        return self._budget
+
+    @staticmethod
+    def _por_categoria(serie, condicion):
+        """Evalúa `condicion` sobre las categorías y la propaga a las filas por código."""
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            return condicion(serie)
+        por_categoria = np.asarray(condicion(pd.Series(serie.cat.categories, dtype=object)), dtype=bool)
+        en_nulo = bool(condicion(pd.Series([None], dtype=object)).iloc[0])
+        codigos = serie.cat.codes.to_numpy()
+        mascara = np.where(codigos >= 0, por_categoria[codigos], en_nulo)
+        return pd.Series(mascara, index=serie.index)
+
+    @classmethod
+    def filtrar_filas_validas(cls, df, excluir_items):
+        return df[
+            cls._por_categoria(df['Concepto'], lambda s: s.str.upper().isin(cls.CONCEPTOS_VALIDOS)) &
+            cls._por_categoria(df['Moneda'], lambda s: s.str.upper().isin(cls.MONEDAS_VALIDAS)) &
+            ~cls._por_categoria(df['Nombre Item'], lambda s: s.isin(excluir_items)) &
+            (df['Valor Total USD'].notna()) &
+            (df['Valor Total USD'] != 0) &
+            cls._por_categoria(df['Vendedor'], lambda s: s.str.strip().str.upper() != cls.VENDEDOR_EXCLUIDO)
+        ]
+
+    @classmethod
+    def lista_vendedores(cls, serie_vendedor):
+        """Vendedores únicos en orden de aparición (sin vacíos ni la comercializadora)."""
+        vendedores = serie_vendedor.dropna()
+        vendedores = vendedores[vendedores.str.upper() != cls.VENDEDOR_EXCLUIDO].str.strip()
+        return list(vendedores[vendedores != ''].unique())
+
+    @property
+    def bd_filtrado(self):
+        """Filas de BD válidas para el dashboard (facturas/anulaciones en USD/EUR, sin ítems excluidos)."""
+        if self._bd_filtrado is None and self.streaming:
+            loader = BDStreamLoader(
+                self.INPUT_PATH, self.excluir_items, self.CONCEPTOS_VALIDOS,
+                self.MONEDAS_VALIDAS, self.VENDEDOR_EXCLUIDO
+            )
+            self._bd_filtrado = self.normalizar(loader.load())
+            self._vendedores = [self._vendedor_canonico(v) for v in dict.fromkeys(loader.vendedores)]
+        elif self._bd_filtrado is None:
+            self._bd_filtrado = self.filtrar_filas_validas(self.bd, self.excluir_items)
+        return self._bd_filtrado
+
+    @property
+    def cubo_persistido(self):
+        """True si el cubo se carga de la caché y solo agrega las filas nuevas (sin pasar por `bd_filtrado`)."""
+        return self.cubo_incremental and not self.streaming and self.cache.parquet_disponible()
+
+    @property
+    def ventas(self):
+        """Ventas válidas para el dashboard: el agregado del cubo persistido si se usa (tiene las
+        columnas Vendedor, Año, Mes y Valor Total USD, como las filas) o, si no, `bd_filtrado`."""
+        return self.cubo.df if self.cubo_persistido else self.bd_filtrado
+
+    @property
+    def cubo(self):
+        """Cubo de ventas preagregado sobre `bd_filtrado`; se construye una vez por contexto."""
+        if self._cubo is None and self.cubo_persistido:
+            # el cubo persistido solo agrega las filas de BD posteriores a la última corrida
+            store = SalesCubeStore(self.cache.CACHE_DIR, self.cache.BASE_NAME, SalesCubeStore.firma(
+                sorted(self.excluir_items), self.CONCEPTOS_VALIDOS, self.MONEDAS_VALIDAS,
+                self.VENDEDOR_EXCLUIDO, self.alias_vendedores
+            ))
+            self._cubo = store.cargar(self.bd, lambda df: self.filtrar_filas_validas(df, self.excluir_items))
+        elif self._cubo is None:
+            self._cubo = SalesCube(self.bd_filtrado)
+        return self._cubo
+
+    @property
+    def vendedores(self):
+        if self._vendedores is None:
+            if self.streaming:
+                self.bd_filtrado  # el loader recolecta los vendedores mientras recorre la hoja
+            else:
+                self._vendedores = self.lista_vendedores(self.bd['Vendedor'])
+        return self._vendedores
+
+    @property
+    def vendedores_budget(self):
+        """Vendedores con budget asignado (hoja 'Budget x Vendedor'), en orden de aparición."""
+        return self.lista_vendedores(self.budget['Vendedor'])
+
+    # -------------------------
+    # Ejecución vs budget por vendedor
+    # -------------------------
+    @staticmethod
+    def _armar_resumen(vendedores, ejecutado, budget, mes):
+        porcentaje = (ejecutado / budget * 100).where(budget > 0, 0.0)
+        faltante = (100 - porcentaje).clip(lower=0)
+        resultados = pd.DataFrame({
+            "Vendedor": vendedores,
+            "Budget": budget.round(2).values,
+            "Ejecutado": ejecutado.round(2).values,
+            "% Ejecución": porcentaje.round(2).values,
+            "% Faltante": faltante.round(2).values,
+            "Meta": 100.0,
+            "Mes": mes,
+        }).to_dict('records')
+
+        # Total compañía
+        df_res = pd.DataFrame(resultados)
+        total_budget = df_res["Budget"].sum()
+        total_ejecutado = df_res["Ejecutado"].sum()
+        total_porcentaje = (total_ejecutado / total_budget * 100) if total_budget > 0 else 0
+        total_faltante = max(0, 100 - total_porcentaje)
+        resultados.append({
+            "Vendedor": "TOTAL COMPAÑÍA",
+            "Budget": round(total_budget, 2),
+            "Ejecutado": round(total_ejecutado, 2),
+            "% Ejecución": round(total_porcentaje, 2),
+            "% Faltante": round(total_faltante, 2),
+            "Meta": 100.0,
+            "Mes": mes
+        })
+        return pd.DataFrame(resultados)
+
+    @staticmethod
+    def _sumas_por_vendedor(df, mes):
+        """Suma anual y del mes por vendedor a partir de un único agrupamiento de filas.
+
+        Cada grupo se suma con numpy en orden de fila, igual que el antiguo `df.loc[filtro].sum()`,
+        para que los totales redondeados coincidan exactamente.
+        """
+        valores = df['Valor Total USD'].to_numpy(dtype=float)
+        en_mes = (df['Mes'] == mes).to_numpy()
+        sumas = {}
+        vendedor = df['Vendedor']
+        if not isinstance(vendedor.dtype, pd.CategoricalDtype):
+            vendedor = vendedor.str.strip()
+        for vendedor, idx in df.groupby(vendedor, sort=False, observed=True).indices.items():
+            sumas[vendedor] = (valores[idx].sum(), valores[idx[en_mes[idx]]].sum())
+        return pd.DataFrame.from_dict(sumas, orient='index', columns=['anual', 'mensual'], dtype=float)
+
+    @classmethod
+    def resumen_vendedores(cls, df_validas, vendedores, df_bv, mes):
+        """Ejecutado vs budget anual y del mes para todos los vendedores con un groupby por hoja.
+
+        Devuelve (anual, mensual) con el mismo formato que el antiguo bucle por vendedor,
+        incluida la fila 'TOTAL COMPAÑÍA'.
+        """
+        if not len(vendedores):
+            return pd.DataFrame(), pd.DataFrame()
+
+        ejecutado = cls._sumas_por_vendedor(df_validas, mes).reindex(vendedores, fill_value=0.0)
+        df_bv = df_bv[df_bv['Valor Total USD'].notna() & (df_bv['Valor Total USD'] != 0)]
+        budget = cls._sumas_por_vendedor(df_bv, mes).reindex(vendedores, fill_value=0.0)
+
+        return (cls._armar_resumen(vendedores, ejecutado['anual'], budget['anual'], None),
+                cls._armar_resumen(vendedores, ejecutado['mensual'], budget['mensual'], mes))
+
+    def ejecucion_vendedores(self, mes):
+        """(anual, mensual) por vendedor, calculado una vez por mes y compartido entre etapas."""
+        if mes not in self._resumen_vendedores:
+            self._resumen_vendedores[mes] = self.resumen_vendedores(
+                self.ventas, self.vendedores, self.budget, mes
+            )
+        return self._resumen_vendedores[mes]
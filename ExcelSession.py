@@ -0,0 +1,212 @@
+import os
+import json
+import time
+from Instrumentation import medido, span
+
+
+class ExcelSession:
+    """Una sola instancia de Excel con el libro abierto, compartida por las etapas que lo editan.
+
+    El refresco de conexiones y la hoja TC usan el mismo libro abierto y se guarda una sola vez.
+    El fin del refresco se detecta por el estado de cada conexión (consultas en primer plano que
+    bloquean hasta terminar y `Refreshing` para las que siguen en segundo plano), sin esperas fijas.
+    Solo se cierran procesos de Excel abiertos por esta clase: sus PID se registran en disco para
+    poder limpiarlos si una corrida anterior se interrumpió.
+    """
+
+    XL_CALCULATION_DONE = 0  # xlDone
+    ESPERA_MINIMA = 0.05
+    ESPERA_MAXIMA = 1.0
+
+    def __init__(self, path, registro_dir=None, timeout_refresco=300):
+        self.path = path
+        self.REGISTRO_PATH = os.path.join(registro_dir or os.path.join(os.path.dirname(path), "cache"),
+                                          "excel_sesiones.json")
+        self.timeout_refresco = timeout_refresco
+        self.app = None
+        self.libro = None
+        self.pid = None
+        self._inicio = None
+
+    # -------------------------
+    # Registro de PIDs propios
+    # -------------------------
+    def _leer_registro(self):
+        try:
+            with open(self.REGISTRO_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _guardar_registro(self, registro):
+        try:
+            os.makedirs(os.path.dirname(self.REGISTRO_PATH), exist_ok=True)
+            tmp = self.REGISTRO_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(registro, f)
+            os.replace(tmp, self.REGISTRO_PATH)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el registro de sesiones de Excel: {e}")
+
+    @staticmethod
+    def _inicio_proceso(pid):
+        """Hora de inicio del proceso (para no confundir un PID reutilizado), o None sin psutil."""
+        try:
+            import psutil
+            return psutil.Process(pid).create_time()
+        except Exception:
+            return None
+
+    @staticmethod
+    def _terminar(pid, inicio=None):
+        """Termina el Excel `pid` si sigue vivo y es el mismo proceso que se registró.
+
+        Sin psutil no se puede confirmar nombre ni hora de inicio (el PID pudo reutilizarse tras
+        `app.quit()`), así que no se termina nada.
+        """
+        try:
+            import psutil
+        except ImportError:
+            return False
+        try:
+            proc = psutil.Process(pid)
+            if inicio is not None and abs(proc.create_time() - inicio) > 1:
+                return False  # el PID ya es de otro proceso
+            if "excel" not in proc.name().lower():
+                return False
+            proc.terminate()
+            proc.wait(timeout=5)
+            return True
+        except Exception:
+            return False
+
+    def limpiar_huerfanos(self):
+        """Cierra los Excel que abrió una sesión anterior y quedaron colgados (nunca otros)."""
+        registro = self._leer_registro()
+        if not registro:
+            return
+        if self._inicio_proceso(os.getpid()) is None:
+            # sin psutil no se puede confirmar que el PID siga siendo ese Excel
+            print("⚠️ psutil no instalado: no se limpian los Excel de corridas anteriores")
+            return
+        for entrada in registro:
+            if entrada.get("inicio") is not None and self._terminar(entrada["pid"], entrada["inicio"]):
+                print(f"🧹 Excel huérfano de una corrida anterior terminado: PID {entrada['pid']}")
+        self._guardar_registro([])
+
+    # -------------------------
+    # Ciclo de vida
+    # -------------------------
+    def abrir(self):
+        if self.libro is not None:
+            return self.libro
+        with span("excel.abrir"):
+            return self._abrir()
+
+    def _abrir(self):
+        import xlwings as xw
+
+        self.limpiar_huerfanos()
+        self.app = xw.App(visible=False, add_book=False)
+        self.pid = self.app.pid
+        self._inicio = self._inicio_proceso(self.pid)
+        self._guardar_registro(self._leer_registro() + [{"pid": self.pid, "inicio": self._inicio}])
+        self.app.display_alerts = False
+        self.app.screen_updating = False
+        self.libro = self.app.books.open(self.path)
+        print(f"📗 Libro abierto en Excel (PID {self.pid})")
+        return self.libro
+
+    @medido("excel.guardar")
+    def guardar(self):
+        self.libro.save()
+
+    def cerrar(self):
+        try:
+            if self.libro is not None:
+                self.libro.close()
+            if self.app is not None:
+                self.app.quit()
+        except Exception as e:
+            print(f"⚠️ Error cerrando Excel: {e}")
+        finally:
+            if self.pid is not None:
+                # si Excel no salió por sí solo se termina este proceso, y solo este
+                self._terminar(self.pid, self._inicio)
+                self._guardar_registro([e for e in self._leer_registro() if e["pid"] != self.pid])
+            self.app = self.libro = self.pid = None
+
+    def __enter__(self):
+        self.abrir()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+
+    # -------------------------
+    # Refresco de conexiones
+    # -------------------------
+    @staticmethod
+    def _subconexion(conexion):
+        for atributo in ("OLEDBConnection", "ODBCConnection"):
+            try:
+                return getattr(conexion, atributo)
+            except Exception:
+                continue
+        return None
+
+    def _esperar(self, condicion, limite, descripcion):
+        """Espera a que `condicion()` sea falsa con consultas cada vez más espaciadas."""
+        espera = self.ESPERA_MINIMA
+        while condicion():
+            if time.monotonic() > limite:
+                print(f"⚠️ Timeout esperando {descripcion}")
+                return False
+            time.sleep(espera)
+            espera = min(espera * 2, self.ESPERA_MAXIMA)
+        return True
+
+    @medido("excel.refrescar_conexiones")
+    def refrescar_conexiones(self, timeout=None):
+        """Refresca cada conexión del libro y espera a que terminen las consultas y el cálculo."""
+        libro = self.abrir()
+        limite = time.monotonic() + (timeout or self.timeout_refresco)
+        inicio = time.perf_counter()
+        completo = True
+
+        en_segundo_plano = []
+        for conexion in libro.api.Connections:
+            sub = self._subconexion(conexion)
+            try:
+                with span("excel.conexion", conexion=conexion.Name):
+                    if sub is None:
+                        conexion.Refresh()
+                    else:
+                        # en primer plano Refresh bloquea hasta que la consulta termina; luego se restaura
+                        segundo_plano = sub.BackgroundQuery
+                        sub.BackgroundQuery = False
+                        try:
+                            conexion.Refresh()
+                        finally:
+                            sub.BackgroundQuery = segundo_plano
+            except Exception as e:
+                print(f"❌ Error refrescando la conexión {conexion.Name}: {e}")
+                completo = False
+                continue
+            if sub is not None and sub.Refreshing:
+                en_segundo_plano.append((conexion.Name, sub))
+            print(f"🔄 Conexión actualizada: {conexion.Name} ({time.perf_counter() - inicio:.1f}s)")
+
+        with span("excel.espera_consultas", en_segundo_plano=len(en_segundo_plano)):
+            for nombre, sub in en_segundo_plano:
+                completo &= self._esperar(lambda: sub.Refreshing, limite, f"la conexión {nombre}")
+
+            # Consultas asíncronas restantes (tablas de consulta, Power Query) y recálculo del libro
+            self.app.api.CalculateUntilAsyncQueriesDone()
+            while self.app.api.CalculationState != self.XL_CALCULATION_DONE:
+                if time.monotonic() > limite:
+                    print("⚠️ Timeout esperando el cálculo del libro")
+                    return False
+                self.app.api.Calculate()
+        print(f"✅ Conexiones y cálculo terminados en {time.perf_counter() - inicio:.1f}s")
+        return completo
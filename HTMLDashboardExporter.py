@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import base64
+import hashlib
+from io import BytesIO
+from PIL import Image
+
+
+class HTMLDashboardExporter:
+    """Escribe el dashboard como un único HTML interactivo y autocontenido (sin rasterizar).
+
+    Las figuras plotly (dicts de `fig.to_dict()`) se dibujan en el navegador de quien abre el
+    archivo: no hace falta kaleido ni Chromium al generarlo. plotly.js va incrustado una sola vez y
+    las figuras van en un único bloque JSON en el que los fragmentos repetidos entre paneles (la
+    plantilla de estilo, paletas, ejes...) se guardan una vez y se referencian con {"$ref": n}.
+    El logo se incrusta en base64, así el archivo se puede publicar tal cual en una carpeta compartida.
+    """
+
+    MIN_COMPARTIDO = 64  # bytes de JSON a partir de los cuales vale la pena compartir un fragmento
+    ALTO_LOGO = 120
+
+    def __init__(self, logo_path=None, cols=2):
+        self.logo_path = logo_path
+        self.cols = cols
+
+    # -------------------------
+    # Datos compartidos
+    # -------------------------
+    @staticmethod
+    def _normalizar(figura):
+        # numpy/pandas -> tipos JSON, con el mismo codificador que usa plotly
+        from plotly.utils import PlotlyJSONEncoder
+        return json.loads(json.dumps(figura, cls=PlotlyJSONEncoder))
+
+    @staticmethod
+    def _clave(nodo):
+        texto = json.dumps(nodo, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha1(texto.encode()).hexdigest(), len(texto)
+
+    def _contar(self, nodo, conteo):
+        if isinstance(nodo, (dict, list)) and nodo:
+            clave, largo = self._clave(nodo)
+            if largo >= self.MIN_COMPARTIDO:
+                conteo[clave] = conteo.get(clave, 0) + 1
+            for hijo in (nodo.values() if isinstance(nodo, dict) else nodo):
+                self._contar(hijo, conteo)
+
+    def _reemplazar(self, nodo, conteo, compartidos, indices):
+        if not isinstance(nodo, (dict, list)) or not nodo:
+            return nodo
+        clave, largo = self._clave(nodo)
+        if largo >= self.MIN_COMPARTIDO and conteo.get(clave, 0) > 1:
+            if clave not in indices:
+                # se guarda el nodo completo; lo que tenga dentro ya no se vuelve a revisar
+                indices[clave] = len(compartidos)
+                compartidos.append(nodo)
+            return {"$ref": indices[clave]}
+        if isinstance(nodo, dict):
+            return {k: self._reemplazar(v, conteo, compartidos, indices) for k, v in nodo.items()}
+        return [self._reemplazar(v, conteo, compartidos, indices) for v in nodo]
+
+    def datos(self, figuras):
+        """{"compartidos": [...], "figuras": [...]} con los fragmentos repetidos deduplicados."""
+        figuras = [self._normalizar(f) for f in figuras]
+        conteo = {}
+        for figura in figuras:
+            self._contar(figura, conteo)
+        compartidos, indices = [], {}
+        figuras = [self._reemplazar(f, conteo, compartidos, indices) for f in figuras]
+        return {"compartidos": compartidos, "figuras": figuras}
+
+    # -------------------------
+    # HTML
+    # -------------------------
+    def _logo_base64(self):
+        if not self.logo_path:
+            return None
+        try:
+            logo = Image.open(self.logo_path).convert("RGBA")
+            logo = logo.resize((int(logo.width * self.ALTO_LOGO / logo.height), self.ALTO_LOGO), Image.LANCZOS)
+            buf = BytesIO()
+            logo.save(buf, "PNG", optimize=True)
+            return base64.b64encode(buf.getvalue()).decode()
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar el logo: {e}")
+            return None
+
+    @staticmethod
+    def _escapar(texto):
+        return texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+    @staticmethod
+    def _paneles_responsivos(figura):
+        # el ancho lo pone la rejilla del navegador; se conserva el alto lógico del panel
+        layout = figura.setdefault("layout", {})
+        layout.pop("width", None)
+        layout["autosize"] = True
+        return figura
+
+    def exportar(self, figuras, titulo, out_path):
+        """Escribe el HTML con las figuras (None se omite) y devuelve estadísticas como `componer`."""
+        from plotly.offline import get_plotlyjs
+
+        inicio = time.perf_counter()
+        figuras = [self._paneles_responsivos(self._normalizar(f)) for f in figuras if f is not None]
+        datos = json.dumps(self.datos(figuras), separators=(",", ":"), ensure_ascii=False)
+        datos = datos.replace("</", "<\\/")  # no cerrar el <script> desde dentro del JSON
+        logo = self._logo_base64()
+        titulo_html = self._escapar(titulo)
+
+        tmp = out_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("<!DOCTYPE html>\n<html lang=\"es\">\n<head>\n<meta charset=\"utf-8\">\n")
+            f.write(f"<title>{titulo_html}</title>\n")
+            f.write(
+                "<style>\n"
+                "body{font-family:Arial,Helvetica,sans-serif;margin:0;background:#fff;color:#000}\n"
+                "header{display:flex;align-items:center;gap:40px;padding:20px 30px}\n"
+                "header h1{font-size:2.2em;margin:0}\n"
+                f".rejilla{{display:grid;grid-template-columns:repeat({self.cols},minmax(0,1fr));gap:20px;padding:20px 30px}}\n"
+                "@media (max-width:1000px){.rejilla{grid-template-columns:1fr}}\n"
+                "</style>\n"
+            )
+            # plotly.js una sola vez, para todos los paneles
+            f.write("<script>")
+            f.write(get_plotlyjs())
+            f.write("</script>\n</head>\n<body>\n<header>")
+            if logo:
+                f.write(f"<img src=\"data:image/png;base64,{logo}\" alt=\"logo\">")
+            f.write(f"<h1>{titulo_html}</h1></header>\n<div class=\"rejilla\">\n")
+            for i in range(len(figuras)):
+                f.write(f"<div id=\"panel{i}\"></div>\n")
+            f.write("</div>\n<script type=\"application/json\" id=\"datos\">")
+            f.write(datos)
+            f.write(
+                "</script>\n<script>\n"
+                "(function(){\n"
+                "var d=JSON.parse(document.getElementById('datos').textContent);\n"
+                "function r(n){\n"
+                " if(Array.isArray(n))return n.map(r);\n"
+                " if(n&&typeof n==='object'){\n"
+                "  if(Object.keys(n).length===1&&typeof n['$ref']==='number')"
+                "return r(d.compartidos[n['$ref']]);\n"  # copia nueva: plotly modifica lo que recibe
+                "  var o={};for(var k in n)o[k]=r(n[k]);return o;}\n"
+                " return n;}\n"
+                "d.figuras.forEach(function(fig,i){fig=r(fig);"
+                "Plotly.newPlot('panel'+i,fig.data||[],fig.layout||{},{responsive:true,displaylogo:false});});\n"
+                "})();\n</script>\n</body>\n</html>\n"
+            )
+        os.replace(tmp, out_path)
+        return {
+            "ruta": out_path,
+            "formato": "html",
+            "paneles": len(figuras),
+            "segundos_total": round(time.perf_counter() - inicio, 3),
+            "bytes": os.path.getsize(out_path),
+        }
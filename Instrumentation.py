@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import functools
+import tracemalloc as _tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+
+
+def rss_pico_mb():
+    """Pico de memoria residente del proceso en MB (máximo histórico), o None si no se puede medir."""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo da en KB, macOS en bytes
+        return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil  # opcional; en Windows da el pico del working set
+        memoria = psutil.Process().memory_info()
+        return round(getattr(memoria, "peak_wset", memoria.rss) / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def medir_llamada(funcion, *args):
+    """Ejecuta `funcion(*args)` y devuelve (resultado, métricas); para medir dentro de otro proceso
+    y registrar el span al recibir el resultado (ver `Instrumentation.registrar`)."""
+    pared, cpu = time.perf_counter(), time.process_time()
+    resultado = funcion(*args)
+    return resultado, {
+        "pared_s": round(time.perf_counter() - pared, 4),
+        "cpu_s": round(time.process_time() - cpu, 4),
+        "rss_pico_mb": rss_pico_mb(),
+        "pid": os.getpid(),
+    }
+
+
+class _Span:
+    def __init__(self, id_, nombre, padre, atributos):
+        self.id = id_
+        self.nombre = nombre
+        self.padre = padre
+        self.atributos = atributos
+        self.pico_traza = 0  # máximo de tracemalloc visto mientras el span estaba abierto
+
+
+class Instrumentation:
+    """Spans anidados (tiempo de pared, CPU, pico de RSS y de tracemalloc) y reporte JSON de la corrida.
+
+    `span(nombre)` es un context manager (el decorador `medido` del módulo lo usa); los spans
+    abiertos en el mismo hilo se anidan. El CPU se da del proceso (`cpu_s`, incluye otros hilos) y del hilo (`cpu_hilo_s`).
+    El RSS es el pico histórico del proceso: `rss_delta_mb` > 0 indica que el span lo subió.
+    Con `tracemalloc` se mide además el pico de memoria de Python dentro de cada span (hace más lenta
+    la corrida, por eso va apagado por defecto). Con `perfil` se guarda un volcado de cProfile del
+    span con ese nombre (p. ej. "etapa.dashboard") en `perfil_dir`, legible con pstats o snakeviz.
+    """
+
+    def __init__(self, tracemalloc=False, perfil=None, perfil_dir=None):
+        self.tracemalloc = tracemalloc
+        self.perfil = perfil
+        self.perfil_dir = perfil_dir
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self.spans = []
+        self.perfiles = []
+        self._abiertos = {}  # id -> _Span, de todos los hilos (tracemalloc es global al proceso)
+        self._siguiente = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._perfilando = False
+        if tracemalloc and not _tracemalloc.is_tracing():
+            _tracemalloc.start()
+
+    # -------------------------
+    # Spans
+    # -------------------------
+    def _pila(self):
+        pila = getattr(self._local, "pila", None)
+        if pila is None:
+            pila = self._local.pila = []
+        return pila
+
+    def _acumular_traza(self):
+        # el pico de tracemalloc es uno solo: se reparte entre los spans abiertos y se reinicia
+        actual, pico = _tracemalloc.get_traced_memory()
+        for abierto in self._abiertos.values():
+            abierto.pico_traza = max(abierto.pico_traza, pico)
+        _tracemalloc.reset_peak()
+        return actual
+
+    def _nuevo(self, nombre, atributos, padre=None):
+        pila = self._pila()
+        with self._lock:
+            self._siguiente += 1
+            span = _Span(self._siguiente, nombre, pila[-1].id if pila else padre, atributos)
+        return span
+
+    def span_abierto(self):
+        """Id del span abierto en este hilo (para colgar de él spans de otros hilos), o None."""
+        pila = self._pila()
+        return pila[-1].id if pila else None
+
+    def _guardar(self, registro):
+        with self._lock:
+            self.spans.append(registro)
+
+    @contextmanager
+    def span(self, nombre, padre=None, **atributos):
+        """Mide el bloque; `atributos` (y lo que se agregue a `s.atributos` dentro) van al reporte.
+        `padre` se usa si en este hilo no hay un span abierto (trabajo repartido en un pool de hilos)."""
+        s = self._nuevo(nombre, atributos, padre)
+        pila = self._pila()
+        traza = self.tracemalloc and _tracemalloc.is_tracing()
+        if traza:
+            with self._lock:
+                traza_inicio = self._acumular_traza()
+                self._abiertos[s.id] = s
+        perfil = None
+        if self.perfil == nombre and not self._perfilando:
+            import cProfile
+            self._perfilando = True  # cProfile no admite dos perfiles activos a la vez
+            perfil = cProfile.Profile()
+        rss_inicio = rss_pico_mb()
+        pared, cpu, cpu_hilo = time.perf_counter(), time.process_time(), time.thread_time()
+        pila.append(s)
+        error = None
+        if perfil is not None:
+            perfil.enable()
+        try:
+            yield s
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            registro = {
+                "id": s.id,
+                "padre": s.padre,
+                "nombre": nombre,
+                "hilo": threading.current_thread().name,
+                "inicio_s": round(pared - self._t0, 4),
+                "pared_s": round(time.perf_counter() - pared, 4),
+                "cpu_s": round(time.process_time() - cpu, 4),
+                "cpu_hilo_s": round(time.thread_time() - cpu_hilo, 4),
+            }
+            pila.pop()
+            rss = rss_pico_mb()
+            registro["rss_pico_mb"] = rss
+            registro["rss_delta_mb"] = round(rss - rss_inicio, 1) if rss is not None and rss_inicio is not None else None
+            if traza:
+                with self._lock:
+                    self._acumular_traza()
+                    del self._abiertos[s.id]
+                registro["tracemalloc_pico_mb"] = round(max(0, s.pico_traza - traza_inicio) / (1024 * 1024), 2)
+            if error:
+                registro["error"] = error
+            if s.atributos:
+                registro["atributos"] = s.atributos
+            if perfil is not None:
+                registro["perfil"] = self._volcar_perfil(perfil, nombre)
+                self._perfilando = False
+            self._guardar(registro)
+
+    def registrar(self, nombre, metricas, **atributos):
+        """Registra como hijo del span actual un span medido en otro proceso (ver `medir_llamada`)."""
+        s = self._nuevo(nombre, atributos)
+        registro = {"id": s.id, "padre": s.padre, "nombre": nombre, "hilo": threading.current_thread().name}
+        registro.update(metricas)
+        if atributos:
+            registro["atributos"] = atributos
+        self._guardar(registro)
+
+    def _volcar_perfil(self, perfil, nombre):
+        carpeta = self.perfil_dir or os.getcwd()
+        ruta = os.path.join(carpeta, f"perfil_{nombre}_{datetime.now():%Y%m%d_%H%M%S}.prof")
+        try:
+            os.makedirs(carpeta, exist_ok=True)
+            perfil.dump_stats(ruta)
+            self.perfiles.append(ruta)
+            print(f"🔬 Perfil de {nombre} guardado en {ruta}")
+            return ruta
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el perfil de {nombre}: {e}")
+            return None
+
+    # -------------------------
+    # Reporte
+    # -------------------------
+    def reporte(self, **extra):
+        """Diccionario serializable con todos los spans de la corrida ordenados por inicio."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda r: (r.get("inicio_s", float("inf")), r["id"]))
+        return {
+            "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+            "fin": datetime.now().isoformat(timespec="seconds"),
+            "duracion_s": round(time.perf_counter() - self._t0, 3),
+            "pid": os.getpid(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "rss_pico_mb": rss_pico_mb(),
+            "tracemalloc": self.tracemalloc,
+            "perfiles": self.perfiles,
+            **extra,
+            "spans": spans,
+        }
+
+    def guardar(self, carpeta, conservar=None, **extra):
+        """Escribe el reporte como `corrida_<fecha_hora>.json` en `carpeta` y devuelve la ruta;
+        con `conservar` se borran los reportes más antiguos que excedan esa cantidad."""
+        ruta = os.path.join(carpeta, f"corrida_{datetime.fromtimestamp(self.inicio):%Y%m%d_%H%M%S}.json")
+        try:
+            os.makedirs(carpeta, exist_ok=True)
+            tmp = ruta + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.reporte(**extra), f, indent=1, ensure_ascii=False, default=str)
+            os.replace(tmp, ruta)
+            if conservar:
+                anteriores = sorted(f for f in os.listdir(carpeta) if f.startswith("corrida_") and f.endswith(".json"))
+                for archivo in anteriores[:-conservar]:
+                    os.remove(os.path.join(carpeta, archivo))
+            print(f"📊 Reporte de la corrida en {ruta}")
+            return ruta
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el reporte de la corrida: {e}")
+            return None
+
+
+class _SinInstrumentacion:
+    """Instrumentación apagada: los spans no miden ni se acumulan (uso de los módulos fuera de una corrida)."""
+
+    @contextmanager
+    def span(self, nombre, padre=None, **atributos):
+        yield _Span(None, nombre, padre, atributos)
+
+    def span_abierto(self):
+        return None
+
+    def registrar(self, nombre, metricas, **atributos):
+        pass
+
+
+# Instrumentación del proceso: los módulos usan `span`/`medido` sin recibirla por parámetro.
+# Por defecto no registra nada; generate_report la activa con `iniciar` y la cierra con `detener`.
+_actual = _SinInstrumentacion()
+
+
+def iniciar(**kwargs):
+    global _actual
+    _actual = Instrumentation(**kwargs)
+    return _actual
+
+
+def detener():
+    """Vuelve a la instrumentación apagada; devuelve la que estaba activa (o None)."""
+    global _actual
+    anterior = _actual if isinstance(_actual, Instrumentation) else None
+    _actual = _SinInstrumentacion()
+    if anterior is not None and anterior.tracemalloc and _tracemalloc.is_tracing():
+        _tracemalloc.stop()
+    return anterior
+
+
+def actual():
+    return _actual
+
+
+def span(nombre, padre=None, **atributos):
+    return _actual.span(nombre, padre, **atributos)
+
+
+def span_actual():
+    return _actual.span_abierto()
+
+
+def registrar(nombre, metricas, **atributos):
+    _actual.registrar(nombre, metricas, **atributos)
+
+
+def medido(nombre=None):
+    """Decorador: cada llamada es un span (por defecto con el nombre calificado de la función) de la
+    instrumentación activa en el momento de la llamada."""
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__qualname__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with _actual.span(etiqueta):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
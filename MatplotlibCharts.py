@@ -0,0 +1,167 @@
+from io import BytesIO
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.patches import Wedge
+from matplotlib.ticker import FuncFormatter
+
+
+class MatplotlibCharts:
+    """Paneles del dashboard dibujados con matplotlib (Agg) en lugar de plotly + kaleido.
+
+    Reproducen los gauges, donas, barras y tablas de `create_plots_in_memory` (mismos colores y
+    títulos) sin arrancar un navegador. Son métodos estáticos que reciben listas/números y
+    devuelven los bytes PNG, para poder ejecutarse en el pool de ChartRenderer y cachearse.
+    Los tamaños de letra se dan en px lógicos de plotly y se convierten a puntos.
+    """
+
+    COLOR_TITULO = "black"
+    FONDO_EJES = "#f2f2f2"  # equivalente a plot_bgcolor='rgba(240,240,240,0.8)' sobre blanco
+
+    @staticmethod
+    def _pt(px):
+        # plotly dibuja a 100 px lógicos por pulgada; matplotlib usa 72 puntos por pulgada
+        return px * 0.72
+
+    @staticmethod
+    def _abreviado(valor, _pos=None):
+        # formato de eje como plotly: 500k, 1.5M
+        for limite, sufijo in ((1e9, "B"), (1e6, "M"), (1e3, "k")):
+            if abs(valor) >= limite:
+                return f"{valor / limite:g}{sufijo}"
+        return f"{valor:g}"
+
+    @staticmethod
+    def _figura(figsize, dpi, titulo):
+        fig = Figure(figsize=figsize, dpi=dpi, facecolor="white")
+        fig.suptitle(titulo, fontsize=MatplotlibCharts._pt(24), fontweight="bold",
+                     color=MatplotlibCharts.COLOR_TITULO, y=0.97)
+        return fig
+
+    @staticmethod
+    def _png(fig, dpi):
+        buf = BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi, facecolor="white")
+        return buf.getvalue()
+
+    # -------------------------
+    # Gauge (indicador semicircular)
+    # -------------------------
+    @staticmethod
+    def gauge(titulo, valor, maximo, anotacion=None, figsize=(6, 3.5), dpi=200, color="#008000"):
+        pt = MatplotlibCharts._pt
+        fig = MatplotlibCharts._figura(figsize, dpi, titulo)
+        ax = fig.add_axes([0.05, 0.02, 0.9, 0.78])
+        ax.set_aspect("equal")
+        ax.axis("off")
+        ax.set_xlim(-1.25, 1.25)
+        ax.set_ylim(-0.45, 1.1)
+
+        # Fondo del gauge y barra de avance (en plotly la barra ocupa el centro del arco)
+        ax.add_patch(Wedge((0, 0), 1.0, 0, 180, width=0.35, facecolor="white", edgecolor="#444444", linewidth=1))
+        fraccion = min(max(valor / maximo, 0), 1) if maximo else 0
+        if fraccion > 0:
+            ax.add_patch(Wedge((0, 0), 0.92, 180 - 180 * fraccion, 180, width=0.2, facecolor=color))
+
+        # Marcas del eje
+        for f in np.linspace(0, 1, 6):
+            ang = np.pi * (1 - f)
+            ax.plot([np.cos(ang), 1.06 * np.cos(ang)], [np.sin(ang), 1.06 * np.sin(ang)], color="#444444", lw=1)
+            ax.text(1.16 * np.cos(ang), 1.16 * np.sin(ang), f"{maximo * f / 1e6:,.1f}M",
+                    ha="center", va="center", fontsize=pt(12))
+
+        ax.text(0, 0.02, f"${valor:,.2f}", ha="center", va="top", fontsize=pt(40) * 0.8)
+        if anotacion:
+            fig.text(0.98, 0.08, anotacion, ha="right", va="bottom", fontsize=pt(24), color="black")
+        return MatplotlibCharts._png(fig, dpi)
+
+    # -------------------------
+    # Dona (ventas por sede)
+    # -------------------------
+    @staticmethod
+    def dona(titulo, etiquetas, valores, colores, figsize=(8, 5), dpi=200):
+        pt = MatplotlibCharts._pt
+        fig = MatplotlibCharts._figura(figsize, dpi, titulo)
+        ax = fig.add_axes([0.02, 0.02, 0.62, 0.82])
+        ax.set_aspect("equal")
+        total = sum(valores)
+        if total > 0:
+            colores = [colores[i % len(colores)] for i in range(len(valores))]
+            cunas, _ = ax.pie(valores, colors=colores, startangle=90, counterclock=False,
+                              wedgeprops={"width": 0.55, "edgecolor": "white"})
+            for cuna, v in zip(cunas, valores):
+                if v / total < 0.04:
+                    continue  # como plotly, no se rotulan porciones muy pequeñas
+                ang = np.deg2rad((cuna.theta1 + cuna.theta2) / 2)
+                ax.text(0.725 * np.cos(ang), 0.725 * np.sin(ang), f"${v:,.0f}\n({v / total:.1%})",
+                        ha="center", va="center", fontsize=pt(20) * 0.7, color="black")
+            ax.text(0, 0.02, "Total", ha="center", va="bottom", fontsize=pt(16))
+            ax.text(0, -0.02, f"${total:,.0f}", ha="center", va="top", fontsize=pt(16), fontweight="bold")
+            fig.legend(cunas, etiquetas, loc="center left", bbox_to_anchor=(0.66, 0.5), frameon=False,
+                       fontsize=pt(14))
+        else:
+            ax.axis("off")
+        return MatplotlibCharts._png(fig, dpi)
+
+    # -------------------------
+    # Barras (top países)
+    # -------------------------
+    @staticmethod
+    def barras(titulo, etiquetas, valores, colores, xlabel="", ylabel="", figsize=(8, 4.5), dpi=200):
+        pt = MatplotlibCharts._pt
+        fig = MatplotlibCharts._figura(figsize, dpi, titulo)
+        ax = fig.add_axes([0.12, 0.16, 0.84, 0.66])
+        ax.set_facecolor(MatplotlibCharts.FONDO_EJES)
+        x = np.arange(len(valores))
+        ax.bar(x, valores, color=[colores[i % len(colores)] for i in range(len(valores))], width=0.8, zorder=2)
+        ax.grid(axis="y", color="white", linewidth=1, zorder=1)
+        for side in ax.spines.values():
+            side.set_visible(False)
+        ax.set_xticks(x)
+        ax.set_xticklabels(etiquetas, fontsize=pt(12))
+        ax.tick_params(axis="y", labelsize=pt(12), length=0)
+        ax.yaxis.set_major_formatter(FuncFormatter(MatplotlibCharts._abreviado))
+        ax.tick_params(axis="x", length=0)
+        ax.set_xlabel(xlabel, fontsize=pt(14))
+        ax.set_ylabel(ylabel, fontsize=pt(14))
+        if len(valores):
+            ax.set_ylim(0, max(max(valores), 0) * 1.15 or 1)
+        for xi, v in zip(x, valores):
+            ax.text(xi, v, f"${v:,.0f}", ha="center", va="bottom", fontsize=pt(12))
+        return MatplotlibCharts._png(fig, dpi)
+
+    # -------------------------
+    # Tabla (top clientes)
+    # -------------------------
+    @staticmethod
+    def tabla(titulo, encabezados, filas, figsize=(8, 3), dpi=200):
+        pt = MatplotlibCharts._pt
+        fig = MatplotlibCharts._figura(figsize, dpi, titulo)
+        ax = fig.add_axes([0.06, 0.04, 0.88, 0.76])
+        ax.axis("off")
+        filas = [list(f) for f in filas]
+        if not filas:
+            # matplotlib no dibuja una tabla sin celdas (plotly sí): una fila "Sin datos" mantiene el panel
+            filas = [["Sin datos"] + [""] * (len(encabezados) - 1)]
+        n = len(filas)
+        # alturas relativas de plotly: encabezado 30px, filas 25px
+        alto_total = 30 + 25 * n
+        alto_util = min(1.0, alto_total / (fig.get_figheight() * 100 * 0.76))
+        tabla = ax.table(
+            cellText=filas, colLabels=encabezados, loc="upper center",
+            cellLoc="left", colLoc="left", bbox=[0, 1 - alto_util, 1, alto_util],
+        )
+        tabla.auto_set_font_size(False)
+        for (fila, col), celda in tabla.get_celld().items():
+            celda.set_edgecolor("#c8c8c8")
+            celda.set_linewidth(0.5)
+            celda.get_text().set_horizontalalignment("left" if col == 0 else "right")
+            celda.PAD = 0.02
+            if fila == 0:
+                celda.set_facecolor("#003366")
+                celda.set_text_props(color="white", fontweight="bold", fontsize=pt(20) * 0.8)
+                celda.set_height(30 / alto_total * alto_util)
+            else:
+                celda.set_facecolor("white" if (fila - 1) % 2 == 0 else "#f0f0f0")
+                celda.set_text_props(color="black", fontsize=pt(16) * 0.8)
+                celda.set_height(25 / alto_total * alto_util)
+        return MatplotlibCharts._png(fig, dpi)
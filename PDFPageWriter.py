@@ -0,0 +1,183 @@
+import os
+import time
+import zlib
+import struct
+from io import BytesIO
+from PIL import Image
+
+
+class PDFPageWriter:
+    """Escribe un PDF página a página, con una imagen por página, sin tener el documento en memoria.
+
+    Cada página (encabezado o gráfico) se escribe en el archivo en cuanto llega y se libera; solo se
+    guardan los offsets de los objetos para la tabla xref del final. Los JPEG se incrustan tal cual
+    (DCTDecode) y los PNG RGB de 8 bits se incrustan con sus datos IDAT sin recomprimir (FlateDecode
+    con predictor PNG); el resto se aplana sobre blanco y se comprime con zlib.
+    Las páginas son A4 apaisado (o vertical si la imagen es más alta que ancha) con la imagen centrada.
+    Se escribe en `path + ".tmp"` y solo al cerrar sin errores reemplaza a `path`: un fallo a mitad
+    no deja un PDF truncado que luego se adjunte al correo.
+    """
+
+    A4 = (842, 595)  # puntos, apaisado
+    MARGEN = 24
+
+    def __init__(self, path, compress_level=6, titulo=None):
+        self.path = path
+        self.compress_level = compress_level
+        self.paginas = 0
+        self.tiempo_codificacion = 0.0
+        self._offsets = {}
+        self._kids = []
+        self._siguiente = 3  # 1 = catálogo, 2 = árbol de páginas (se escribe al cerrar)
+        self._tmp = path + ".tmp"
+        self._f = open(self._tmp, "wb")
+        self._f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._objeto(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._info = None
+        if titulo:
+            self._info = self._nuevo_id()
+            self._objeto(self._info, b"<< /Title " + self._texto_pdf(titulo) + b" /Producer (automatizacion_reportes) >>")
+
+    @staticmethod
+    def _texto_pdf(texto):
+        # UTF-16BE con BOM para que acentos y ñ salgan bien en el visor
+        return b"<" + ("\ufeff" + texto).encode("utf-16-be").hex().upper().encode() + b">"
+
+    def _nuevo_id(self):
+        self._siguiente += 1
+        return self._siguiente - 1
+
+    def _objeto(self, num, cuerpo, stream=None):
+        self._offsets[num] = self._f.tell()
+        self._f.write(f"{num} 0 obj\n".encode())
+        self._f.write(cuerpo)
+        if stream is not None:
+            self._f.write(b"\nstream\n")
+            self._f.write(stream)
+            self._f.write(b"\nendstream")
+        self._f.write(b"\nendobj\n")
+
+    # -------------------------
+    # Imágenes
+    # -------------------------
+    @staticmethod
+    def _idat_png(datos):
+        """(ancho, alto, IDAT concatenado) si el PNG es RGB 8 bits sin entrelazar; None si no."""
+        if datos[:8] != b"\x89PNG\r\n\x1a\n":
+            return None
+        pos, idat, cabecera = 8, [], None
+        while pos + 8 <= len(datos):
+            largo, tipo = struct.unpack(">I4s", datos[pos:pos + 8])
+            contenido = datos[pos + 8:pos + 8 + largo]
+            if tipo == b"IHDR":
+                cabecera = struct.unpack(">IIBBBBB", contenido)
+            elif tipo == b"IDAT":
+                idat.append(contenido)
+            elif tipo == b"IEND":
+                break
+            pos += 12 + largo
+        if cabecera is None or not idat:
+            return None
+        ancho, alto, bits, color, _, _, entrelazado = cabecera
+        if bits != 8 or color != 2 or entrelazado:
+            return None
+        return ancho, alto, b"".join(idat)
+
+    def _imagen(self, datos):
+        """(diccionario XObject sin cerrar, stream, ancho, alto) para los bytes de una imagen."""
+        png = self._idat_png(datos)
+        if png is not None:
+            ancho, alto, idat = png
+            parametros = f"/DecodeParms << /Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns {ancho} >>"
+            return f"/Filter /FlateDecode {parametros}", idat, ancho, alto
+
+        im = Image.open(BytesIO(datos))
+        if im.format == "JPEG" and im.mode in ("RGB", "L"):
+            espacio = "/DeviceRGB" if im.mode == "RGB" else "/DeviceGray"
+            return f"/Filter /DCTDecode /ColorSpace {espacio}", datos, im.width, im.height
+
+        if im.mode in ("RGBA", "LA", "P"):
+            # PDF sin máscara de transparencia: se aplana sobre blanco como en el dashboard
+            im = im.convert("RGBA")
+            fondo = Image.new("RGB", im.size, "white")
+            fondo.paste(im, mask=im.getchannel("A"))
+            im = fondo
+        im = im.convert("RGB")
+        return "/Filter /FlateDecode", zlib.compress(im.tobytes(), self.compress_level), im.width, im.height
+
+    def _tamano_pagina(self, ancho, alto):
+        pagina_w, pagina_h = self.A4 if ancho >= alto else self.A4[::-1]
+        escala = min((pagina_w - 2 * self.MARGEN) / ancho, (pagina_h - 2 * self.MARGEN) / alto)
+        return pagina_w, pagina_h, ancho * escala, alto * escala
+
+    def write(self, imagen):
+        """Agrega una página con `imagen` (bytes, BytesIO o PIL.Image)."""
+        inicio = time.perf_counter()
+        if isinstance(imagen, Image.Image):
+            buf = BytesIO()
+            imagen.convert("RGB").save(buf, "PNG", compress_level=self.compress_level)
+            datos = buf.getvalue()
+        elif hasattr(imagen, "getvalue"):
+            datos = imagen.getvalue()
+        else:
+            datos = imagen
+        filtro, stream, ancho, alto = self._imagen(datos)
+        espacio = "" if "/ColorSpace" in filtro else " /ColorSpace /DeviceRGB"
+
+        img_id = self._nuevo_id()
+        self._objeto(img_id, (f"<< /Type /XObject /Subtype /Image /Width {ancho} /Height {alto}{espacio} "
+                              f"/BitsPerComponent 8 {filtro} /Length {len(stream)} >>").encode(), stream)
+
+        pagina_w, pagina_h, w, h = self._tamano_pagina(ancho, alto)
+        x, y = (pagina_w - w) / 2, (pagina_h - h) / 2
+        contenido = f"q {w:.2f} 0 0 {h:.2f} {x:.2f} {y:.2f} cm /Im0 Do Q".encode()
+        contenido_id = self._nuevo_id()
+        self._objeto(contenido_id, f"<< /Length {len(contenido)} >>".encode(), contenido)
+
+        pagina_id = self._nuevo_id()
+        self._objeto(pagina_id, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {pagina_w} {pagina_h}] "
+                                 f"/Resources << /XObject << /Im0 {img_id} 0 R >> >> "
+                                 f"/Contents {contenido_id} 0 R >>").encode())
+        self._kids.append(pagina_id)
+        self.paginas += 1
+        self.tiempo_codificacion += time.perf_counter() - inicio
+
+    def close(self):
+        if self._f is None:
+            return
+        try:
+            if not self._kids:
+                raise ValueError("El PDF no tiene páginas")
+            kids = " ".join(f"{k} 0 R" for k in self._kids)
+            self._objeto(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._kids)} >>".encode())
+
+            xref = self._f.tell()
+            total = self._siguiente
+            self._f.write(f"xref\n0 {total}\n0000000000 65535 f \n".encode())
+            for num in range(1, total):
+                self._f.write(f"{self._offsets[num]:010d} 00000 n \n".encode())
+            info = f" /Info {self._info} 0 R" if self._info else ""
+            self._f.write(f"trailer\n<< /Size {total} /Root 1 0 R{info} >>\nstartxref\n{xref}\n%%EOF\n".encode())
+            self._f.close()
+            os.replace(self._tmp, self.path)
+        except BaseException:
+            self._descartar()
+            raise
+        finally:
+            self._f = None
+
+    def _descartar(self):
+        self._f.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            if self._f is not None:
+                self._descartar()
+                self._f = None
+            return
+        self.close()
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import xml.etree.ElementTree as ET
+import requests
+
+
+class RateProvider:
+    """Tasas EUR/USD (BCE) y TRM COP/USD (datos.gov.co) con timeout, reintentos y caché en disco.
+
+    Las dos fuentes se consultan en paralelo. Cada tasa obtenida se guarda por fecha en
+    `tasas.json`, así un rango ya consultado no vuelve a pedirse y, si una fuente falla, se usa
+    la última tasa conocida (si no es más antigua que `DIAS_SIN_PUBLICACION`) en vez de detener la corrida. Las URLs se pueden reemplazar por
+    servidores locales o por archivos (`file://...`) para pruebas.
+    """
+
+    ECB_DIARIA = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml"
+    ECB_HISTORICO = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist.xml"
+    ECB_HISTORICO_90D = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist-90d.xml"
+    TRM = "https://www.datos.gov.co/resource/ceyp-9c7c.json"
+
+    DIAS_SIN_PUBLICACION = 7  # el BCE no publica fines de semana ni festivos: se usa la última tasa previa
+
+    def __init__(self, cache_dir, timeout=10, reintentos=3, espera=1.0, ecb_diaria=None, ecb_historico=None,
+                 ecb_historico_90d=None, trm=None):
+        self.CACHE_DIR = cache_dir
+        self.CACHE_PATH = os.path.join(cache_dir, "tasas.json")
+        self.timeout = timeout
+        self.reintentos = max(1, reintentos)
+        self.espera = espera
+        self.ecb_diaria = ecb_diaria or self.ECB_DIARIA
+        self.ecb_historico = ecb_historico or self.ECB_HISTORICO
+        self.ecb_historico_90d = ecb_historico_90d or self.ECB_HISTORICO_90D
+        self.trm = trm or self.TRM
+        self._cache = None
+        self._actuales = None  # (fecha de consulta, (cop_usd, eur_usd)): una consulta por día y proceso
+
+    # -------------------------
+    # Caché por fecha
+    # -------------------------
+    @property
+    def cache(self):
+        if self._cache is None:
+            try:
+                with open(self.CACHE_PATH, "r", encoding="utf-8") as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+            self._cache.setdefault("eur_usd", {})
+            self._cache.setdefault("cop_usd", {})
+        return self._cache
+
+    def _guardar_cache(self):
+        try:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            tmp = self.CACHE_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.cache, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.CACHE_PATH)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la caché de tasas: {e}")
+
+    def _buscar(self, serie, fecha, dias_atras=0):
+        """Tasa de `serie` para `fecha` (o la última publicada dentro de `dias_atras` días)."""
+        tasas = self.cache[serie]
+        for i in range(dias_atras + 1):
+            clave = (fecha - timedelta(days=i)).isoformat()
+            if clave in tasas:
+                return tasas[clave]
+        return None
+
+    def _ultima(self, serie):
+        tasas = self.cache[serie]
+        if not tasas:
+            return None, None
+        clave = max(tasas)
+        return date.fromisoformat(clave), tasas[clave]
+
+    # -------------------------
+    # HTTP con timeout y reintentos
+    # -------------------------
+    def _get(self, url, params=None):
+        if url.startswith("file://"):
+            with open(url[len("file://"):], "rb") as f:
+                return f.read()
+        error = None
+        for intento in range(self.reintentos):
+            try:
+                resp = requests.get(url, params=params, timeout=self.timeout)
+                resp.raise_for_status()
+                return resp.content
+            except requests.RequestException as e:
+                error = e
+                if intento + 1 < self.reintentos:
+                    time.sleep(self.espera * 2 ** intento)
+        raise error
+
+    # -------------------------
+    # Fuentes
+    # -------------------------
+    @staticmethod
+    def _parsear_ecb(contenido):
+        tasas = {}
+        for dia in ET.fromstring(contenido).iter():
+            if "time" in dia.attrib:
+                for cube in dia:
+                    if cube.attrib.get("currency") == "USD":
+                        tasas[dia.attrib["time"]] = float(cube.attrib["rate"])
+        return tasas
+
+    @staticmethod
+    def _parsear_trm(contenido):
+        # cada registro vale desde `vigenciadesde` hasta `vigenciahasta`: se expande a todos sus días
+        tasas = {}
+        for registro in json.loads(contenido):
+            desde = date.fromisoformat(registro["vigenciadesde"][:10])
+            hasta = date.fromisoformat(registro.get("vigenciahasta", registro["vigenciadesde"])[:10])
+            valor = float(registro["valor"])
+            while desde <= hasta:
+                tasas[desde.isoformat()] = valor
+                desde += timedelta(days=1)
+        return tasas
+
+    def _ecb(self, desde=None):
+        if desde is None:
+            url = self.ecb_diaria
+        elif (date.today() - desde).days < 85:
+            url = self.ecb_historico_90d
+        else:
+            url = self.ecb_historico
+        return self._parsear_ecb(self._get(url))
+
+    def _trm(self, desde=None, hasta=None):
+        if desde is None:
+            params = {"$order": "vigenciadesde DESC", "$limit": 1}
+        else:
+            params = {
+                "$where": f"vigenciahasta >= '{desde.isoformat()}T00:00:00' "
+                          f"AND vigenciadesde <= '{hasta.isoformat()}T00:00:00'",
+                "$order": "vigenciadesde ASC",
+                "$limit": 50000,
+            }
+        return self._parsear_trm(self._get(self.trm, params))
+
+    def _consultar(self, desde=None, hasta=None):
+        """Consulta ambas fuentes en paralelo, guarda en caché lo obtenido y devuelve las series que fallaron."""
+        fallidas = set()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futuros = {
+                "eur_usd": pool.submit(self._ecb, desde),
+                "cop_usd": pool.submit(self._trm, desde, hasta),
+            }
+            for serie, futuro in futuros.items():
+                try:
+                    self.cache[serie].update(futuro.result())
+                except Exception as e:
+                    print(f"⚠️ Error obteniendo {serie.upper().replace('_', '/')}: {e}")
+                    fallidas.add(serie)
+        self._guardar_cache()
+        return fallidas
+
+    # -------------------------
+    # API
+    # -------------------------
+    def tasas_actuales(self):
+        """(cop_usd, eur_usd) más recientes; si una fuente falla se usa la última tasa en caché.
+
+        Una tasa publicada hace más de `DIAS_SIN_PUBLICACION` días no se da por actual: se devuelve
+        None en su lugar para no registrarla con la fecha de hoy. El resultado se reutiliza en el
+        mismo día, así pedir las dos tasas por separado no vuelve a consultar las fuentes.
+        """
+        hoy = date.today()
+        if self._actuales is not None and self._actuales[0] == hoy:
+            return self._actuales[1]
+        fallidas = self._consultar()
+        resultado = []
+        for serie in ("cop_usd", "eur_usd"):
+            nombre = serie.upper().replace('_', '/')
+            fecha, valor = self._ultima(serie)
+            if valor is not None and fecha < hoy - timedelta(days=self.DIAS_SIN_PUBLICACION):
+                print(f"❌ La última {nombre} disponible es del {fecha}: demasiado antigua para usarla hoy")
+                valor = None
+            elif serie in fallidas and valor is not None:
+                print(f"♻️ Se usa la última {nombre} en caché ({fecha}): {valor}")
+            resultado.append(valor)
+        self._actuales = (hoy, tuple(resultado))
+        return self._actuales[1]
+
+    def tasas_rango(self, desde, hasta):
+        """{fecha: (cop_usd, eur_usd)} para cada día del rango, con una consulta masiva por fuente.
+
+        Solo se consulta si falta algún día en la caché. Los días sin tasa disponible se omiten.
+        """
+        if isinstance(desde, datetime):
+            desde = desde.date()
+        if isinstance(hasta, datetime):
+            hasta = hasta.date()
+        dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+        def completo(dia):
+            return (self._buscar("cop_usd", dia) is not None
+                    and self._buscar("eur_usd", dia, self.DIAS_SIN_PUBLICACION) is not None)
+
+        if not all(completo(d) for d in dias):
+            # margen hacia atrás para cubrir el primer día si cae en fin de semana o festivo del BCE
+            self._consultar(desde - timedelta(days=self.DIAS_SIN_PUBLICACION), hasta)
+
+        tasas = {}
+        for dia in dias:
+            cop = self._buscar("cop_usd", dia)
+            eur = self._buscar("eur_usd", dia, self.DIAS_SIN_PUBLICACION)
+            if cop is not None and eur is not None:
+                tasas[dia] = (cop, eur)
+        return tasas
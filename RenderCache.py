@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import hashlib
+
+
+class RenderCache:
+    """Caché en disco de imágenes ya rasterizadas, direccionada por el hash de la especificación.
+
+    La clave incluye la función de dibujo, todos sus argumentos (datos, layout, tamaño, escala y formato),
+    las versiones de plotly/matplotlib y un hash del código de dibujo: el módulo de la función y los
+    módulos del proyecto que ese módulo usa (p. ej. SellerChartTemplate), así un cambio de estilo no
+    sirve imágenes viejas. Se desaloja por LRU (mtime) cuando se supera `max_bytes`: el tamaño total
+    se calcula recorriendo la carpeta una vez y luego se lleva en memoria, y solo se vuelve a recorrer
+    cuando un `put` lo pasa del límite; entonces se baja hasta el 90% para no recorrerla en cada `put`.
+    """
+
+    VERSION = 1  # subir para descartar todas las imágenes guardadas
+    MARGEN = 0.9  # al desalojar se baja hasta esta fracción de max_bytes
+    _huellas_codigo = {}  # módulo -> hash de su código y el de sus módulos locales (una vez por proceso)
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024):
+        self.CACHE_DIR = cache_dir
+        self.max_bytes = max_bytes
+        self._total = None  # bytes en caché; None hasta el primer put
+
+    @staticmethod
+    def _serializable(obj):
+        if hasattr(obj, "to_json"):
+            return obj.to_json(orient="split", date_format="iso")
+        if hasattr(obj, "tolist"):
+            return obj.tolist()
+        return repr(obj)
+
+    @staticmethod
+    def _versiones():
+        versiones = []
+        for lib in ("plotly", "matplotlib"):
+            try:
+                versiones.append(__import__(lib).__version__)
+            except ImportError:
+                versiones.append(None)
+        return versiones
+
+    @staticmethod
+    def _leer(ruta):
+        try:
+            with open(ruta, "rb") as f:
+                return f.read()
+        except (OSError, TypeError):
+            return b""
+
+    @classmethod
+    def huella_codigo(cls, nombre_modulo):
+        """sha256 del código del módulo y de los módulos de su misma carpeta que importa."""
+        if nombre_modulo not in cls._huellas_codigo:
+            modulo = sys.modules.get(nombre_modulo)
+            ruta = getattr(modulo, "__file__", None)
+            carpeta = os.path.dirname(os.path.abspath(ruta)) if ruta else None
+            rutas = {ruta} if ruta else set()
+            for valor in vars(modulo).values() if modulo else ():
+                origen = sys.modules.get(getattr(valor, "__module__", None) or getattr(valor, "__name__", ""))
+                archivo = getattr(origen, "__file__", None)
+                if archivo and os.path.dirname(os.path.abspath(archivo)) == carpeta:
+                    rutas.add(archivo)
+            sha = hashlib.sha256()
+            for archivo in sorted(rutas, key=os.path.basename):
+                sha.update(os.path.basename(archivo).encode("utf-8"))
+                sha.update(cls._leer(archivo))
+            cls._huellas_codigo[nombre_modulo] = sha.hexdigest()
+        return cls._huellas_codigo[nombre_modulo]
+
+    def clave(self, funcion, args):
+        spec = {
+            "version": self.VERSION,
+            "libs": self._versiones(),
+            "funcion": f"{funcion.__module__}.{funcion.__qualname__}",
+            "codigo": self.huella_codigo(funcion.__module__),
+            "args": args,
+        }
+        datos = json.dumps(spec, sort_keys=True, default=self._serializable, ensure_ascii=False)
+        return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.CACHE_DIR, clave[:2], clave + ".img")
+
+    def get(self, clave):
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "rb") as f:
+                datos = f.read()
+            os.utime(ruta)  # marca de uso reciente para el LRU
+            return datos
+        except OSError:
+            return None
+
+    def put(self, clave, datos):
+        ruta = self._ruta(clave)
+        if self._total is None:
+            self._total = sum(tam for _, tam, _ in self._archivos())
+        try:
+            anterior = os.path.getsize(ruta)
+        except OSError:
+            anterior = 0
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            tmp = ruta + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(datos)
+            os.replace(tmp, ruta)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la imagen en caché: {e}")
+            return
+        self._total += len(datos) - anterior
+        if self._total > self.max_bytes:
+            self._desalojar()
+
+    def _archivos(self):
+        archivos = []
+        for raiz, _, nombres in os.walk(self.CACHE_DIR):
+            for nombre in nombres:
+                if nombre.endswith(".img"):
+                    ruta = os.path.join(raiz, nombre)
+                    try:
+                        st = os.stat(ruta)
+                    except OSError:
+                        continue
+                    archivos.append((st.st_mtime, st.st_size, ruta))
+        return archivos
+
+    def _desalojar(self):
+        archivos = self._archivos()
+        total = sum(tam for _, tam, _ in archivos)
+        for _, tam, ruta in sorted(archivos):
+            if total <= self.max_bytes * self.MARGEN:
+                break
+            try:
+                os.remove(ruta)
+                total -= tam
+            except OSError:
+                pass
+        self._total = total
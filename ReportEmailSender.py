@@ -1,11 +1,38 @@
 import smtplib
+import time
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
+from email.mime.application import MIMEApplication
 from email.mime.text import MIMEText
 import os
+from PIL import Image
+from SMTPConnectionPool import SMTPConnectionPool
+from Instrumentation import span, span_actual
+
 
 class ReportEmailSender:
-    def __init__(self, base_dir, remitente, password, destinatarios, asunto, cuerpo):
+    """Envía el reporte con el dashboard incrustado, un correo personalizado por destinatario.
+
+    Los envíos se hacen en paralelo sobre un pool de conexiones SMTP autenticadas que se reutilizan,
+    con reintentos y espera exponencial ante fallos transitorios. Las imágenes se preparan una sola
+    vez y, si superan `presupuesto_imagen_kb`, se reducen y recomprimen como JPEG hasta caber.
+    Los destinatarios pueden ser correos o {"correo": ..., "nombre": ...}; `{nombre}` y `{correo}`
+    se reemplazan en el asunto y el cuerpo.
+    Con `adjuntar_pdf` se adjunta además el PDF paginado más reciente del dashboard; con
+    `incrustar_imagen=False` el PDF va en lugar de la imagen (el cuerpo solo lleva la firma).
+    Outlook no muestra WebP incrustado: un dashboard WebP siempre se incrusta recomprimido como JPEG
+    y, con `adjuntar_webp`, el original va además como archivo adjunto.
+    """
+
+    EXTENSIONES_IMG = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+    CALIDADES_JPEG = (85, 75, 65, 55)
+    ANCHO_MINIMO = 400
+
+    def __init__(self, base_dir, remitente, password, destinatarios, asunto, cuerpo, smtp_host="smtp.gmail.com",
+                 smtp_port=587, starttls=True, conexiones=2, reintentos=3, espera=1.0, presupuesto_imagen_kb=None,
+                 ancho_max_imagen=None, adjuntar_pdf=False, incrustar_imagen=True, adjuntar_webp=False):
         self.remitente = remitente
         self.password = password
         self.destinatarios = destinatarios
@@ -13,17 +40,163 @@ class ReportEmailSender:
         self.cuerpo = cuerpo  # Texto o HTML
         self.output_dir = os.path.join(base_dir, "output")
         self.imagen_extra = os.path.join(base_dir, "image.png")  # ✅ tu imagen debajo de Saludes
+        self.smtp_host = smtp_host
+        self.smtp_port = smtp_port
+        self.starttls = starttls
+        self.conexiones = max(1, conexiones)
+        self.reintentos = max(1, reintentos)
+        self.espera = espera
+        self.presupuesto_imagen = presupuesto_imagen_kb * 1024 if presupuesto_imagen_kb else None
+        self.ancho_max_imagen = ancho_max_imagen
+        self.adjuntar_pdf = adjuntar_pdf
+        self.incrustar_imagen = incrustar_imagen
+        self.adjuntar_webp = adjuntar_webp
+        self._imagenes = None
+        self._webp = None  # (nombre, bytes) del dashboard WebP original, si se adjunta
+        self._pdf = None
 
-    def send_mail(self):
-        # Crear mensaje raíz tipo "related"
-        mensaje = MIMEMultipart("related")
+    # -------------------------
+    # Imágenes (se preparan una vez para todos los destinatarios)
+    # -------------------------
+    def _mas_reciente(self, extensiones):
+        if not os.path.isdir(self.output_dir):
+            return None
+        archivos = [
+            os.path.join(self.output_dir, archivo) for archivo in sorted(os.listdir(self.output_dir))
+            if archivo.lower().endswith(extensiones)
+        ]
+        dashboards = [ruta for ruta in archivos if os.path.basename(ruta).startswith("dashboard")]
+        candidatas = dashboards or archivos
+        return max(candidatas, key=os.path.getmtime) if candidatas else None
+
+    def imagen_reporte(self):
+        """Dashboard más reciente de output/ (antes: la primera imagen que devolvía os.listdir)."""
+        return self._mas_reciente(self.EXTENSIONES_IMG)
+
+    def pdf_reporte(self):
+        """(nombre, bytes) del PDF del dashboard más reciente, leído una sola vez; None si no hay."""
+        if self._pdf is None:
+            ruta = self._mas_reciente((".pdf",))
+            self._pdf = ()
+            if ruta:
+                with open(ruta, "rb") as f:
+                    self._pdf = (os.path.basename(ruta), f.read())
+                print(f"📎 PDF del reporte adjunto: {ruta} ({len(self._pdf[1]) // 1024} KB)")
+            else:
+                print("⚠️ No se encontró el PDF del dashboard para adjuntar")
+        return self._pdf or None
+
+    @staticmethod
+    def _subtipo(ruta):
+        # el tipo se indica explícitamente porque no todas las versiones detectan WebP
+        return "webp" if ruta.lower().endswith(".webp") else None
+
+    def ajustar_imagen(self, datos, subtipo=None):
+        """(bytes, subtipo) dentro del presupuesto y del ancho máximo; sin cambios si ya cumple.
+        WebP siempre se recomprime como JPEG, que todos los clientes de correo muestran incrustado."""
+        convertir = subtipo == "webp"
+        if not self.presupuesto_imagen and not self.ancho_max_imagen and not convertir:
+            return datos, subtipo
+        im = Image.open(BytesIO(datos))
+        ancho_ok = not self.ancho_max_imagen or im.width <= self.ancho_max_imagen
+        if ancho_ok and not convertir and (not self.presupuesto_imagen or len(datos) <= self.presupuesto_imagen):
+            return datos, subtipo
+
+        if im.mode in ("RGBA", "LA", "P"):
+            # JPEG no tiene transparencia: se aplana sobre blanco como se ve en el correo
+            im = im.convert("RGBA")
+            fondo = Image.new("RGB", im.size, "white")
+            fondo.paste(im, mask=im.getchannel("A"))
+            im = fondo
+        im = im.convert("RGB")
+        if not ancho_ok:
+            # reducing_gap: primero una reducción entera rápida y luego LANCZOS sobre la imagen ya pequeña
+            im = im.resize((self.ancho_max_imagen, round(im.height * self.ancho_max_imagen / im.width)),
+                           Image.LANCZOS, reducing_gap=3.0)
+        while True:
+            for calidad in self.CALIDADES_JPEG:
+                buf = BytesIO()
+                im.save(buf, "JPEG", quality=calidad, optimize=True, progressive=True)
+                if not self.presupuesto_imagen or buf.tell() <= self.presupuesto_imagen:
+                    return buf.getvalue(), "jpeg"
+            if im.width * 0.8 < self.ANCHO_MINIMO:
+                print(f"⚠️ La imagen no cabe en {self.presupuesto_imagen // 1024} KB; se envía con {buf.tell() // 1024} KB")
+                return buf.getvalue(), "jpeg"
+            im = im.resize((int(im.width * 0.8), int(im.height * 0.8)), Image.LANCZOS)
+
+    def _cargar_imagen(self, ruta, cid):
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        original = self._subtipo(ruta)
+        ajustada, subtipo = self.ajustar_imagen(datos, original)
+        if original == "webp" and self.adjuntar_webp and cid == "imagen1":
+            self._webp = (os.path.basename(ruta), datos)
+        if len(ajustada) != len(datos):
+            print(f"🗜 {os.path.basename(ruta)}: {len(datos) // 1024} KB -> {len(ajustada) // 1024} KB")
+        return cid, ajustada, subtipo
+
+    def imagenes(self):
+        """[(cid, bytes, subtipo)] del reporte y de la firma, preparadas una sola vez."""
+        if self._imagenes is None:
+            with span("correo.imagenes"):
+                self._imagenes = self._preparar_imagenes()
+        return self._imagenes
+
+    def _preparar_imagenes(self):
+        imagenes = []
+        ruta_img = self.imagen_reporte() if self.incrustar_imagen else None
+        if ruta_img:
+            imagenes.append(self._cargar_imagen(ruta_img, "imagen1"))
+            print(f"🖼 Imagen de reporte embebida en el correo: {ruta_img}")
+        if os.path.exists(self.imagen_extra):
+            imagenes.append(self._cargar_imagen(self.imagen_extra, "imagen_extra"))
+            print(f"🖋 Imagen adicional añadida: {self.imagen_extra}")
+        return imagenes
+
+    # -------------------------
+    # Mensaje
+    # -------------------------
+    @staticmethod
+    def _destinatario(destinatario):
+        if isinstance(destinatario, dict):
+            return destinatario["correo"], destinatario.get("nombre", "")
+        return destinatario, ""
+
+    @staticmethod
+    def _personalizar(texto, correo, nombre):
+        # reemplazo simple (no str.format) para no romper llaves que traiga el HTML del cuerpo
+        return texto.replace("{nombre}", nombre).replace("{correo}", correo)
+
+    def construir_mensaje(self, destinatario):
+        correo, nombre = self._destinatario(destinatario)
+
+        # Crear mensaje raíz tipo "related" (dentro de un "mixed" si lleva el PDF o el WebP adjunto)
+        relacionado = MIMEMultipart("related")
+        pdf = self.pdf_reporte() if self.adjuntar_pdf else None
+        self.imagenes()  # deja listo el WebP original si se adjunta
+        adjuntos = []
+        if pdf:
+            adjunto = MIMEApplication(pdf[1], _subtype="pdf")
+            adjunto.add_header("Content-Disposition", "attachment", filename=pdf[0])
+            adjuntos.append(adjunto)
+        if self._webp:
+            adjunto = MIMEImage(self._webp[1], _subtype="webp")
+            adjunto.add_header("Content-Disposition", "attachment", filename=self._webp[0])
+            adjuntos.append(adjunto)
+        if adjuntos:
+            mensaje = MIMEMultipart("mixed")
+            mensaje.attach(relacionado)
+            for adjunto in adjuntos:
+                mensaje.attach(adjunto)
+        else:
+            mensaje = relacionado
         mensaje["From"] = self.remitente
-        mensaje["To"] = ", ".join(self.destinatarios)
-        mensaje["Subject"] = self.asunto
+        mensaje["To"] = correo
+        mensaje["Subject"] = self._personalizar(self.asunto, correo, nombre)
 
         # Contenedor "alternative" (texto plano y HTML)
         parte_alternativa = MIMEMultipart("alternative")
-        mensaje.attach(parte_alternativa)
+        relacionado.attach(parte_alternativa)
 
         # Texto plano (fallback)
         parte_alternativa.attach(
@@ -31,55 +204,72 @@ class ReportEmailSender:
         )
 
         # HTML base
-        html_cuerpo = f"<html><body><p>{self.cuerpo}</p>"
-
-        # Insertar la primera imagen del reporte
-        extensiones_img = (".png", ".jpg", ".jpeg", ".gif")
-        img_index = 1
-        for archivo in os.listdir(self.output_dir):
-            if archivo.lower().endswith(extensiones_img):
-                ruta_img = os.path.join(self.output_dir, archivo)
-                with open(ruta_img, "rb") as img:
-                    mime_img = MIMEImage(img.read())
-                    cid = f"imagen{img_index}"
-                    mime_img.add_header("Content-ID", f"<{cid}>")
-                    mime_img.add_header("Content-Disposition", "inline")
-                    mensaje.attach(mime_img)
-
-                    # HTML referencia inline
-                    html_cuerpo += f'<br><img src="cid:{cid}" style="max-width:100%;"><br>'
-                    img_index += 1
-                    print(f"🖼 Imagen de reporte embebida en el correo: {ruta_img}")
-
-                break  # ✅ solo insertamos la primera
-
-        # ✅ Agregar saludo después del reporte
-        html_cuerpo += "<p style='font-size:18px; color:#333;'>Saludes,</p>"
+        html_cuerpo = f"<html><body><p>{self._personalizar(self.cuerpo, correo, nombre)}</p>"
 
-        # ✅ Insertar la imagen `imagen.png` debajo del saludo
-        if os.path.exists(self.imagen_extra):
-            with open(self.imagen_extra, "rb") as fimg:
-                mime_img = MIMEImage(fimg.read())
-                cid_extra = "imagen_extra"
-                mime_img.add_header("Content-ID", f"<{cid_extra}>")
-                mime_img.add_header("Content-Disposition", "inline")
-                mensaje.attach(mime_img)
+        for cid, contenido, subtipo in self.imagenes():
+            mime_img = MIMEImage(contenido, _subtype=subtipo)
+            mime_img.add_header("Content-ID", f"<{cid}>")
+            mime_img.add_header("Content-Disposition", "inline")
+            relacionado.attach(mime_img)
 
-                html_cuerpo += f'<br><img src="cid:{cid_extra}" style="max-width:100%;"><br>'
-                print(f"🖋 Imagen adicional añadida: {self.imagen_extra}")
+        # Reporte, luego el saludo y debajo la imagen adicional
+        cids = [cid for cid, _, _ in self.imagenes()]
+        for cid in cids:
+            if cid != "imagen_extra":
+                html_cuerpo += f'<br><img src="cid:{cid}" style="max-width:100%;"><br>'
+        html_cuerpo += "<p style='font-size:18px; color:#333;'>Saludes,</p>"
+        if "imagen_extra" in cids:
+            html_cuerpo += '<br><img src="cid:imagen_extra" style="max-width:100%;"><br>'
 
         html_cuerpo += "</body></html>"
 
         # Agregar HTML al bloque "alternative"
         parte_alternativa.attach(MIMEText(html_cuerpo, "html"))
+        return mensaje
 
-        # Enviar correo
-        try:
-            servidor = smtplib.SMTP("smtp.gmail.com", 587)
-            servidor.starttls()
-            servidor.login(self.remitente, self.password)
-            servidor.send_message(mensaje)
-            servidor.quit()
-            print("✅ Correo enviado correctamente (imágenes incrustadas en el cuerpo).")
-        except Exception as e:
-            print("❌ Error al enviar el correo:", e)
+    # -------------------------
+    # Envío
+    # -------------------------
+    @staticmethod
+    def _es_permanente(error):
+        # rechazos 5xx (destinatario inválido, autenticación) no mejoran reintentando; los 4xx sí
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(codigo >= 500 for codigo, _ in error.recipients.values())
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            return True
+        return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+    def _enviar(self, pool, destinatario, padre=None):
+        correo, _ = self._destinatario(destinatario)
+        with span("correo.envio", padre=padre, destinatario=correo) as s:
+            mensaje = self.construir_mensaje(destinatario)
+            for intento in range(self.reintentos):
+                s.atributos["intentos"] = intento + 1
+                try:
+                    with pool.conexion() as smtp:
+                        smtp.send_message(mensaje)
+                    print(f"✅ Correo enviado a {correo}")
+                    return True
+                except (smtplib.SMTPException, OSError) as e:
+                    if self._es_permanente(e) or intento + 1 == self.reintentos:
+                        print(f"❌ Error al enviar el correo a {correo}: {e}")
+                        return False
+                    print(f"⏳ Reintentando envío a {correo} ({intento + 1}/{self.reintentos - 1}): {e}")
+                    time.sleep(self.espera * 2 ** intento)
+
+    def send_mail(self):
+        """Envía un correo por destinatario en paralelo; devuelve {correo: enviado}."""
+        self.imagenes()  # una sola vez, antes de repartir los envíos
+        if self.adjuntar_pdf:
+            self.pdf_reporte()
+        inicio = time.perf_counter()
+        padre = span_actual()  # los envíos corren en otros hilos; cuelgan del span de quien llama
+        with SMTPConnectionPool(self.smtp_host, self.smtp_port, self.remitente, self.password,
+                                tamano=self.conexiones, starttls=self.starttls) as pool:
+            with ThreadPoolExecutor(max_workers=self.conexiones) as ejecutor:
+                enviados = list(ejecutor.map(lambda d: self._enviar(pool, d, padre), self.destinatarios))
+        resultado = {self._destinatario(d)[0]: ok for d, ok in zip(self.destinatarios, enviados)}
+        print(f"📨 {sum(enviados)}/{len(enviados)} correos enviados en {time.perf_counter() - inicio:.1f}s "
+              f"({'imágenes incrustadas en el cuerpo' if self.incrustar_imagen else 'sin imagen incrustada'}"
+              f"{', PDF adjunto' if self.adjuntar_pdf and self.pdf_reporte() else ''}).")
+        return resultado
@@ -0,0 +1,86 @@
+import queue
+import smtplib
+import threading
+from contextlib import contextmanager
+
+
+class SMTPConnectionPool:
+    """Conexiones SMTP autenticadas que se reutilizan entre envíos.
+
+    Cada conexión se abre (STARTTLS + login) la primera vez que se necesita y se devuelve al pool
+    al terminar el envío. Una conexión que falla se descarta y la siguiente petición abre otra.
+    Sin `password` no se hace login (servidores locales de prueba).
+    """
+
+    def __init__(self, host, port, usuario=None, password=None, tamano=2, starttls=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.usuario = usuario
+        self.password = password
+        self.tamano = max(1, tamano)
+        self.starttls = starttls
+        self.timeout = timeout
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(self.tamano)
+        self._abiertas = []
+        self._lock = threading.Lock()
+
+    def _abrir(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.password:
+                smtp.login(self.usuario, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self._abiertas.append(smtp)
+        return smtp
+
+    def _descartar(self, smtp):
+        with self._lock:
+            if smtp in self._abiertas:
+                self._abiertas.remove(smtp)
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def conexion(self):
+        """Conexión lista para `send_message`; si el envío lanza una excepción la conexión se descarta."""
+        self._cupos.acquire()
+        smtp = None
+        try:
+            try:
+                smtp = self._libres.get_nowait()
+            except queue.Empty:
+                smtp = self._abrir()
+            yield smtp
+        except Exception:
+            if smtp is not None:
+                self._descartar(smtp)
+                smtp = None
+            raise
+        finally:
+            if smtp is not None:
+                self._libres.put(smtp)
+            self._cupos.release()
+
+    def cerrar(self):
+        with self._lock:
+            abiertas, self._abiertas = self._abiertas, []
+        for smtp in abiertas:
+            try:
+                smtp.quit()
+            except Exception:
+                smtp.close()
+        self._libres = queue.LifoQueue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
@@ -0,0 +1,71 @@
+import pandas as pd
+
+
+class SalesCube:
+    """Ventas de BD preagregadas por (Año, Mes, Sede, Cliente, País, Vendedor).
+
+    Se construye una sola vez a partir de las filas válidas; todas las consultas del dashboard
+    (totales, sedes, top clientes, top países, vendedores) se responden desde este cubo pequeño.
+    """
+
+    DIMENSIONES = [
+        'Año', 'Mes', 'Nombre Centro de Operacion', 'Nombre Cliente_factura',
+        'Desc Pais Cliente_factura', 'Vendedor'
+    ]
+    MEDIDA = 'Valor Total USD'
+
+    def __init__(self, df_validas):
+        self.df = (
+            df_validas.groupby(self.DIMENSIONES, observed=True, dropna=False, sort=False)[self.MEDIDA]
+            .sum()
+            .reset_index()
+        )
+
+    @classmethod
+    def desde_agregado(cls, agregado):
+        """Reconstruye un cubo a partir de un agregado ya calculado (p. ej. leído de disco)."""
+        cubo = cls.__new__(cls)
+        cubo.df = agregado
+        return cubo
+
+    def agregar(self, df_validas):
+        """Devuelve un cubo nuevo con las filas `df_validas` sumadas a las celdas existentes."""
+        if df_validas.empty:
+            return self
+        parcial = SalesCube(df_validas).df
+        combinado = pd.concat([self.df, parcial], ignore_index=True)
+        return SalesCube.desde_agregado(
+            combinado.groupby(self.DIMENSIONES, observed=True, dropna=False, sort=False)[self.MEDIDA]
+            .sum()
+            .reset_index()
+        )
+
+    def particionar(self, dimension):
+        """Un sub-cubo por valor de `dimension`, obtenidos de un único agrupamiento del cubo."""
+        grupos = self.df.groupby(dimension, observed=True, sort=False).indices
+        return {valor: SalesCube.desde_agregado(self.df.iloc[idx]) for valor, idx in grupos.items()}
+
+    def vacio(self):
+        return SalesCube.desde_agregado(self.df.iloc[0:0])
+
+    def __len__(self):
+        return len(self.df)
+
+    def _periodo(self, anio, mes=None):
+        filtro = self.df['Año'] == anio
+        if mes is not None:
+            filtro &= self.df['Mes'] == mes
+        return self.df[filtro]
+
+    def total(self, anio, mes=None):
+        return self._periodo(anio, mes)[self.MEDIDA].sum()
+
+    def por(self, dimension, anio, mes=None, top=None):
+        """Ventas del periodo agrupadas por `dimension`, de mayor a menor (opcionalmente solo el top N)."""
+        serie = (
+            self._periodo(anio, mes)
+            .groupby(dimension, observed=True)[self.MEDIDA]
+            .sum()
+            .sort_values(ascending=False)
+        )
+        return serie.head(top) if top is not None else serie
@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from SalesCube import SalesCube
+
+
+class SalesCubeStore:
+    """Persiste el cubo de ventas entre corridas y solo agrega las filas de BD nuevas.
+
+    La marca de agua es el número de filas ya agregadas y un hash de las últimas `VENTANA` de ellas,
+    así comprobarla cuesta lo mismo sin importar el tamaño de BD. Si BD solo creció, se agregan las
+    filas posteriores a la marca; si cambió la cola ya agregada, BD se acortó o cambiaron los filtros,
+    se recalcula el cubo completo. Un cambio en filas anteriores a la ventana no se detecta: para
+    reescrituras históricas de BD se borra `CUBO_PATH`.
+    """
+
+    VENTANA = 2000
+
+    def __init__(self, cache_dir, base_name, firma_filtros):
+        self.CACHE_DIR = cache_dir
+        self.CUBO_PATH = os.path.join(cache_dir, f"{base_name}__cubo.parquet")
+        self.ESTADO_PATH = os.path.join(cache_dir, f"{base_name}__cubo.json")
+        self.firma_filtros = firma_filtros
+
+    @staticmethod
+    def firma(*partes):
+        return hashlib.sha256(json.dumps(partes, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _hash_cola(cls, bd, filas):
+        """Hash de las `VENTANA` filas anteriores a la marca `filas`."""
+        return cls._hash_filas(bd.iloc[max(0, filas - cls.VENTANA):filas])
+
+    @staticmethod
+    def _hash_filas(df):
+        sha = hashlib.sha256()
+        sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return sha.hexdigest()
+
+    def _leer_estado(self):
+        try:
+            with open(self.ESTADO_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _guardar(self, cubo, bd):
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
+        tmp = self.CUBO_PATH + ".tmp"
+        cubo.df.to_parquet(tmp, index=False)
+        os.replace(tmp, self.CUBO_PATH)
+        estado = {"filas": len(bd), "ventana": self.VENTANA, "hash_cola": self._hash_cola(bd, len(bd)),
+                  "firma_filtros": self.firma_filtros}
+        tmp = self.ESTADO_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(estado, f, indent=2)
+        os.replace(tmp, self.ESTADO_PATH)
+
+    def _cubo_guardado(self, bd):
+        """Cubo persistido y filas ya agregadas, o (None, 0) si no sirve para esta BD."""
+        estado = self._leer_estado()
+        if not estado or estado.get("firma_filtros") != self.firma_filtros:
+            return None, 0
+        filas = estado.get("filas", 0)
+        if filas > len(bd) or not os.path.exists(self.CUBO_PATH):
+            return None, 0
+        if estado.get("ventana") != self.VENTANA or self._hash_cola(bd, filas) != estado.get("hash_cola"):
+            return None, 0
+        try:
+            return SalesCube.desde_agregado(pd.read_parquet(self.CUBO_PATH)), filas
+        except Exception as e:
+            print(f"⚠️ Cubo guardado ilegible, se recalcula: {e}")
+            return None, 0
+
+    def cargar(self, bd, filtrar):
+        """Devuelve el cubo al día para `bd`; `filtrar` selecciona las filas válidas de un tramo."""
+        cubo, filas = self._cubo_guardado(bd)
+        if cubo is None:
+            print(f"🧮 Recalculando cubo de ventas completo ({len(bd)} filas)...")
+            cubo = SalesCube(filtrar(bd))
+        elif filas == len(bd):
+            print("✅ Cubo de ventas al día, sin filas nuevas.")
+            return cubo
+        else:
+            print(f"➕ Agregando {len(bd) - filas} filas nuevas al cubo de ventas...")
+            cubo = cubo.agregar(filtrar(bd.iloc[filas:]))
+
+        try:
+            self._guardar(cubo, bd)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el cubo de ventas: {e}")
+        return cubo
@@ -0,0 +1,125 @@
+from io import BytesIO
+import numpy as np
+from matplotlib.figure import Figure
+
+
+class SellerChartTemplate:
+    """Plantilla reutilizable del gráfico "Ejecución vs Faltante por Vendedor".
+
+    La figura, los ejes, el estilo y la leyenda se crean una sola vez; para cada conjunto de datos
+    solo se actualizan las alturas de las barras, las etiquetas del eje X y los textos de porcentaje
+    (que se reutilizan en vez de crearse uno por barra). El `tight_layout` se calcula una vez por
+    combinación de título y etiquetas y luego se reaplica directamente.
+    Usar `obtener` para compartir la plantilla entre llamadas del mismo proceso.
+    """
+
+    COLOR_EJECUCION = "#89CFF0"
+    COLOR_FALTANTE = "#1f4e79"
+    ANCHO_BARRA = 0.4
+
+    _plantillas = {}
+
+    def __init__(self, figsize=(12, 5), titulo_fontsize=24, titulo_color=None, etiqueta_fontsize=11,
+                 formatear_nombre=None):
+        self.formatear_nombre = formatear_nombre or (lambda nombre: nombre)
+        self.etiqueta_fontsize = etiqueta_fontsize
+        self.fig = Figure(figsize=figsize)
+        self.ax = self.fig.add_subplot()
+        p = self.fig.subplotpars
+        self._margenes_iniciales = dict(left=p.left, right=p.right, bottom=p.bottom, top=p.top)
+        self.ax.set_ylabel("Porcentaje")
+        self._titulo_estilo = {"fontsize": titulo_fontsize, "fontweight": "bold"}
+        if titulo_color:
+            self._titulo_estilo["color"] = titulo_color
+
+        self._barras = None
+        self._textos = []
+        self._layouts = {}
+        self._construir_barras(1)
+        self.ax.legend(loc='lower center', bbox_to_anchor=(0.5, -0.25), ncol=2, fontsize=10)
+
+    @classmethod
+    def obtener(cls, **estilo):
+        """Plantilla cacheada en el proceso para este estilo (se crea la primera vez)."""
+        clave = tuple(sorted(estilo.items()))
+        if clave not in cls._plantillas:
+            cls._plantillas[clave] = cls(**estilo)
+        return cls._plantillas[clave]
+
+    # -------------------------
+    # Barras y textos (solo se reconstruyen si cambia el número de vendedores)
+    # -------------------------
+    def _construir_barras(self, n):
+        if self._barras is not None:
+            for contenedor in self._barras:
+                contenedor.remove()
+            for texto in self._textos:
+                texto.remove()
+        x = np.arange(n)
+        ceros = np.zeros(n)
+        ejec = self.ax.bar(x, ceros, width=self.ANCHO_BARRA, label="% Ejecución", color=self.COLOR_EJECUCION)
+        falt = self.ax.bar(x, ceros, width=self.ANCHO_BARRA, label="% Faltante", color=self.COLOR_FALTANTE)
+        self._barras = (ejec, falt)
+        self._textos = [
+            self.ax.text(0, 0, "", ha='center', va='center', color=color, fontsize=self.etiqueta_fontsize,
+                         fontweight='bold', visible=False)
+            for color in ("black", "white") for _ in range(n)
+        ]
+
+    def dibujar(self, vendedores, ejecucion, faltante, titulo):
+        vendedores = list(vendedores)
+        ejecucion = np.asarray(ejecucion, dtype=float)
+        faltante = np.asarray(faltante, dtype=float)
+        n = len(vendedores)
+        if len(self._barras[0]) != n:
+            self._construir_barras(n)
+
+        ejec, falt = self._barras
+        for rect, e, f in zip(falt, ejecucion, faltante):
+            rect.set_y(e)
+            rect.set_height(f)
+            rect.sticky_edges.y[:] = [e]  # como ax.bar(..., bottom=ejecucion)
+        for rect, e in zip(ejec, ejecucion):
+            rect.set_height(e)
+
+        # Porcentaje en el centro de cada segmento: los textos ya existen, solo se reubican
+        textos = iter(self._textos)
+        for rects, valores in ((ejec, ejecucion), (falt, faltante)):
+            for rect, val in zip(rects, valores):
+                texto = next(textos)
+                altura = rect.get_height()
+                texto.set_visible(altura > 0)
+                if altura > 0:
+                    texto.set_position((rect.get_x() + rect.get_width() / 2, rect.get_y() + altura / 2))
+                    texto.set_text(f"{val:.1f}%")
+
+        etiquetas = [self.formatear_nombre(v) for v in vendedores]
+        self.ax.set_title(titulo, **self._titulo_estilo)
+        self.ax.set_xticks(np.arange(n))
+        self.ax.set_xticklabels(etiquetas)
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+        clave = (titulo, tuple(etiquetas), tuple(self.ax.get_yticks()))
+        if clave in self._layouts:
+            self.fig.subplots_adjust(**self._layouts[clave])
+        else:
+            # tight_layout depende de la posición de partida (la leyenda cuelga de los ejes):
+            # se parte siempre de los márgenes por defecto, como una figura nueva
+            self.fig.subplots_adjust(**self._margenes_iniciales)
+            self.fig.tight_layout()
+            # tight_layout deja un motor de layout "placeholder" que obliga a savefig a dibujar dos veces
+            self.fig.set_layout_engine(None)
+            p = self.fig.subplotpars
+            self._layouts[clave] = dict(left=p.left, right=p.right, bottom=p.bottom, top=p.top)
+
+    def png(self, vendedores, ejecucion, faltante, titulo, dpi=150, compress_level=6):
+        # compress_level bajo para imágenes intermedias (se decodifican enseguida al componer)
+        self.dibujar(vendedores, ejecucion, faltante, titulo)
+        buf = BytesIO()
+        self.fig.savefig(buf, format='png', dpi=dpi, pil_kwargs={"compress_level": compress_level})
+        return buf.getvalue()
+
+    def guardar(self, path, vendedores, ejecucion, faltante, titulo, dpi=300):
+        self.dibujar(vendedores, ejecucion, faltante, titulo)
+        self.fig.savefig(path, dpi=dpi)
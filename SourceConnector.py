@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import pandas as pd
+
+
+class SQLConnector:
+    """Ejecuta una consulta sobre una conexión DB-API y entrega el resultado por lotes.
+
+    `conectar` es una función sin argumentos que devuelve la conexión (sqlite3, pyodbc...), así
+    el mismo conector sirve para la base de UnoBiable o para una base SQLite local de pruebas.
+    """
+
+    def __init__(self, conectar, consulta, parametros=(), descripcion="sql"):
+        self.conectar = conectar
+        self.consulta = consulta
+        self.parametros = parametros
+        self.descripcion = descripcion
+
+    def lotes(self, tamano=50000):
+        conexion = self.conectar()
+        try:
+            cursor = conexion.cursor()
+            cursor.execute(self.consulta, self.parametros)
+            columnas = [c[0] for c in cursor.description]
+            while True:
+                filas = cursor.fetchmany(tamano)
+                if not filas:
+                    break
+                yield pd.DataFrame.from_records([tuple(f) for f in filas], columns=columnas)
+        finally:
+            conexion.close()
+
+
+class CSVConnector:
+    """Lee un CSV exportado de la fuente por lotes (mismas columnas que la consulta)."""
+
+    def __init__(self, ruta, separador=",", encoding="utf-8"):
+        self.ruta = ruta
+        self.separador = separador
+        self.encoding = encoding
+        self.descripcion = f"csv:{os.path.basename(ruta)}"
+
+    def lotes(self, tamano=50000):
+        # todo como texto, igual que llega de la base; los tipos se fijan al derivar las columnas
+        yield from pd.read_csv(self.ruta, sep=self.separador, encoding=self.encoding, dtype=str,
+                               keep_default_na=False, chunksize=tamano)
+
+
+def _consulta(fuente, base_dir):
+    if fuente.get("consulta_archivo"):
+        with open(os.path.join(base_dir, fuente["consulta_archivo"]), "r", encoding="utf-8") as f:
+            return f.read()
+    if not fuente.get("consulta"):
+        raise ValueError("La fuente necesita 'consulta' o 'consulta_archivo'")
+    return fuente["consulta"]
+
+
+def crear_conector(fuente, base_dir):
+    """Conector para `fuente` ({"tipo": "sqlite" | "odbc" | "csv", ...}); las rutas son relativas a base_dir."""
+    tipo = fuente.get("tipo")
+    if tipo == "sqlite":
+        ruta = os.path.join(base_dir, fuente["ruta"])
+        return SQLConnector(lambda: sqlite3.connect(ruta), _consulta(fuente, base_dir),
+                            descripcion=f"sqlite:{os.path.basename(ruta)}")
+    if tipo == "odbc":
+        try:
+            import pyodbc
+        except ImportError:
+            raise ImportError("pyodbc no instalado. Instala con: pip install pyodbc")
+        cadena = fuente.get("cadena")
+        if not cadena:
+            raise ValueError("Falta 'cadena' (cadena de conexión ODBC) en unobiable_fuente")
+        return SQLConnector(lambda: pyodbc.connect(cadena, timeout=fuente.get("timeout", 30)),
+                            _consulta(fuente, base_dir), descripcion="odbc")
+    if tipo == "csv":
+        return CSVConnector(os.path.join(base_dir, fuente["ruta"]), fuente.get("separador", ","),
+                            fuente.get("encoding", "utf-8"))
+    raise ValueError(f"Tipo de fuente no soportado: {tipo}")
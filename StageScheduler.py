@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from Instrumentation import span
+
+
+class Etapa:
+    """Una etapa del flujo: qué ejecuta, de qué etapas depende y cuáles son sus entradas y salidas.
+
+    `entradas` es una función sin argumentos que devuelve un valor serializable en JSON (config
+    relevante, fecha, huellas de archivos...); se evalúa justo antes de decidir si la etapa corre,
+    cuando sus dependencias ya terminaron. `salidas` devuelve las rutas que produce la etapa.
+    Con `vigencia` (segundos) una etapa cuyas entradas no se pueden ver (una base externa) se da por
+    vigente durante ese tiempo desde su última corrida exitosa. Las etapas con `hilo_principal` se
+    ejecutan en el hilo que llama a `ejecutar` (Excel/COM no se puede usar desde otros hilos).
+    Con `huella_de` la etapa se omite cuando se omitiría la etapa indicada (p. ej. precalentar el
+    renderer solo si el dashboard va a generarse) y no guarda estado propio. Como las entradas de la
+    etapa indicada pueden depender de lo que escriban sus dependencias, la decisión espera a que todas
+    estén decididas: si alguna va a correr, la etapa corre ya (en paralelo con ella); si no, se usa la
+    huella de la etapa indicada.
+    Si una etapa `opcional` falla, las que dependen de ella corren igual (con los datos que haya);
+    al no quedar registrada como exitosa, la siguiente corrida la vuelve a intentar.
+    """
+
+    def __init__(self, nombre, funcion, depende=(), entradas=None, salidas=None, vigencia=None,
+                 hilo_principal=False, huella_de=None, opcional=False):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.depende = tuple(depende)
+        self.entradas = entradas
+        self.salidas = salidas
+        self.vigencia = vigencia
+        self.hilo_principal = hilo_principal
+        self.huella_de = huella_de
+        self.opcional = opcional
+
+
+class StageScheduler:
+    """Ejecuta las etapas en orden de dependencias, en paralelo cuando son independientes.
+
+    Una etapa se omite si sus entradas tienen la misma huella que en su última corrida exitosa, sus
+    salidas siguen en disco sin cambios y ninguna de sus dependencias cambió algo en esta corrida
+    (una dependencia con salidas declaradas que se ejecutó y las dejó idénticas no cuenta).
+    Si una etapa falla, las que dependen de ella no se ejecutan y su estado anterior se conserva,
+    así la siguiente corrida retoma desde ahí. El estado se guarda en `estado_path` (JSON).
+    """
+
+    EJECUTADA = "ejecutada"
+    OMITIDA = "omitida"
+    FALLIDA = "fallida"
+    BLOQUEADA = "bloqueada"
+
+    def __init__(self, estado_path, forzar=None):
+        self.estado_path = estado_path
+        # None: nada forzado; vacío: todas las etapas; si no, los nombres indicados
+        self.forzar = None if forzar is None else set(forzar)
+        self.etapas = {}
+        self.estado = self._leer_estado()
+        self._lock = threading.Lock()
+        self._cambiaron = set()  # etapas ejecutadas en esta corrida que cambiaron algo
+
+    def agregar(self, etapa):
+        faltantes = [d for d in etapa.depende if d not in self.etapas]
+        if faltantes:
+            raise ValueError(f"La etapa {etapa.nombre} depende de etapas no declaradas: {faltantes}")
+        self.etapas[etapa.nombre] = etapa
+        return etapa
+
+    # -------------------------
+    # Estado persistido
+    # -------------------------
+    def _leer_estado(self):
+        try:
+            with open(self.estado_path, "r", encoding="utf-8") as f:
+                estado = json.load(f)
+            return estado if isinstance(estado, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar_estado(self):
+        try:
+            os.makedirs(os.path.dirname(self.estado_path), exist_ok=True)
+            # las huellas de archivos que ya no existen (salidas de días anteriores) no se conservan
+            self.estado["archivos"] = {r: h for r, h in self.estado.get("archivos", {}).items() if os.path.exists(r)}
+            tmp = self.estado_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.estado, f, indent=1, ensure_ascii=False)
+            os.replace(tmp, self.estado_path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el estado de las etapas: {e}")
+
+    # -------------------------
+    # Huellas
+    # -------------------------
+    def huella_archivo(self, ruta):
+        """sha256 del contenido; se reutiliza el anterior mientras no cambien tamaño y mtime."""
+        try:
+            st = os.stat(ruta)
+        except OSError:
+            return None
+        with self._lock:
+            previa = self.estado.setdefault("archivos", {}).get(ruta)
+        if previa and previa["size"] == st.st_size and previa["mtime_ns"] == st.st_mtime_ns:
+            return previa["sha256"]
+        h = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloque)
+        with self._lock:
+            self.estado["archivos"][ruta] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+        return h.hexdigest()
+
+    def huellas(self, rutas):
+        return {ruta: self.huella_archivo(ruta) for ruta in sorted(rutas)}
+
+    @staticmethod
+    def _hash(valor):
+        return hashlib.sha256(json.dumps(valor, sort_keys=True, default=str).encode()).hexdigest()
+
+    # -------------------------
+    # Decisión y ejecución
+    # -------------------------
+    def _previas_de_huella(self, etapa):
+        """Dependencias de la etapa de referencia de `etapa` (sin contar a `etapa` misma)."""
+        return [d for d in self.etapas[etapa.huella_de].depende if d != etapa.nombre]
+
+    def _lista(self, etapa, resultados, corriendo):
+        """Si ya se puede decidir la etapa: dependencias terminadas y, con `huella_de`, alguna de las
+        de la etapa de referencia lanzada o todas terminadas."""
+        if not all(d in resultados for d in etapa.depende):
+            return False
+        if not etapa.huella_de:
+            return True
+        previas = self._previas_de_huella(etapa)
+        return any(d in corriendo for d in previas) or all(d in resultados for d in previas)
+
+    def _listas(self, pendientes, resultados, corriendo):
+        """Etapas que ya se pueden decidir; las de `huella_de` al final, cuando ya se sabe cuáles
+        dependencias de su etapa de referencia se lanzaron en esta vuelta."""
+        yield from [e for e in pendientes.values() if not e.huella_de and self._lista(e, resultados, corriendo)]
+        yield from [e for e in pendientes.values() if e.huella_de and self._lista(e, resultados, corriendo)]
+
+    def _motivo_para_correr(self, etapa, resultados, corriendo=()):
+        """Por qué debe correr la etapa (texto), o (None, huella de entradas) si puede omitirse."""
+        if etapa.huella_de:
+            # sus entradas todavía pueden cambiar: se corre sin calcular una huella que quedaría vieja
+            lanzadas = [d for d in self._previas_de_huella(etapa) if d in corriendo]
+            if lanzadas:
+                return f"corre {', '.join(lanzadas)}", None
+        referencia = self.etapas[etapa.huella_de] if etapa.huella_de else etapa
+        entradas = self._hash(referencia.entradas()) if referencia.entradas else None
+        if self.forzar is not None and (not self.forzar or etapa.nombre in self.forzar
+                                        or referencia.nombre in self.forzar):
+            return "forzada", entradas
+        previas = self._previas_de_huella(etapa) if etapa.huella_de else etapa.depende
+        corridas = [d for d in previas if d in self._cambiaron]
+        if corridas:
+            return f"cambió {', '.join(corridas)}", entradas
+        previo = self.estado.get("etapas", {}).get(referencia.nombre)
+        if previo is None:
+            return "sin corrida exitosa previa", entradas
+        if referencia.entradas is None and referencia.vigencia is None:
+            return "sin entradas declaradas", entradas
+        if entradas != previo.get("entradas"):
+            return "cambiaron las entradas", entradas
+        if referencia.vigencia is not None and time.time() - previo.get("fin", 0) > referencia.vigencia:
+            return "venció la vigencia", entradas
+        if previo.get("salidas") and self.huellas(previo["salidas"]) != previo["salidas"]:
+            return "cambiaron o faltan las salidas", entradas
+        return None, entradas
+
+    def _correr(self, etapa):
+        inicio = time.perf_counter()
+        with span(f"etapa.{etapa.nombre}"):
+            etapa.funcion()
+        return time.perf_counter() - inicio
+
+    def _registrar(self, etapa, entradas, segundos):
+        if etapa.huella_de:
+            return  # no produce nada: no obliga a correr a las que dependen de ella
+        salidas = self.huellas(etapa.salidas()) if etapa.salidas else {}
+        previo = self.estado.get("etapas", {}).get(etapa.nombre)
+        if not etapa.salidas or previo is None or previo.get("salidas") != salidas:
+            self._cambiaron.add(etapa.nombre)
+        with self._lock:
+            self.estado.setdefault("etapas", {})[etapa.nombre] = {
+                "entradas": entradas, "salidas": salidas, "fin": time.time(), "segundos": round(segundos, 3),
+            }
+            self._guardar_estado()
+
+    def ejecutar(self):
+        """Corre todas las etapas y devuelve {nombre: ejecutada | omitida | fallida | bloqueada}."""
+        resultados = {}
+        pendientes = dict(self.etapas)
+        en_curso = {}  # future -> (etapa, huella de entradas)
+        corriendo = set()  # etapas lanzadas que no han terminado
+        inicio = time.perf_counter()
+
+        def terminar(etapa, entradas, error=None, segundos=0.0):
+            corriendo.discard(etapa.nombre)
+            if error is None:
+                self._registrar(etapa, entradas, segundos)
+                resultados[etapa.nombre] = self.EJECUTADA
+                print(f"✅ Etapa {etapa.nombre} terminada en {segundos:.1f}s")
+            else:
+                resultados[etapa.nombre] = self.FALLIDA
+                print(f"❌ Etapa {etapa.nombre} falló: {error}")
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.etapas))) as pool:
+            while pendientes or en_curso:
+                # etapas cuyas dependencias ya terminaron
+                listas = []
+                principales = []
+                for etapa in self._listas(pendientes, resultados, corriendo):
+                    listas.append(etapa)
+                    del pendientes[etapa.nombre]
+                    fallidas = [d for d in etapa.depende if resultados[d] in (self.FALLIDA, self.BLOQUEADA)
+                                and not self.etapas[d].opcional]
+                    if fallidas:
+                        resultados[etapa.nombre] = self.BLOQUEADA
+                        print(f"⛔ Etapa {etapa.nombre} no se ejecuta: falló {', '.join(fallidas)}")
+                        continue
+                    motivo, entradas = self._motivo_para_correr(etapa, resultados, corriendo)
+                    if motivo is None:
+                        resultados[etapa.nombre] = self.OMITIDA
+                        print(f"⏭️ Etapa {etapa.nombre} omitida: entradas sin cambios")
+                        continue
+                    print(f"▶️ Etapa {etapa.nombre} ({motivo})")
+                    corriendo.add(etapa.nombre)
+                    if etapa.hilo_principal:
+                        principales.append((etapa, entradas))
+                    else:
+                        en_curso[pool.submit(self._correr, etapa)] = (etapa, entradas)
+
+                # las del hilo principal corren aquí mientras las demás avanzan en el pool
+                for etapa, entradas in principales:
+                    try:
+                        terminar(etapa, entradas, segundos=self._correr(etapa))
+                    except Exception as e:
+                        terminar(etapa, entradas, error=e)
+                if listas or not en_curso:
+                    continue
+                hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    etapa, entradas = en_curso.pop(futuro)
+                    try:
+                        terminar(etapa, entradas, segundos=futuro.result())
+                    except Exception as e:
+                        terminar(etapa, entradas, error=e)
+
+        resumen = ", ".join(f"{n}: {e}" for n, e in resultados.items())
+        print(f"📋 Etapas en {time.perf_counter() - inicio:.1f}s — {resumen}")
+        return resultados
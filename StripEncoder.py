@@ -0,0 +1,262 @@
+import os
+import time
+import zlib
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+
+def _adler32_combine(adler1, adler2, len2):
+    """Adler-32 de A+B a partir de los de A y B (misma lógica que adler32_combine de zlib)."""
+    base = 65521
+    rem = len2 % base
+    sum1 = adler1 & 0xFFFF
+    sum2 = (rem * sum1) % base
+    sum1 += (adler2 & 0xFFFF) + base - 1
+    sum2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + base - rem
+    if sum1 >= base:
+        sum1 -= base
+    if sum1 >= base:
+        sum1 -= base
+    if sum2 >= (base << 1):
+        sum2 -= (base << 1)
+    if sum2 >= base:
+        sum2 -= base
+    return sum1 | (sum2 << 16)
+
+
+class PNGStripWriter:
+    """Escribe un PNG RGB por franjas horizontales sin tener la imagen completa en memoria.
+
+    Cada franja (PIL RGB del ancho final) se filtra y se comprime por bloques de filas. Con
+    `workers > 1` los bloques se comprimen en paralelo como tramos deflate independientes
+    (cerrados con Z_SYNC_FLUSH) que se concatenan en orden en un único flujo zlib válido.
+    Con `optimizar` se elige por fila el filtro (None/Sub/Up) que mejor comprime.
+    Se escribe en `path + ".tmp"` y solo un cierre exitoso lo mueve a `path`: si la composición
+    falla a mitad no queda un PNG truncado que el correo pueda tomar como el dashboard más reciente.
+    """
+
+    FILAS_POR_BLOQUE = 128
+
+    def __init__(self, path, width, height, compress_level=6, optimizar=False, workers=1):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.compress_level = compress_level
+        self.optimizar = optimizar
+        self.workers = max(1, workers or 1)
+        self.filas_escritas = 0
+        self.tiempo_codificacion = 0.0
+        self._fila_previa = None
+        self._tmp = path + ".tmp"
+        self._f = open(self._tmp, "wb")
+        self._f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+        if self.workers > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)  # zlib y numpy liberan el GIL
+            self._en_vuelo = deque()
+            self._adler = 1
+            self._z = None
+            self._chunk(b"IDAT", self._cabecera_zlib(compress_level))
+        else:
+            self._pool = None
+            self._z = zlib.compressobj(compress_level)
+
+    @staticmethod
+    def _cabecera_zlib(level):
+        flevel = 0 if level < 2 else 1 if level < 6 else 2 if level == 6 else 3
+        cmf, flg = 0x78, flevel << 6
+        flg += 31 - ((cmf << 8) + flg) % 31
+        return bytes([cmf, flg])
+
+    def _chunk(self, tipo, datos):
+        self._f.write(struct.pack(">I", len(datos)))
+        self._f.write(tipo)
+        self._f.write(datos)
+        self._f.write(struct.pack(">I", zlib.crc32(tipo + datos) & 0xFFFFFFFF))
+
+    # -------------------------
+    # Filtrado y compresión de bloques
+    # -------------------------
+    @staticmethod
+    def _filtrar(pixeles, fila_previa, optimizar):
+        alto = pixeles.shape[0]
+        planas = pixeles.reshape(alto, -1)
+        filas = np.empty((alto, 1 + planas.shape[1]), dtype=np.uint8)
+
+        # Filtro Sub: cada byte menos el del píxel anterior (aritmética módulo 256)
+        sub = np.empty_like(planas)
+        sub[:, :3] = planas[:, :3]
+        np.subtract(planas[:, 3:], planas[:, :-3], out=sub[:, 3:])
+        if not optimizar:
+            filas[:, 0] = 1
+            filas[:, 1:] = sub
+            return filas.tobytes()
+
+        # Filtro Up: cada byte menos el de la fila anterior
+        arriba = np.empty_like(planas)
+        previa = fila_previa.reshape(-1) if fila_previa is not None else np.zeros_like(planas[0])
+        np.subtract(planas[0], previa, out=arriba[0])
+        np.subtract(planas[1:], planas[:-1], out=arriba[1:])
+
+        candidatos = (planas, sub, arriba)  # tipos de filtro 0, 1, 2
+        # heurística estándar: menor suma de |byte| interpretado con signo (min(b, 256 - b))
+        puntajes = np.stack([np.minimum(c, 0 - c).sum(axis=1, dtype=np.uint32) for c in candidatos])
+        tipo = puntajes.argmin(axis=0)
+        filas[:, 0] = tipo
+        for t, c in enumerate(candidatos):
+            filas[tipo == t, 1:] = c[tipo == t]
+        return filas.tobytes()
+
+    @classmethod
+    def _comprimir_bloque(cls, pixeles, fila_previa, optimizar, level):
+        datos = cls._filtrar(pixeles, fila_previa, optimizar)
+        z = zlib.compressobj(level, zlib.DEFLATED, -15)
+        return z.compress(datos) + z.flush(zlib.Z_SYNC_FLUSH), zlib.adler32(datos), len(datos)
+
+    def _escribir_siguiente(self):
+        comprimido, adler, largo = self._en_vuelo.popleft().result()
+        self._adler = _adler32_combine(self._adler, adler, largo)
+        if comprimido:
+            self._chunk(b"IDAT", comprimido)
+
+    def _write_bloque(self, pixeles):
+        previa, self._fila_previa = self._fila_previa, pixeles[-1].copy()
+        if self._pool is None:
+            datos = self._z.compress(self._filtrar(pixeles, previa, self.optimizar))
+            if datos:
+                self._chunk(b"IDAT", datos)
+        else:
+            self._en_vuelo.append(self._pool.submit(
+                self._comprimir_bloque, pixeles, previa, self.optimizar, self.compress_level
+            ))
+            # Cola acotada: como mucho 2 bloques por worker en memoria
+            while len(self._en_vuelo) > 2 * self.workers:
+                self._escribir_siguiente()
+        self.filas_escritas += pixeles.shape[0]
+
+    def write(self, franja):
+        if franja.size[0] != self.width:
+            raise ValueError(f"Ancho de franja {franja.size[0]} != {self.width}")
+        inicio = time.perf_counter()
+        franja = franja.convert("RGB")
+        # se procesa por bloques de filas para que los buffers intermedios sean pequeños
+        for y in range(0, franja.size[1], self.FILAS_POR_BLOQUE):
+            bloque = franja.crop((0, y, self.width, min(y + self.FILAS_POR_BLOQUE, franja.size[1])))
+            self._write_bloque(np.asarray(bloque, dtype=np.uint8))
+        self.tiempo_codificacion += time.perf_counter() - inicio
+
+    def _cerrar_archivo(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def _descartar(self):
+        self._cerrar_archivo()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def close(self):
+        if self._f is None:
+            return
+        inicio = time.perf_counter()
+        try:
+            if self.filas_escritas != self.height:
+                raise ValueError(f"Se escribieron {self.filas_escritas} filas de {self.height}")
+            if self._pool is None:
+                self._chunk(b"IDAT", self._z.flush())
+            else:
+                while self._en_vuelo:
+                    self._escribir_siguiente()
+                final = zlib.compressobj(self.compress_level, zlib.DEFLATED, -15).flush()
+                self._chunk(b"IDAT", final + struct.pack(">I", self._adler))
+            self._chunk(b"IEND", b"")
+            self._cerrar_archivo()
+            os.replace(self._tmp, self.path)
+        except BaseException:
+            self._descartar()
+            raise
+        finally:
+            self.tiempo_codificacion += time.perf_counter() - inicio
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._descartar()
+            return
+        self.close()
+
+
+class RasterStripWriter:
+    """JPEG/WebP: Pillow no permite escribirlos por franjas, así que se arma el lienzo y se guarda.
+
+    Como en el PNG, se guarda en `path + ".tmp"` y se mueve a `path` solo si el guardado terminó.
+    """
+
+    LIMITES = {"WEBP": 16383, "JPEG": 65500}
+
+    def __init__(self, path, width, height, formato="JPEG", calidad=85):
+        limite = self.LIMITES.get(formato, 65500)
+        if width > limite or height > limite:
+            raise ValueError(f"{formato} admite como máximo {limite}px por lado ({width}x{height})")
+        self.path = path
+        self.formato = formato
+        self.calidad = calidad
+        self.tiempo_codificacion = 0.0
+        self._lienzo = Image.new("RGB", (width, height), "white")
+        self._y = 0
+
+    def write(self, franja):
+        self._lienzo.paste(franja, (0, self._y))
+        self._y += franja.size[1]
+
+    def close(self):
+        if self._lienzo is None:
+            return
+        inicio = time.perf_counter()
+        opciones = {"quality": self.calidad}
+        if self.formato == "WEBP":
+            opciones["method"] = 4
+        tmp = self.path + ".tmp"
+        try:
+            self._lienzo.save(tmp, self.formato, **opciones)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            self._lienzo = None
+            self.tiempo_codificacion += time.perf_counter() - inicio
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._lienzo = None
+            return
+        self.close()
+
+
+# "pdf" no se escribe por franjas sino por páginas (PDFPageWriter, desde DashboardCompositor.componer)
+EXTENSIONES = {"png": ".png", "png-optimizado": ".png", "jpeg": ".jpg", "webp": ".webp", "pdf": ".pdf"}
+
+
+def crear_writer(path, width, height, formato="png", calidad=85, compress_level=6, workers=1):
+    """Devuelve el writer por franjas para `formato` ('png', 'png-optimizado', 'jpeg' o 'webp')."""
+    if formato == "png":
+        return PNGStripWriter(path, width, height, compress_level=compress_level, workers=workers)
+    if formato == "png-optimizado":
+        return PNGStripWriter(path, width, height, compress_level=9, optimizar=True, workers=workers)
+    if formato in ("jpeg", "webp"):
+        return RasterStripWriter(path, width, height, formato.upper(), calidad)
+    raise ValueError(f"Formato de salida no soportado: {formato}")
@@ -1,89 +1,145 @@
-import requests
 from datetime import datetime
 import os
-import xml.etree.ElementTree as ET
-import xlwings as xw
+from RateProvider import RateProvider
+from XlsxPatcher import XlsxPatcher
+from ExcelSession import ExcelSession
+from Instrumentation import medido, span
 
 
 class TasaUpdater:
-    def __init__(self,base_dir):
+    def __init__(self,base_dir, timeout=10, reintentos=3, writer="xlwings", sesion=None):
         self.BASE_DIR = base_dir
         self.DATA_DIR = os.path.join(self.BASE_DIR, "data")
         self.INPUT_FILENAME = "Carex COL Reporte Vendedor.xlsx"
         self.INPUT_PATH = os.path.join(self.DATA_DIR, self.INPUT_FILENAME)
+        # timeout, reintentos y caché por fecha; nunca se pide la tasa por consola
+        self.proveedor = RateProvider(os.path.join(self.DATA_DIR, "cache"), timeout=timeout, reintentos=reintentos)
+        # "xlwings" abre Excel; "xlsx" edita la hoja TC dentro del archivo sin Excel (sirve en Linux)
+        if writer not in ("xlwings", "xlsx"):
+            raise ValueError(f"Writer de tasas no soportado: {writer}")
+        self.writer = writer
+        # sesión de Excel compartida con otras etapas (la guarda y cierra quien la creó)
+        self.sesion = sesion
 
     def obtener_tasa_eur_usd(self):
-        url = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml"
-        try:
-            resp = requests.get(url)
-            resp.raise_for_status()
-            tree = ET.fromstring(resp.content)
-            for cube in tree.findall(".//{*}Cube[@currency='USD']"):
-                return float(cube.attrib['rate'])
-        except Exception as e:
-            print(f"❌ Error obteniendo EUR/USD: {e}")
-        return None
+        return self.proveedor.tasas_actuales()[1]
 
     def obtener_tasa_cop_usd(self):
-        url = "https://www.datos.gov.co/resource/ceyp-9c7c.json?$order=vigenciadesde DESC&$limit=1"
-        try:
-            resp = requests.get(url)
-            resp.raise_for_status()
-            data = resp.json()
-            if data:
-                return float(data[0]['valor'])
-        except Exception as e:
-            print(f"⚠️ Error obteniendo TRM COP/USD: {e}")
-            try:
-                return float(input("🔁 Ingresa manualmente la TRM COP/USD: "))
-            except:
-                print("❌ Valor inválido.")
-        return None
+        return self.proveedor.tasas_actuales()[0]
 
     def actualizar_excel_sin_corromper(self, path, fecha, cop_usd, eur_usd):
-        eur_cop = eur_usd * cop_usd
+        self.actualizar_excel_filas(path, [(fecha, cop_usd, eur_usd)])
 
-        app = xw.App(visible=False)
-        libro = app.books.open(path)
-        hoja = libro.sheets['TC']
+    @staticmethod
+    def _clave_fecha(valor):
+        # Excel devuelve los números como float (20250304.0): se normalizan para comparar con la fecha entera
+        if isinstance(valor, float) and valor.is_integer():
+            valor = int(valor)
+        return str(valor)
 
-        fecha_str = str(fecha)
-        encontrada = False
+    @staticmethod
+    def _tramos_contiguos(filas):
+        """Agrupa [(fila, valores), ...] ordenadas en tramos de filas consecutivas."""
+        tramos = []
+        for fila, valores in sorted(filas):
+            if tramos and fila == tramos[-1][0] + len(tramos[-1][1]):
+                tramos[-1][1].append(valores)
+            else:
+                tramos.append((fila, [valores]))
+        return tramos
 
-        ultima_fila = hoja.range("A" + str(hoja.cells.last_cell.row)).end('up').row
+    @medido("tasas.escritura")
+    def actualizar_excel_filas(self, path, filas):
+        """Escribe varias filas (fecha, cop_usd, eur_usd) de la hoja TC abriendo el libro una sola vez."""
+        if self.writer == "xlsx":
+            self._actualizar_xlsx(path, filas)
+        else:
+            self._actualizar_xlwings(path, filas)
+
+    def _actualizar_xlsx(self, path, filas):
+        """Edita la hoja TC dentro del .xlsx; el resto del libro se copia sin tocar.
+
+        Si D tiene la fórmula C/B se conserva y solo se actualiza su valor. Las fórmulas de BD
+        que leen TC se recalculan la próxima vez que Excel abra el libro.
+        """
+        valores = {}
+        for fecha, cop_usd, eur_usd in filas:
+            valores[self._clave_fecha(fecha)] = {"B": cop_usd, "C": eur_usd * cop_usd, "D": eur_usd}
 
-        for fila in range(2, ultima_fila + 1):
-            if str(hoja.range(f"A{fila}").value) == fecha_str:
-                hoja.range(f"B{fila}").value = cop_usd
-                hoja.range(f"C{fila}").value = eur_cop
-                hoja.range(f"D{fila}").value = eur_usd
-                encontrada = True
-                print(f"🔁 Actualizada fila {fila} para fecha {fecha}")
-                break
-
-        if not encontrada:
-            nueva_fila = ultima_fila + 1
-            hoja.range(f"A{nueva_fila}").value = fecha
-            hoja.range(f"B{nueva_fila}").value = cop_usd
-            hoja.range(f"C{nueva_fila}").value = eur_cop
-            hoja.range(f"D{nueva_fila}").value = eur_usd
-            print(f"➕ Añadida fila {nueva_fila} para fecha {fecha}")
-
-        libro.save()
-        libro.close()
-        app.quit()
+        patcher = XlsxPatcher(path)
+        actualizadas, nuevas = patcher.actualizar_filas("TC", valores)
+        for inicio, bloque in self._tramos_contiguos((fila, None) for fila in actualizadas.values()):
+            print(f"🔁 Actualizadas filas {inicio}-{inicio + len(bloque) - 1}")
+        if nuevas:
+            print(f"➕ Añadidas filas {min(nuevas.values())}-{max(nuevas.values())}")
+        partes = patcher.guardar()
+        print(f"✅ Archivo actualizado sin Excel ({len(partes)} partes reescritas).")
+
+    def _actualizar_xlwings(self, path, filas):
+        if self.sesion is not None:
+            self._escribir_tc(self.sesion.abrir().sheets['TC'], filas)
+            print("✅ Hoja TC actualizada en la sesión de Excel compartida.")
+            return
+        with ExcelSession(path) as sesion:
+            self._escribir_tc(sesion.libro.sheets['TC'], filas)
+            sesion.guardar()
         print("✅ Archivo actualizado sin corromper.")
 
+    def _escribir_tc(self, hoja, filas):
+        """La columna de fechas se lee con una sola llamada y las escrituras se hacen por rangos 2D
+        (un rango por tramo de filas consecutivas), en vez de una llamada COM por celda.
+        """
+        ultima_fila = hoja.range("A" + str(hoja.cells.last_cell.row)).end('up').row
+        indice = {}
+        if ultima_fila >= 2:
+            fechas = hoja.range(f"A2:A{ultima_fila}").options(ndim=1).value
+            for fila, valor in enumerate(fechas, start=2):
+                indice.setdefault(self._clave_fecha(valor), fila)
+
+        actualizadas, nuevas = {}, {}
+        for fecha, cop_usd, eur_usd in filas:
+            valores = [cop_usd, eur_usd * cop_usd, eur_usd]
+            fila = indice.get(self._clave_fecha(fecha))
+            if fila is not None:
+                actualizadas[fila] = valores
+            else:
+                nuevas[self._clave_fecha(fecha)] = [fecha] + valores
+
+        for inicio, bloque in self._tramos_contiguos(actualizadas.items()):
+            hoja.range(f"B{inicio}").value = bloque
+            print(f"🔁 Actualizadas filas {inicio}-{inicio + len(bloque) - 1}")
+        if nuevas:
+            hoja.range(f"A{ultima_fila + 1}").value = list(nuevas.values())
+            print(f"➕ Añadidas filas {ultima_fila + 1}-{ultima_fila + len(nuevas)}")
+
     def main(self):
+        """Escribe las tasas del día en TC; devuelve False si no se pudo."""
         if not os.path.exists(self.INPUT_PATH):
             print(f"❌ Archivo no encontrado: {self.INPUT_PATH}")
-            return
+            return False
 
         fecha_actual = int(datetime.today().strftime('%Y%m%d'))
-        eur_usd = self.obtener_tasa_eur_usd()
-        cop_usd = self.obtener_tasa_cop_usd()
+        with span("tasas.consulta"):
+            cop_usd, eur_usd = self.proveedor.tasas_actuales()  # ambas fuentes en paralelo
 
         if eur_usd and cop_usd:
             self.actualizar_excel_sin_corromper(self.INPUT_PATH, fecha_actual, cop_usd, eur_usd)
-        else:
-            print("❌ No se pudieron obtener todas las tasas.")
+            return True
+        print("❌ No se pudieron obtener todas las tasas.")
+        return False
+
+    def backfill(self, desde, hasta):
+        """Completa la hoja TC para cada día entre `desde` y `hasta` (una consulta masiva por fuente)."""
+        if not os.path.exists(self.INPUT_PATH):
+            print(f"❌ Archivo no encontrado: {self.INPUT_PATH}")
+            return False
+
+        with span("tasas.consulta", desde=str(desde), hasta=str(hasta)):
+            tasas = self.proveedor.tasas_rango(desde, hasta)
+        if not tasas:
+            print("❌ No se obtuvieron tasas para el rango.")
+            return False
+        filas = [(int(dia.strftime('%Y%m%d')), cop_usd, eur_usd) for dia, (cop_usd, eur_usd) in sorted(tasas.items())]
+        print(f"📅 {len(filas)} días con tasas entre {desde} y {hasta}")
+        self.actualizar_excel_filas(self.INPUT_PATH, filas)
+        return True
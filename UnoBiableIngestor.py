@@ -0,0 +1,128 @@
+import time
+import numpy as np
+import pandas as pd
+
+
+class UnoBiableIngestor:
+    """Carga la hoja BD directamente desde la consulta de UnoBiable, sin refrescar el Excel.
+
+    La consulta devuelve los campos del "Listado 001" (los mismos que trae la conexión del libro);
+    las columnas que en BD son fórmulas (TC, Valor Total USD, Concepto, Año, Mes, Vendedor, TC USD,
+    Moneda) se calculan aquí con las hojas TC y Listado del libro, con la misma lógica que las
+    fórmulas. El resultado se escribe lote a lote en la caché columnar, de donde lo lee el dashboard.
+    """
+
+    CAMPOS = [
+        'Periodo', 'Nombre Centro de Operacion', 'Tipo de Documento', 'Numero_documento', 'Fecha',
+        'Moneda_docto', 'Nombre Vendedor', 'Notas', 'Nombre Cliente_factura', 'Desc Pais Cliente_factura',
+        'Nombre Item', 'Valor_neto_docto',
+    ]
+    # Tipos de cada columna de BD, en el orden de la hoja (como los deja pd.read_excel)
+    COLUMNAS_BD = {
+        'Periodo': 'float64', 'Nombre Centro de Operacion': 'str', 'Tipo de Documento': 'str',
+        'Numero_documento': 'float64', 'Fecha': 'float64', 'Moneda_docto': 'str', 'Nombre Vendedor': 'str',
+        'Notas': 'str', 'Nombre Cliente_factura': 'str', 'Desc Pais Cliente_factura': 'str',
+        'Nombre Item': 'str', 'Valor_neto_docto': 'float64', 'TC': 'float64', 'Valor Total USD': 'float64',
+        'Concepto': 'str', 'Año': 'float64', 'Mes': 'float64', 'Vendedor': 'str', 'TC USD': 'float64',
+        'Moneda': 'str',
+    }
+    CLIENTE_USD = 'JUAN MATAS SAS'  # factura en COP pero se reporta en USD
+    VENDEDOR_POR_DEFECTO = 'COMERCIALIZADORA INTERNACIONAL CARIBBEAN EXOTICS S A'
+
+    def __init__(self, cache, conector, tamano_lote=50000):
+        self.cache = cache
+        self.conector = conector
+        self.tamano_lote = tamano_lote
+        self._tasas = None
+        self._vendedor_por_cliente = None
+
+    # -------------------------
+    # Tablas de búsqueda (hojas TC y Listado del libro)
+    # -------------------------
+    def _cargar_busquedas(self):
+        # BUSCARV exacto devuelve la primera coincidencia: se descartan las claves repetidas
+        tc = self.cache.read_sheet('TC')
+        fechas = pd.to_numeric(tc.iloc[:, 0], errors='coerce')
+        tasas = pd.DataFrame({'cop_usd': tc.iloc[:, 1].to_numpy(), 'usd_eur': tc.iloc[:, 3].to_numpy()},
+                             index=fechas.to_numpy())
+        self._tasas = tasas[~tasas.index.duplicated() & tasas.index.notna()].apply(pd.to_numeric, errors='coerce')
+
+        listado = self.cache.read_sheet('Listado')
+        # BUSCARV no distingue mayúsculas
+        clientes = listado.iloc[:, 0].astype(str).str.upper()
+        vendedores = pd.Series(listado.iloc[:, 1].to_numpy(), index=clientes.to_numpy())
+        self._vendedor_por_cliente = vendedores[~vendedores.index.duplicated()]
+
+    @staticmethod
+    def _texto(serie):
+        # '' y None quedan vacíos (NaN), como los lee pd.read_excel
+        serie = serie.astype(object).where(serie.notna(), None)
+        serie = serie.map(lambda v: v if v is None or isinstance(v, str) else str(v))
+        return serie.where(serie != '', None).astype('str')
+
+    def derivar(self, lote):
+        """Tipos de los campos de la consulta y columnas calculadas de BD para un lote."""
+        faltantes = [c for c in self.CAMPOS if c not in lote.columns]
+        if faltantes:
+            raise ValueError(f"Columnas faltantes en la consulta: {faltantes}")
+        df = pd.DataFrame(index=range(len(lote)))
+        for col in self.CAMPOS:
+            valores = lote[col].reset_index(drop=True)
+            if self.COLUMNAS_BD[col] == 'float64':
+                df[col] = pd.to_numeric(valores, errors='coerce').astype('float64')
+            else:
+                df[col] = self._texto(valores)
+
+        fecha = df['Fecha']
+        moneda = df['Moneda_docto'].str.upper()
+        cliente = df['Nombre Cliente_factura'].str.upper()
+        es_cliente_usd = (cliente == self.CLIENTE_USD).to_numpy()
+        valor = df['Valor_neto_docto'].to_numpy()
+
+        # =BUSCARV(Fecha;TC!A:D;4) y =BUSCARV(Fecha;TC!A:D;2)
+        df['TC'] = fecha.map(self._tasas['usd_eur']).astype('float64')
+        df['TC USD'] = fecha.map(self._tasas['cop_usd']).astype('float64')
+
+        # =SI(Moneda="EUR";TC*Valor;SI(Cliente="JUAN MATAS SAS";Valor/TC USD;Valor))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['Valor Total USD'] = np.where(
+                (moneda == 'EUR').to_numpy(), df['TC'].to_numpy() * valor,
+                np.where(es_cliente_usd, valor / df['TC USD'].to_numpy(), valor)
+            )
+
+        # =SI(Tipo="CFE";"FACTURA";SI(Notas contiene "ANULA" o "CANCELLATION";"ANULACIÓN FE";"NOTAS"))
+        notas = df['Notas'].str.upper()
+        anulacion = (notas.str.contains('ANULA', regex=False) | notas.str.contains('CANCELLATION', regex=False))
+        df['Concepto'] = np.where(
+            (df['Tipo de Documento'].str.upper() == 'CFE').to_numpy(), 'FACTURA',
+            np.where(anulacion.fillna(False).to_numpy(dtype=bool), 'ANULACIÓN FE', 'NOTAS')
+        )
+        df['Concepto'] = df['Concepto'].astype('str')
+
+        # =IZQUIERDA(Fecha;4) y =EXTRAE(Fecha;5;2)
+        df['Año'] = np.floor(fecha / 10000)
+        df['Mes'] = np.floor(fecha / 100) % 100
+
+        # =SI.ERROR(BUSCARV(Cliente;Listado!A:B;2);"COMERCIALIZADORA ...")
+        df['Vendedor'] = cliente.map(self._vendedor_por_cliente).fillna(self.VENDEDOR_POR_DEFECTO).astype('str')
+
+        # =SI(Cliente="JUAN MATAS SAS";"USD";Moneda_docto)
+        df['Moneda'] = df['Moneda_docto'].where(~es_cliente_usd, 'USD')
+        return df[list(self.COLUMNAS_BD)]
+
+    def _lotes(self):
+        vacio = True
+        for lote in self.conector.lotes(self.tamano_lote):
+            vacio = False
+            yield self.derivar(lote)
+        if vacio:
+            yield self.derivar(pd.DataFrame(columns=self.CAMPOS))
+
+    def ingerir(self):
+        """Escribe BD desde la fuente y devuelve el número de filas."""
+        inicio = time.perf_counter()
+        self._cargar_busquedas()
+        filas = self.cache.escribir_externa('BD', self._lotes(), self.COLUMNAS_BD, origen=self.conector.descripcion)
+        print(f"⏱️ BD cargada desde {self.conector.descripcion}: {filas} filas en "
+              f"{time.perf_counter() - inicio:.2f}s")
+        return filas
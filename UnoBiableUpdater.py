@@ -1,21 +1,30 @@
 import os
 import shutil
-import psutil
 from datetime import datetime
-import time
-import xlwings as xw
-import win32com.client
 from pathlib import Path
+from WorkbookCache import WorkbookCache
+from SourceConnector import crear_conector
+from UnoBiableIngestor import UnoBiableIngestor
+from ExcelSession import ExcelSession
+from Instrumentation import medido
 
 class UnoBiableUpdater:
-    def __init__(self,base_dir):
+    def __init__(self,base_dir, modo="excel", fuente=None, tamano_lote=50000, sesion=None):
         self.BASE_DIR =  base_dir
         self.DATA_DIR = os.path.join(self.BASE_DIR, "data")
         self.INPUT_FILENAME = "Carex COL Reporte Vendedor.xlsx"
         self.INPUT_PATH = os.path.join(self.DATA_DIR, self.INPUT_FILENAME)
+        # "excel" refresca las conexiones del libro; "directo" consulta la fuente y llena la caché de BD
+        if modo not in ("excel", "directo"):
+            raise ValueError(f"Modo de UnoBiable no soportado: {modo}")
+        self.modo = modo
+        self.fuente = fuente
+        self.tamano_lote = tamano_lote
+        # sesión de Excel compartida con TasaUpdater (la guarda y cierra quien la creó)
+        self.sesion = sesion
         
-        # Configuración para timeouts
-        self.MAX_REFRESH_TIME = 10  # 5 minutos máximo para actualizar
+        # Configuración para timeouts (solo es un tope: el refresco termina en cuanto lo hacen las conexiones)
+        self.MAX_REFRESH_TIME = 300  # 5 minutos máximo para actualizar
         self.RETRY_ATTEMPTS = 2
     
     def verificar_archivo_disponible(self):
@@ -41,23 +50,6 @@ class UnoBiableUpdater:
             print(f"❌ Error creando backup: {e}")
             return None
     
-    def limpiar_procesos_excel(self):
-        """Limpia procesos de Excel que puedan estar colgados."""
-        try:
-            
-            for proc in psutil.process_iter(['pid', 'name']):
-                if proc.info['name'] and 'excel' in proc.info['name'].lower():
-                    try:
-                        proc.terminate()
-                        proc.wait(timeout=5)
-                        print(f"🧹 Proceso Excel terminado: PID {proc.info['pid']}")
-                    except:
-                        pass
-        except ImportError:
-            print("⚠️ psutil no instalado. Instala con: pip install psutil")
-        except Exception as e:
-            print(f"⚠️ Error limpiando procesos: {e}")
-    
     def remover_solo_lectura(self):
         """Remueve el atributo de solo lectura del archivo."""
         try:
@@ -69,169 +61,82 @@ class UnoBiableUpdater:
         except Exception as e:
             print(f"⚠️ Error removiendo solo lectura: {e}")
     
-    def refrescar_conexiones_win32com(self):
-        """Actualiza conexiones usando win32com (método alternativo más estable)."""
-        print("🔄 Actualizando conexiones con win32com...")
-        
-        excel = None
-        workbook = None
-        
+    @medido("unobiable.refresco")
+    def refrescar_conexiones(self):
+        """Actualiza las conexiones en la sesión compartida o en una sesión propia que se guarda al terminar."""
+        if self.sesion is not None:
+            return self.sesion.refrescar_conexiones(self.MAX_REFRESH_TIME)
         try:
-            # Crear instancia de Excel
-            excel = win32com.client.Dispatch("Excel.Application")
-            excel.Visible = False
-            excel.DisplayAlerts = False
-            excel.ScreenUpdating = False
-            
-            # Abrir el archivo
-            workbook = excel.Workbooks.Open(self.INPUT_PATH)
-            
-            # Actualizar todas las conexiones
-            workbook.RefreshAll()
-            
-            # Esperar a que termine la actualización con timeout
-            start_time = time.time()
-            while excel.CalculationState != -4208:  # xlDone
-                time.sleep(2)
-                elapsed = time.time() - start_time
-                if elapsed > self.MAX_REFRESH_TIME:
-                    print(f"⚠️ Timeout después de {self.MAX_REFRESH_TIME} segundos")
-                    break
-                print(f"⏳ Actualizando... ({elapsed:.0f}s)")
-            
-            # Guardar y cerrar
-            workbook.Save()
-            workbook.Close(SaveChanges=True)
-            print("✅ Conexiones actualizadas con win32com")
-            return True
-            
+            with ExcelSession(self.INPUT_PATH, timeout_refresco=self.MAX_REFRESH_TIME) as sesion:
+                if not sesion.refrescar_conexiones():
+                    return False
+                sesion.guardar()
+                return True
         except Exception as e:
-            print(f"❌ Error con win32com: {e}")
+            print(f"❌ Error con Excel: {e}")
             return False
-            
-        finally:
-            # Limpiar objetos COM
-            try:
-                if workbook:
-                    workbook.Close(SaveChanges=False)
-                if excel:
-                    excel.Quit()
-            except:
-                pass
-            
-            # Liberar referencias COM
-            try:
-                import gc
-                del workbook, excel
-                gc.collect()
-            except:
-                pass
     
-    def refrescar_conexiones_xlwings(self):
-        """Actualiza conexiones usando xlwings (método original mejorado)."""
-        print("🔄 Actualizando conexiones con xlwings...")
-        
-        app = None
-        wb = None
-        
+    @medido("unobiable.carga_directa")
+    def ingerir_directo(self):
+        """Ejecuta la consulta de UnoBiable contra la fuente y escribe BD en la caché columnar."""
+        if not self.fuente:
+            print("❌ Falta 'unobiable_fuente' en la configuración")
+            return False
+        cache = WorkbookCache(self.INPUT_PATH)
+        if not cache.parquet_disponible():
+            print("❌ La carga directa necesita pyarrow. Instala con: pip install pyarrow")
+            return False
         try:
-            # Configurar xlwings
-            app = xw.App(visible=False, add_book=False)
-            app.display_alerts = False
-            app.screen_updating = False
-            
-            # Abrir archivo
-            wb = app.books.open(self.INPUT_PATH)
-            
-            # Actualizar conexiones
-            wb.api.RefreshAll()
-            
-            # Esperar con timeout mejorado
-            start_time = time.time()
-            while app.api.CalculationState == 1:  # xlCalculating
-                time.sleep(2)
-                elapsed = time.time() - start_time
-                if elapsed > self.MAX_REFRESH_TIME:
-                    print(f"⚠️ Timeout después de {self.MAX_REFRESH_TIME} segundos")
-                    break
-                print(f"⏳ Calculando... ({elapsed:.0f}s)")
-            
-            # Guardar
-            wb.save()
-            wb.close()
-            print("✅ Conexiones actualizadas con xlwings")
+            conector = crear_conector(self.fuente, self.BASE_DIR)
+            UnoBiableIngestor(cache, conector, self.tamano_lote).ingerir()
             return True
-            
         except Exception as e:
-            print(f"❌ Error con xlwings: {e}")
+            print(f"❌ Error cargando BD desde la fuente: {e}")
             return False
-            
-        finally:
-            try:
-                if wb:
-                    wb.close()
-                if app:
-                    app.quit()
-            except:
-                pass
-    
+
     def main(self):
+        """Actualiza BD (refresco en Excel o carga directa); devuelve False si no se pudo."""
         print("🚀 Iniciando actualización de UnoBiable...")
         
         # Verificaciones iniciales
         if not os.path.exists(self.INPUT_PATH):
             print(f"❌ Archivo no encontrado: {self.INPUT_PATH}")
-            return
-        
-        # 1️⃣ Limpiar procesos Excel previos
-        print("🧹 Limpiando procesos Excel...")
-        self.limpiar_procesos_excel()
-        time.sleep(2)
-        
-        # 2️⃣ Verificar que el archivo esté disponible
-        if not self.verificar_archivo_disponible():
-            print("❌ El archivo está siendo usado por otro proceso")
-            return
+            return False
+
+        if self.modo == "directo":
+            if self.ingerir_directo():
+                print("🎉 ¡BD actualizada desde la fuente!")
+                return True
+            return False
         
-        # 3️⃣ Remover solo lectura
-        self.remover_solo_lectura()
+        if self.sesion is None:
+            # 1️⃣ Verificar que el archivo esté disponible (con sesión compartida ya lo tiene abierto Excel)
+            if not self.verificar_archivo_disponible():
+                print("❌ El archivo está siendo usado por otro proceso")
+                return False
+            
+            # 2️⃣ Remover solo lectura
+            self.remover_solo_lectura()
         
-        # 5️⃣ Intentar actualizar con diferentes métodos
+        # 3️⃣ Actualizar conexiones (sin esperas fijas: cada intento termina cuando terminan las consultas)
         success = False
         
         for attempt in range(self.RETRY_ATTEMPTS):
             print(f"\n📋 Intento {attempt + 1} de {self.RETRY_ATTEMPTS}")
-            
-            # Primero intentar con win32com (más estable)
-            if self.refrescar_conexiones_win32com():
-                success = True
-                break
-            
-            print("⚠️ win32com falló, intentando con xlwings...")
-            time.sleep(3)
-            
-            # Si falla, intentar con xlwings
-            if self.refrescar_conexiones_xlwings():
+            if self.refrescar_conexiones():
                 success = True
                 break
-                
-            # Esperar antes del siguiente intento
-            if attempt < self.RETRY_ATTEMPTS - 1:
-                print(f"⏳ Esperando antes del siguiente intento...")
-                time.sleep(5)
         
-        # 6️⃣ Verificar resultado
+        # 4️⃣ Verificar resultado
         if success:
             print("🎉 ¡Actualización completada exitosamente!")
+            # BD vuelve a leerse del libro recién refrescado
+            WorkbookCache(self.INPUT_PATH).quitar_externa('BD')
             
             # Verificar que el archivo no quedó en solo lectura
-            if self.verificar_archivo_disponible():
-                print("✅ El archivo está disponible para edición")
-            else:
+            if self.sesion is None and not self.verificar_archivo_disponible():
                 print("⚠️ El archivo podría estar en solo lectura")
                 self.remover_solo_lectura()
         
-        # 7️⃣ Limpieza final
-        print("🧹 Limpieza final...")
-        self.limpiar_procesos_excel()
-        print("🏁 Proceso terminado")
\ No newline at end of file
+        print("🏁 Proceso terminado")
+        return success
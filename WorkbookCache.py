@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import hashlib
+import pandas as pd
+from Instrumentation import span
+
+
+class WorkbookCache:
+    """Caché columnar (Parquet) de las hojas del libro de Excel, invalidada por huella del archivo.
+
+    Una hoja también puede cargarse directamente desde su fuente (`escribir_externa`): esa copia
+    no depende de la huella del libro. Solo se lee en lugar de la hoja del Excel con `usar_externas`
+    (BD en modo directo); si tiene más de `vigencia_externas` segundos se avisa que puede estar
+    desactualizada (la última carga directa falló o no se ejecutó).
+    """
+
+    def __init__(self, input_path, cache_dir=None, usar_externas=False, vigencia_externas=None):
+        self.INPUT_PATH = input_path
+        self.usar_externas = usar_externas
+        self.vigencia_externas = vigencia_externas
+        self._avisadas = set()
+        self.CACHE_DIR = cache_dir or os.path.join(os.path.dirname(input_path), "cache")
+        self.BASE_NAME = os.path.splitext(os.path.basename(input_path))[0]
+        self.META_PATH = os.path.join(self.CACHE_DIR, f"{self.BASE_NAME}.json")
+        self.EXTERNAS_PATH = os.path.join(self.CACHE_DIR, f"{self.BASE_NAME}__externas.json")
+
+    @staticmethod
+    def parquet_disponible():
+        try:
+            import pyarrow  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    # -------------------------
+    # Huella del libro (tamaño + mtime + hash de contenido)
+    # -------------------------
+    def _hash_archivo(self):
+        sha = hashlib.sha256()
+        with open(self.INPUT_PATH, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    def fingerprint(self):
+        st = os.stat(self.INPUT_PATH)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": self._hash_archivo()}
+
+    def _leer_meta(self):
+        try:
+            with open(self.META_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _guardar_meta(self, meta):
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
+        tmp = self.META_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.META_PATH)
+
+    def _meta_vigente(self):
+        """Devuelve la metadata si el libro no cambió desde que se llenó la caché; si cambió, None."""
+        meta = self._leer_meta()
+        if not meta:
+            return None
+        fp = meta.get("fingerprint", {})
+        st = os.stat(self.INPUT_PATH)
+        if fp.get("size") != st.st_size:
+            return None
+        if fp.get("mtime_ns") == st.st_mtime_ns:
+            return meta
+        # Mismo tamaño pero mtime distinto (copia, OneDrive...): decidir por contenido
+        if fp.get("sha256") == self._hash_archivo():
+            fp["mtime_ns"] = st.st_mtime_ns
+            self._guardar_meta(meta)
+            return meta
+        return None
+
+    def _ruta_hoja(self, sheet_name):
+        nombre = "".join(c if c.isalnum() else "_" for c in sheet_name)
+        return os.path.join(self.CACHE_DIR, f"{self.BASE_NAME}__{nombre}.parquet")
+
+    # -------------------------
+    # Lectura de hojas
+    # -------------------------
+    def read_sheet(self, sheet_name, usecols=None):
+        """Lee una hoja desde la caché si está vigente; si no, la parsea del Excel y la guarda."""
+        with span("libro.leer_hoja", hoja=sheet_name) as s:
+            return self._leer_hoja(sheet_name, usecols, s.atributos)
+
+    def _leer_hoja(self, sheet_name, usecols, atributos):
+        # `atributos["origen"]` queda en el reporte de la corrida: externa, parquet o excel
+        externa = self.externa(sheet_name)
+        if externa:
+            atributos["origen"] = "externa"
+            return pd.read_parquet(externa["ruta"], columns=list(usecols) if usecols is not None else None)
+
+        atributos["origen"] = "excel"
+        if not self.parquet_disponible():
+            with span("libro.read_excel", hoja=sheet_name):
+                return pd.read_excel(self.INPUT_PATH, sheet_name=sheet_name, usecols=usecols)
+
+        meta = self._meta_vigente()
+        ruta = self._ruta_hoja(sheet_name)
+        if meta and sheet_name in meta.get("hojas", {}) and os.path.exists(ruta):
+            try:
+                df = pd.read_parquet(ruta, columns=list(usecols) if usecols is not None else None)
+                atributos["origen"] = "parquet"
+                return df
+            except Exception as e:
+                print(f"⚠️ Caché de '{sheet_name}' ilegible, se vuelve a leer el Excel: {e}")
+
+        if meta is None:
+            meta = {"fingerprint": self.fingerprint(), "hojas": {}}
+
+        with span("libro.read_excel", hoja=sheet_name):
+            df = pd.read_excel(self.INPUT_PATH, sheet_name=sheet_name)
+        try:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            tmp = ruta + ".tmp"
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, ruta)
+            meta.setdefault("hojas", {})[sheet_name] = os.path.basename(ruta)
+            self._guardar_meta(meta)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar la caché de '{sheet_name}': {e}")
+
+        if usecols is not None:
+            df = df[list(usecols)]
+        return df
+
+    def invalidar(self):
+        meta = self._leer_meta() or {}
+        for archivo in meta.get("hojas", {}).values():
+            try:
+                os.remove(os.path.join(self.CACHE_DIR, archivo))
+            except OSError:
+                pass
+        try:
+            os.remove(self.META_PATH)
+        except OSError:
+            pass
+
+    # -------------------------
+    # Hojas externas (cargadas desde la fuente de datos, no desde el Excel)
+    # -------------------------
+    def _leer_externas(self):
+        try:
+            with open(self.EXTERNAS_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar_externas(self, externas):
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
+        tmp = self.EXTERNAS_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(externas, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.EXTERNAS_PATH)
+
+    def externa(self, sheet_name):
+        """Metadata de la copia externa de la hoja (con su `ruta`), o None si no hay o no se usan."""
+        if not self.usar_externas:
+            return None
+        info = self._leer_externas().get(sheet_name)
+        if not info:
+            return None
+        ruta = os.path.join(self.CACHE_DIR, info["archivo"])
+        if not os.path.exists(ruta):
+            return None
+        edad = time.time() - info["fecha"] if "fecha" in info else None
+        if self.vigencia_externas is not None and (edad is None or edad > self.vigencia_externas) \
+                and sheet_name not in self._avisadas:
+            self._avisadas.add(sheet_name)
+            cuando = f"de hace {edad / 3600:.1f} h" if edad is not None else "sin fecha registrada"
+            print(f"⚠️ {sheet_name} se lee de la carga directa {cuando}: puede estar desactualizada")
+        return dict(info, ruta=ruta)
+
+    def escribir_externa(self, sheet_name, lotes, tipos, origen=""):
+        """Escribe la hoja lote a lote (DataFrames) en Parquet y la registra como externa.
+
+        `tipos` es {columna: 'float64' | 'str'} y fija el esquema, así todos los lotes coinciden
+        aunque alguno venga vacío. Devuelve el número de filas escritas.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        esquema = pa.schema([(c, pa.float64() if t == "float64" else pa.string()) for c, t in tipos.items()])
+        archivo = os.path.basename(self._ruta_hoja(sheet_name)).replace(".parquet", "__externa.parquet")
+        ruta = os.path.join(self.CACHE_DIR, archivo)
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
+        tmp = ruta + ".tmp"
+        filas = 0
+        try:
+            with pq.ParquetWriter(tmp, esquema) as writer:
+                for lote in lotes:
+                    writer.write_table(pa.Table.from_pandas(lote[list(tipos)], schema=esquema, preserve_index=False))
+                    filas += len(lote)
+            os.replace(tmp, ruta)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        externas = self._leer_externas()
+        externas[sheet_name] = {"archivo": archivo, "origen": origen, "filas": filas, "fecha": time.time()}
+        self._guardar_externas(externas)
+        return filas
+
+    def quitar_externa(self, sheet_name):
+        """Vuelve a leer la hoja desde el Excel."""
+        externas = self._leer_externas()
+        info = externas.pop(sheet_name, None)
+        if info is None:
+            return
+        try:
+            os.remove(os.path.join(self.CACHE_DIR, info["archivo"]))
+        except OSError:
+            pass
+        self._guardar_externas(externas)
@@ -0,0 +1,338 @@
+import os
+import re
+import zlib
+import struct
+import shutil
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+class XlsxPatcher:
+    """Edita celdas de una hoja directamente en el zip del .xlsx, sin abrir Excel.
+
+    Solo se regeneran las partes modificadas (el XML de la hoja y `workbook.xml`); el resto de
+    entradas del zip (otras hojas, conexiones, caché de tablas dinámicas, estilos...) se copia
+    byte a byte con sus datos ya comprimidos, sin descomprimir ni volver a comprimir. Dentro de
+    la hoja el XML se edita como texto fila por fila para no alterar lo que no cambia.
+
+    Las fórmulas que dependen de las celdas editadas (p. ej. los BUSCARV de BD) conservan su
+    último valor calculado hasta que Excel abre el libro: se marca `fullCalcOnLoad` para que
+    Excel recalcule todo al abrirlo.
+    """
+
+    _RE_FILA = re.compile(r'<row\b[^>]*?(?:/>|>.*?</row>)', re.S)
+    _RE_CELDA = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+    _RE_REF = re.compile(r'\br="([A-Z]+)(\d+)"')
+
+    def __init__(self, path):
+        self.path = path
+        self._cambios = {}
+        with zipfile.ZipFile(path) as z:
+            self._nombres = set(z.namelist())
+            self._workbook = z.read("xl/workbook.xml").decode("utf-8")
+            self._rels = z.read("xl/_rels/workbook.xml.rels")
+            self._shared = z.read("xl/sharedStrings.xml") if "xl/sharedStrings.xml" in self._nombres else None
+        self._textos = None
+
+    # -------------------------
+    # Lectura
+    # -------------------------
+    def _leer(self, parte):
+        if parte in self._cambios:
+            return self._cambios[parte]
+        with zipfile.ZipFile(self.path) as z:
+            return z.read(parte).decode("utf-8")
+
+    def ruta_hoja(self, nombre):
+        """Parte del zip (p. ej. `xl/worksheets/sheet4.xml`) de la hoja `nombre`."""
+        rid = None
+        for hoja in ET.fromstring(self._workbook).iter(NS_MAIN + "sheet"):
+            if hoja.get("name") == nombre:
+                rid = hoja.get(NS_REL + "id")
+        if rid is None:
+            raise KeyError(f"Hoja no encontrada en el libro: {nombre}")
+        for rel in ET.fromstring(self._rels).iter(NS_PKG_REL + "Relationship"):
+            if rel.get("Id") == rid:
+                destino = rel.get("Target")
+                if destino.startswith("/"):
+                    return destino[1:]
+                return posixpath.normpath(posixpath.join("xl", destino))
+        raise KeyError(f"Relación {rid} de la hoja {nombre} no encontrada")
+
+    @property
+    def textos_compartidos(self):
+        if self._textos is None:
+            self._textos = []
+            if self._shared is not None:
+                for si in ET.fromstring(self._shared).iter(NS_MAIN + "si"):
+                    # el texto fonético (rPh) no forma parte del valor de la celda
+                    self._textos.append("".join(
+                        t.text or "" for hijo in si if hijo.tag != NS_MAIN + "rPh" for t in hijo.iter(NS_MAIN + "t")
+                    ))
+        return self._textos
+
+    @staticmethod
+    def _atributo(etiqueta, nombre):
+        m = re.search(r'\s%s="([^"]*)"' % nombre, etiqueta)
+        return m.group(1) if m else None
+
+    @staticmethod
+    def _indice_columna(letras):
+        n = 0
+        for letra in letras:
+            n = n * 26 + ord(letra) - 64
+        return n
+
+    def _valor_clave(self, celda):
+        """Texto de una celda para usarla como clave (los números enteros sin `.0`)."""
+        apertura = celda[:celda.index(">") + 1]
+        tipo = self._atributo(apertura, "t")
+        if tipo == "inlineStr":
+            return "".join(re.findall(r'<t[^>]*>([^<]*)</t>', celda))
+        m = re.search(r'<v>([^<]*)</v>', celda)
+        if not m:
+            return None
+        if tipo == "s":
+            return self.textos_compartidos[int(m.group(1))]
+        if tipo in (None, "n"):
+            numero = float(m.group(1))
+            return str(int(numero)) if numero.is_integer() else m.group(1)
+        return m.group(1)
+
+    # -------------------------
+    # Escritura de celdas
+    # -------------------------
+    @staticmethod
+    def _numero(valor):
+        valor = float(valor)
+        return str(int(valor)) if valor.is_integer() else repr(valor)
+
+    def _celda_valor(self, ref, valor, estilo, celda_previa=None):
+        """XML de la celda `ref` con `valor` numérico (o texto, escrito inline).
+
+        Si la celda ya tenía una fórmula se conserva y solo se actualiza su valor calculado.
+        """
+        s = f' s="{estilo}"' if estilo is not None else ""
+        if isinstance(valor, str):
+            return f'<c r="{ref}"{s} t="inlineStr"><is><t>{escape(valor)}</t></is></c>'
+        if celda_previa is not None:
+            formula = re.search(r'<f\b[^>]*?(?:/>|>.*?</f>)', celda_previa, re.S)
+            if formula:
+                return f'<c r="{ref}"{s}>{formula.group(0)}<v>{self._numero(valor)}</v></c>'
+        return f'<c r="{ref}"{s}><v>{self._numero(valor)}</v></c>'
+
+    def _reescribir_fila(self, fila_xml, n_fila, valores, estilos):
+        """Fila con las celdas de `valores` ({columna: valor}) reemplazadas o insertadas en orden."""
+        if fila_xml.endswith("/>"):
+            apertura, celdas_xml = fila_xml[:-2] + ">", ""
+        else:
+            apertura = fila_xml[:fila_xml.index(">") + 1]
+            celdas_xml = fila_xml[len(apertura):-len("</row>")]
+        celdas = {}
+        for celda in self._RE_CELDA.findall(celdas_xml):
+            celdas[self._RE_REF.search(celda).group(1)] = celda
+        for col, valor in valores.items():
+            previa = celdas.get(col)
+            estilo = self._atributo(previa[:previa.index(">") + 1], "s") if previa else estilos.get(col)
+            celdas[col] = self._celda_valor(f"{col}{n_fila}", valor, estilo, previa)
+        orden = sorted(celdas, key=self._indice_columna)
+        return apertura + "".join(celdas[c] for c in orden) + "</row>"
+
+    def actualizar_filas(self, nombre_hoja, filas, col_clave="A"):
+        """Actualiza o agrega filas de `nombre_hoja` buscando la clave en `col_clave`.
+
+        `filas` es {clave: {columna: valor}}. Las filas nuevas se agregan al final copiando el
+        formato de la última fila. Devuelve ({clave: fila actualizada}, {clave: fila nueva}).
+        """
+        parte = self.ruta_hoja(nombre_hoja)
+        xml = self._leer(parte)
+        inicio = xml.index("<sheetData")
+        fin = xml.index("</sheetData>") if "</sheetData>" in xml else None
+        if fin is None:  # <sheetData/>
+            xml = xml.replace("<sheetData/>", "<sheetData></sheetData>", 1)
+            fin = xml.index("</sheetData>")
+        cuerpo_inicio = xml.index(">", inicio) + 1
+        cuerpo = xml[cuerpo_inicio:fin]
+
+        actualizadas, nuevas = {}, {}
+        # estilo más reciente de cada columna: las celdas que se crean heredan el de las filas anteriores
+        estilos, clave_texto = {}, False
+        ultima_fila, apertura = 0, '<row r="0">'
+        partes, pos = [], 0
+        for m in self._RE_FILA.finditer(cuerpo):
+            fila_xml = m.group(0)
+            apertura = fila_xml[:fila_xml.index(">") + 1]
+            ultima_fila = n_fila = int(self._atributo(apertura, "r"))
+            clave = None
+            for celda in self._RE_CELDA.findall(fila_xml):
+                etiqueta = celda[:celda.index(">") + 1]
+                col = self._RE_REF.search(etiqueta).group(1)
+                estilos[col] = self._atributo(etiqueta, "s")
+                if col == col_clave:
+                    clave = self._valor_clave(celda)
+                    clave_texto = self._atributo(etiqueta, "t") in ("s", "inlineStr", "str")
+            if clave in filas and clave not in actualizadas:
+                partes.append(cuerpo[pos:m.start()])
+                partes.append(self._reescribir_fila(fila_xml, n_fila, filas[clave], estilos))
+                pos = m.end()
+                actualizadas[clave] = n_fila
+        partes.append(cuerpo[pos:])
+
+        # Filas nuevas: mismos atributos de fila que la última existente y la clave con su mismo tipo
+        pendientes = [clave for clave in filas if clave not in actualizadas]
+        if pendientes:
+            if apertura.endswith("/>"):
+                apertura = apertura[:-2] + ">"
+            for clave in pendientes:
+                ultima_fila += 1
+                valores = {col_clave: clave if clave_texto else float(clave), **filas[clave]}
+                fila_abierta = re.sub(r'\br="\d+"', f'r="{ultima_fila}"', apertura, count=1)
+                partes.append(self._reescribir_fila(fila_abierta + "</row>", ultima_fila, valores, estilos))
+                nuevas[clave] = ultima_fila
+
+        xml = xml[:cuerpo_inicio] + "".join(partes) + xml[fin:]
+        if nuevas:
+            xml = self._ampliar_dimension(xml, ultima_fila)
+        if actualizadas or nuevas:
+            self._cambios[parte] = xml
+            self._recalcular_al_abrir()
+        return actualizadas, nuevas
+
+    @staticmethod
+    def _ampliar_dimension(xml, ultima_fila):
+        def ampliar(m):
+            ref = m.group(1)
+            if ":" not in ref:
+                return m.group(0)
+            desde, hasta = ref.split(":")
+            col = re.match(r"[A-Z]+", hasta).group(0)
+            fila = max(int(hasta[len(col):]), ultima_fila)
+            return f'<dimension ref="{desde}:{col}{fila}"/>'
+        return re.sub(r'<dimension ref="([^"]+)"/>', ampliar, xml, count=1)
+
+    def _recalcular_al_abrir(self):
+        def marcar(m):
+            etiqueta = m.group(0)
+            if "fullCalcOnLoad=" in etiqueta:
+                return re.sub(r'fullCalcOnLoad="[^"]*"', 'fullCalcOnLoad="1"', etiqueta)
+            return etiqueta[:-2].rstrip() + ' fullCalcOnLoad="1"/>'
+        workbook = re.sub(r'<calcPr\b[^>]*/>', marcar, self._workbook, count=1)
+        if workbook != self._workbook:
+            self._cambios["xl/workbook.xml"] = workbook
+
+    # -------------------------
+    # Zip: copia en crudo de las partes sin cambios
+    # -------------------------
+    @staticmethod
+    def _directorio_central(f):
+        """(entradas del directorio central, offset del directorio) o None si el zip usa ZIP64."""
+        f.seek(0, os.SEEK_END)
+        tamano = f.tell()
+        f.seek(max(0, tamano - 65557))
+        cola = f.read()
+        pos = cola.rfind(b"PK\x05\x06")
+        if pos < 0:
+            raise zipfile.BadZipFile("Fin del directorio central no encontrado")
+        _, disco, _, _, total, cd_tamano, cd_offset, _ = struct.unpack("<4s4H2LH", cola[pos:pos + 22])
+        if disco or total == 0xFFFF or cd_offset == 0xFFFFFFFF or cola.rfind(b"PK\x06\x07", 0, pos) >= 0:
+            return None
+        f.seek(cd_offset)
+        datos = f.read(cd_tamano)
+        entradas, i = [], 0
+        for _ in range(total):
+            campos = struct.unpack("<4s6H3L5H2L", datos[i:i + 46])
+            n, m, k = campos[10], campos[11], campos[12]
+            if campos[8] == 0xFFFFFFFF or campos[9] == 0xFFFFFFFF or campos[16] == 0xFFFFFFFF:
+                return None
+            nombre = datos[i + 46:i + 46 + n].decode("cp437" if not campos[3] & 0x800 else "utf-8")
+            entradas.append((nombre, campos, datos[i:i + 46 + n + m + k]))
+            i += 46 + n + m + k
+        return entradas, cd_offset
+
+    @staticmethod
+    def _copiar_rango(origen, destino, inicio, largo):
+        origen.seek(inicio)
+        while largo > 0:
+            bloque = origen.read(min(largo, 1 << 20))
+            if not bloque:
+                raise zipfile.BadZipFile("Zip truncado")
+            destino.write(bloque)
+            largo -= len(bloque)
+
+    def _escribir_crudo(self, origen, destino, entradas, cd_offset):
+        limites = sorted(c[16] for _, c, _ in entradas) + [cd_offset]
+        siguiente = {inicio: fin for inicio, fin in zip(limites, limites[1:])}
+        central = []
+        for nombre, campos, registro in entradas:
+            offset = destino.tell()
+            if nombre not in self._cambios:
+                # encabezado local + datos comprimidos (+ descriptor) tal cual
+                self._copiar_rango(origen, destino, campos[16], siguiente[campos[16]] - campos[16])
+                central.append(registro[:42] + struct.pack("<L", offset) + registro[46:])
+                continue
+            datos = self._cambios[nombre].encode("utf-8")
+            z = zlib.compressobj(6, zlib.DEFLATED, -15)
+            comprimido = z.compress(datos) + z.flush()
+            crc = zlib.crc32(datos) & 0xFFFFFFFF
+            nombre_bytes = registro[46:46 + campos[10]]
+            flags = campos[3] & 0x800  # se conserva solo el bit de nombre UTF-8 (sin descriptor)
+            destino.write(struct.pack("<4s5H3L2H", b"PK\x03\x04", campos[2], flags, zipfile.ZIP_DEFLATED,
+                                      campos[5], campos[6], crc, len(comprimido), len(datos),
+                                      len(nombre_bytes), 0))
+            destino.write(nombre_bytes)
+            destino.write(comprimido)
+            nuevo = list(campos)
+            nuevo[3], nuevo[4], nuevo[7], nuevo[8], nuevo[9], nuevo[16] = (
+                flags, zipfile.ZIP_DEFLATED, crc, len(comprimido), len(datos), offset)
+            central.append(struct.pack("<4s6H3L5H2L", *nuevo) + registro[46:])
+
+        inicio_cd = destino.tell()
+        for registro in central:
+            destino.write(registro)
+        destino.write(struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, len(central), len(central),
+                                  destino.tell() - inicio_cd, inicio_cd, 0))
+
+    def _escribir_zipfile(self, destino_path):
+        # respaldo para zips ZIP64: se reescriben todas las entradas con zipfile
+        with zipfile.ZipFile(self.path) as origen, \
+                zipfile.ZipFile(destino_path, "w", zipfile.ZIP_DEFLATED) as destino:
+            for info in origen.infolist():
+                if info.filename in self._cambios:
+                    destino.writestr(info, self._cambios[info.filename].encode("utf-8"))
+                else:
+                    destino.writestr(info, origen.read(info))
+
+    def guardar(self, destino_path=None):
+        """Escribe el libro (sobre el original si no se indica destino) reemplazando solo las partes editadas."""
+        destino_path = destino_path or self.path
+        if not self._cambios:
+            if destino_path != self.path:
+                shutil.copyfile(self.path, destino_path)
+            return []
+        tmp = destino_path + ".tmp"
+        try:
+            with open(self.path, "rb") as origen:
+                directorio = self._directorio_central(origen)
+                if directorio is None:
+                    print("⚠️ El libro usa ZIP64: se reescriben todas las partes")
+                else:
+                    with open(tmp, "wb") as destino:
+                        self._escribir_crudo(origen, destino, *directorio)
+            if directorio is None:
+                self._escribir_zipfile(tmp)
+            os.replace(tmp, destino_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        modificadas = sorted(self._cambios)
+        self._workbook = self._cambios.get("xl/workbook.xml", self._workbook)
+        self.path = destino_path
+        self._cambios = {}
+        return modificadas
@@ -0,0 +1,21 @@
+-- Consulta del "Listado 001" de UnoBiable para unobiable_modo = "directo".
+-- Debe devolver exactamente estos campos (con estos nombres), los mismos que trae la conexión
+-- del libro; las columnas calculadas de BD (TC, Valor Total USD, Concepto, Año, Mes, Vendedor,
+-- TC USD, Moneda) las deriva UnoBiableIngestor.
+--   Fecha: número AAAAMMDD, igual que en la hoja TC.
+-- Reemplazar "listado001" por la vista o tabla del listado en la base de UnoBiable y ajustar
+-- los nombres de origen si difieren.
+SELECT
+    "Periodo",
+    "Nombre Centro de Operacion",
+    "Tipo de Documento",
+    "Numero_documento",
+    "Fecha",
+    "Moneda_docto",
+    "Nombre Vendedor",
+    "Notas",
+    "Nombre Cliente_factura",
+    "Desc Pais Cliente_factura",
+    "Nombre Item",
+    "Valor_neto_docto"
+FROM listado001
@@ -1,10 +1,18 @@
 import os
+import sys
+import glob
 import shutil
 import json
+import argparse
+from datetime import date
 from CarexDashboard import CarexDashboard
 from ReportEmailSender import ReportEmailSender
 from TasaUpdater import TasaUpdater
 from UnoBiableUpdater import UnoBiableUpdater
+from ExcelSession import ExcelSession
+from WorkbookCache import WorkbookCache
+from StageScheduler import StageScheduler, Etapa
+import Instrumentation
 
 # Cargar configuración
 with open("config.json", "r", encoding="utf-8") as f:
@@ -19,27 +27,244 @@ def eliminar_carpeta(path):
             elif os.path.isdir(fp):
                 shutil.rmtree(fp)
 
+def archivos(carpeta):
+    """Todas las rutas de archivo bajo `carpeta` (salidas del dashboard, entradas del correo)."""
+    return [os.path.join(raiz, f) for raiz, _, nombres in os.walk(carpeta) for f in nombres]
+
+def config_de(*prefijos):
+    """Parte de config.json que afecta a una etapa (las claves que empiezan por `prefijos`)."""
+    return {k: v for k, v in config.items() if k.startswith(prefijos) and k != "password"}
+
+def parsear_periodos(valores):
+    """'2025-03' o rangos '2025-01:2025-12' -> lista de (año, mes); ValueError si alguno no es válido."""
+    def periodo(texto):
+        try:
+            anio, mes = (int(parte) for parte in texto.split("-"))
+        except ValueError:
+            raise ValueError(f"periodo inválido '{texto}', se espera AAAA-MM")
+        if not 1 <= mes <= 12:
+            raise ValueError(f"mes fuera de rango en '{texto}' (1-12)")
+        return anio, mes
+
+    periodos = []
+    for valor in valores:
+        if ":" in valor:
+            desde, hasta = (periodo(p) for p in valor.split(":", 1))
+            if desde > hasta:
+                raise ValueError(f"rango invertido '{valor}': el inicio es posterior al fin")
+            periodos.extend(CarexDashboard.rango_periodos(desde, hasta))
+        else:
+            periodos.append(periodo(valor))
+    return periodos
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los reportes de Carex")
+    parser.add_argument("--periodos", nargs="+", metavar="AAAA-MM[:AAAA-MM]",
+                        help="genera el dashboard y el Excel de varios periodos en una sola corrida (no envía correo)")
+    parser.add_argument("--workers-periodos", type=int, default=config.get('workers_periodos'),
+                        help="procesos para componer los periodos en paralelo")
+    parser.add_argument("--backfill-tasas", metavar="AAAA-MM-DD:AAAA-MM-DD",
+                        help="completa la hoja TC para un rango de fechas en lugar de solo el día actual")
+    parser.add_argument("--forzar", nargs="*", metavar="ETAPA",
+                        help="ejecuta las etapas indicadas (o todas si no se indica ninguna) aunque sus entradas no hayan cambiado")
+    parser.add_argument("--perfil", metavar="ETAPA", default=config.get('instrumentacion_perfil'),
+                        help="guarda un perfil de cProfile de la etapa (o de un paso, p. ej. 'render')")
+    parser.add_argument("--tracemalloc", action="store_true", default=config.get('instrumentacion_tracemalloc', False),
+                        help="mide el pico de memoria de Python de cada etapa y paso (más lento)")
+    args = parser.parse_args()
+    periodos = None
+    if args.periodos:
+        try:
+            periodos = parsear_periodos(args.periodos)
+        except ValueError as e:
+            parser.error(str(e))
     
     base_dir = config['base_dir']
+    # Tiempos y memoria de cada etapa y paso; el reporte de la corrida queda en data/cache/corridas
+    corridas_dir = os.path.join(base_dir, 'data', 'cache', 'corridas')
+    instrumentacion = Instrumentation.iniciar(tracemalloc=args.tracemalloc, perfil=args.perfil, perfil_dir=corridas_dir)
+    output_dir = os.path.join(base_dir, 'output')
+    input_path = os.path.join(base_dir, 'data', 'Carex COL Reporte Vendedor.xlsx')
+    hoy = date.today().isoformat()
     
-    eliminar_carpeta(os.path.join(base_dir, 'output'))
-    
-    if config.get('tasa_updater', True):
+    # Si TC y el refresco de conexiones usan Excel, comparten una sola instancia y el libro se guarda una vez
+    tasas_en_excel = config.get('tasa_updater', True) and config.get('tasas_writer', 'xlwings') == 'xlwings'
+    unobiable_en_excel = config.get('uno_biable_updater', True) and config.get('unobiable_modo', 'excel') == 'excel'
+    sesion = None
+    if tasas_en_excel and unobiable_en_excel:
+        sesion = ExcelSession(input_path)
+
+    # El renderer se arranca (y calienta kaleido) mientras se actualizan las tasas y BD
+    renderer = CarexDashboard.crear_renderer(base_dir, config.get('render_workers'), config.get('render_cache_mb', 200),
+                                             config.get('graficos_backend', 'plotly'))
+    etapas = StageScheduler(os.path.join(base_dir, 'data', 'cache', 'etapas.json'), forzar=args.forzar)
+    datos = []  # etapas que actualizan el libro; el dashboard depende de ellas
+
+    def tasas():
         print("== Ejecutando TasaUpdater ==")
-        TasaUpdater(base_dir=base_dir).main()
-        
-    if config.get('uno_biable_updater', True):
+        tasa_updater = TasaUpdater(
+            base_dir=base_dir,
+            timeout=config.get('tasas_timeout', 10),
+            reintentos=config.get('tasas_reintentos', 3),
+            writer=config.get('tasas_writer', 'xlwings'),
+            sesion=sesion
+        )
+        if args.backfill_tasas:
+            desde, hasta = args.backfill_tasas.split(":")
+            ok = tasa_updater.backfill(date.fromisoformat(desde), date.fromisoformat(hasta))
+        else:
+            ok = tasa_updater.main()
+        if not ok:
+            raise RuntimeError("no se actualizaron las tasas")
+
+    def unobiable():
         print("== Ejecutando Updater UnoBiable ==")
-        UnoBiableUpdater(base_dir=base_dir).main()
-    
-   
-    CarexDashboard(base_dir=base_dir).generate_all_reports()
-    ReportEmailSender(
-        base_dir=base_dir,
-        remitente=config["remitente"],
-        password=config["password"],
-        destinatarios=config["destinatarios"],
-        asunto=config["asunto"],
-        cuerpo=config["cuerpo"]
-    ).send_mail()
\ No newline at end of file
+        ok = UnoBiableUpdater(
+            base_dir=base_dir,
+            modo=config.get('unobiable_modo', 'excel'),
+            fuente=config.get('unobiable_fuente'),
+            sesion=sesion
+        ).main()
+        if sesion is not None and sesion.libro is not None:
+            sesion.guardar()
+        if not ok:
+            raise RuntimeError("no se actualizó BD")
+
+    def entradas_unobiable():
+        fuente = config.get('unobiable_fuente') or {}
+        consulta = fuente.get('consulta_archivo')
+        return {"config": config_de('uno_biable', 'unobiable'),
+                "consulta": etapas.huellas([os.path.join(base_dir, consulta)]) if consulta else None}
+
+    def archivos_externos():
+        # BD cargada directamente desde la fuente (caché columnar), ver UnoBiableIngestor
+        cache = WorkbookCache(input_path)
+        return [cache.EXTERNAS_PATH] + glob.glob(os.path.join(cache.CACHE_DIR, "*__externa.parquet"))
+
+    def salidas_unobiable():
+        # cargar otra vez los mismos datos deja idénticas las salidas y no obliga a rehacer el dashboard
+        return archivos_externos() if config.get('unobiable_modo', 'excel') == 'directo' else [input_path]
+
+    def dashboard():
+        eliminar_carpeta(output_dir)
+        reporte = CarexDashboard(
+            base_dir=base_dir,
+            bd_streaming=config.get('bd_streaming', False),
+            alias_vendedores=config.get('alias_vendedores'),
+            cubo_incremental=config.get('cubo_incremental', True),
+            render_workers=config.get('render_workers'),
+            render_cache_mb=config.get('render_cache_mb', 200),
+            dashboard_ancho=config.get('dashboard_ancho', 7500),
+            dashboard_formato=config.get('dashboard_formato', 'png'),
+            dashboard_calidad=config.get('dashboard_calidad', 85),
+            dashboard_compress_level=config.get('dashboard_compress_level', 6),
+            dashboard_encode_workers=config.get('dashboard_encode_workers', 1),
+            graficos_backend=config.get('graficos_backend', 'plotly'),
+            dashboards_vendedores=config.get('dashboards_vendedores', False),
+            dashboard_pdf=config.get('dashboard_pdf', False),
+            bd_directa=config.get('unobiable_modo', 'excel') == 'directo',
+            bd_directa_vigencia=config.get('unobiable_vigencia_min', 60) * 60,
+            renderer=renderer
+        )
+        if args.periodos:
+            reporte.generate_reports_for_periods(periodos, workers=args.workers_periodos)
+        else:
+            reporte.generate_all_reports()
+
+    def entradas_dashboard():
+        codigo = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))
+        return {
+            "fecha": hoy,  # mes actual y nombres de archivo
+            "periodos": args.periodos,
+            "libro": etapas.huellas([input_path]),
+            "externas": etapas.huellas(archivos_externos()),
+            "codigo": etapas.huellas(codigo + [os.path.join(base_dir, "logo.png")]),
+            "config": config_de('dashboard', 'render', 'graficos', 'bd_streaming', 'alias_vendedores', 'cubo_incremental',
+                                'unobiable_modo'),
+        }
+
+    pendientes_path = os.path.join(base_dir, 'data', 'cache', 'correo_pendientes.json')
+
+    def entradas_correo():
+        return {"reporte": etapas.huellas(archivos(output_dir) + [os.path.join(base_dir, "image.png")]),
+                "config": config_de('smtp', 'correo', 'remitente', 'destinatarios', 'asunto', 'cuerpo')}
+
+    def correo():
+        # si el envío anterior de este mismo reporte falló a medias, solo se reenvía a quienes faltaron
+        entradas = entradas_correo()
+        destinatarios = config["destinatarios"]
+        try:
+            with open(pendientes_path, "r", encoding="utf-8") as f:
+                previo = json.load(f)
+        except (OSError, ValueError):
+            previo = None
+        if previo and previo.get("entradas") == entradas:
+            destinatarios = [d for d in destinatarios
+                             if (d["correo"] if isinstance(d, dict) else d) in previo["pendientes"]]
+            print(f"📨 Reenvío solo a los {len(destinatarios)} destinatarios pendientes")
+        enviados = ReportEmailSender(
+            base_dir=base_dir,
+            remitente=config["remitente"],
+            password=config["password"],
+            destinatarios=destinatarios,
+            asunto=config["asunto"],
+            cuerpo=config["cuerpo"],
+            smtp_host=config.get('smtp_host', 'smtp.gmail.com'),
+            smtp_port=config.get('smtp_port', 587),
+            starttls=config.get('smtp_starttls', True),
+            conexiones=config.get('correo_conexiones', 2),
+            reintentos=config.get('correo_reintentos', 3),
+            presupuesto_imagen_kb=config.get('correo_presupuesto_imagen_kb'),
+            ancho_max_imagen=config.get('correo_ancho_max_imagen'),
+            adjuntar_pdf=config.get('correo_adjuntar_pdf', False),
+            adjuntar_webp=config.get('correo_adjuntar_webp', False),
+            # en modo HTML no se genera imagen: no incrustar la de una corrida anterior
+            incrustar_imagen=config.get('correo_incrustar_imagen', True) and config.get('dashboard_formato') != 'html'
+        ).send_mail()
+        fallidos = [c for c, ok in enviados.items() if not ok]
+        if fallidos:
+            os.makedirs(os.path.dirname(pendientes_path), exist_ok=True)
+            with open(pendientes_path, "w", encoding="utf-8") as f:
+                json.dump({"entradas": entradas, "pendientes": fallidos}, f, ensure_ascii=False)
+            raise RuntimeError(f"no se pudo enviar a {', '.join(fallidos)}")
+        if os.path.exists(pendientes_path):
+            os.remove(pendientes_path)
+
+    if config.get('tasa_updater', True):
+        datos.append(etapas.agregar(Etapa(
+            "tasas", tasas, entradas=lambda: {"fecha": hoy, "backfill": args.backfill_tasas, "config": config_de('tasa')},
+            hilo_principal=True, opcional=True,  # Excel/COM; si falla el reporte sale con las tasas que haya
+        )).nombre)
+    if config.get('uno_biable_updater', True):
+        datos.append(etapas.agregar(Etapa(
+            "unobiable", unobiable, depende=datos[:], entradas=entradas_unobiable, salidas=salidas_unobiable,
+            # la base de UnoBiable no se puede huellar sin consultarla: se da por vigente un tiempo
+            vigencia=config.get('unobiable_vigencia_min', 60) * 60,
+            hilo_principal=True, opcional=True,
+        )).nombre)
+    previas = datos[:]
+    if config.get('dashboard_formato') != 'html':
+        previas.append(etapas.agregar(Etapa("calentar", renderer.calentar, huella_de="dashboard")).nombre)
+    etapas.agregar(Etapa("dashboard", dashboard, depende=previas, entradas=entradas_dashboard,
+                         salidas=lambda: archivos(output_dir)))
+    if args.periodos:
+        print("📭 Modo por periodos: no se envía correo")
+    else:
+        etapas.agregar(Etapa("correo", correo, depende=["dashboard"], entradas=entradas_correo))
+
+    if args.perfil in etapas.etapas:
+        instrumentacion.perfil = f"etapa.{args.perfil}"  # span de la etapa completa
+    resultados = {}
+    try:
+        resultados = etapas.ejecutar()
+    finally:
+        renderer.close()
+        if sesion is not None:
+            sesion.cerrar()
+        instrumentacion.guardar(corridas_dir, conservar=config.get('instrumentacion_reportes', 30),
+                                etapas=resultados, argumentos=vars(args))
+        Instrumentation.detener()  # lo que se llame después (o en el mismo proceso) no acumula spans
+    # las etapas opcionales (tasas, BD) que fallan no cambian el código de salida, como antes
+    if any(estado == StageScheduler.FALLIDA and not etapas.etapas[nombre].opcional
+           for nombre, estado in resultados.items()):
+        sys.exit(1)